@@ -0,0 +1,143 @@
+"""
+Semantic answer cache for /api/v1/query.
+
+Answers are keyed by the question embedding: a new question whose cosine
+similarity to a cached question clears the threshold reuses the stored
+response. Entries expire after a TTL, are evicted LRU-first, and are only
+valid for the corpus version they were generated against.
+"""
+
+import re
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+
+
+class SemanticAnswerCache:
+    """
+    Near-duplicate question cache.
+
+    Args:
+        threshold: Minimum cosine similarity for a hit
+        ttl_seconds: Lifetime of an entry
+        max_entries: Entries kept before least-recently-used eviction
+    """
+
+    def __init__(self, threshold: float = 0.95, ttl_seconds: float = 3600, max_entries: int = 512):
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[int, dict]" = OrderedDict()
+        self._next_id = 0
+        self._corpus_version = None
+        self._lock = threading.Lock()
+        self._matrix = None
+        self._matrix_ids: List[int] = []
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def _normalize(embedding: List[float]) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _check_version(self, corpus_version: str):
+        # A re-ingested corpus makes every cached answer stale
+        if corpus_version != self._corpus_version:
+            if self._entries:
+                self.invalidations += 1
+            self._entries.clear()
+            self._matrix = None
+            self._corpus_version = corpus_version
+
+    def _expire(self, now: float):
+        expired = [entry_id for entry_id, entry in self._entries.items() if now - entry["stored_at"] > self.ttl_seconds]
+        for entry_id in expired:
+            del self._entries[entry_id]
+        if expired:
+            self._matrix = None
+
+    def lookup(self, embedding: List[float], n_results: int, corpus_version: str, scope: str = "") -> Optional[Dict]:
+        """Return the cached response for the most similar question asked with the same n_results and scope."""
+        query = self._normalize(embedding)
+        with self._lock:
+            self._check_version(corpus_version)
+            self._expire(time.time())
+            if self._entries and self._matrix is None:
+                self._matrix_ids = list(self._entries.keys())
+                self._matrix = np.stack([self._entries[i]["vector"] for i in self._matrix_ids])
+
+            best_id = None
+            if self._entries:
+                scores = self._matrix @ query
+                for position in np.argsort(-scores):
+                    if scores[position] < self.threshold:
+                        break
+                    entry_id = self._matrix_ids[position]
+                    entry = self._entries[entry_id]
+                    if entry["n_results"] == n_results and entry["scope"] == scope:
+                        best_id = entry_id
+                        break
+
+            if best_id is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._entries.move_to_end(best_id)
+            return self._entries[best_id]["response"]
+
+    def store(self, embedding: List[float], n_results: int, corpus_version: str, response: Dict, scope: str = ""):
+        """Cache a response for the question embedding; scope distinguishes e.g. retrieval filters."""
+        with self._lock:
+            self._check_version(corpus_version)
+            self._entries[self._next_id] = {
+                "vector": self._normalize(embedding),
+                "n_results": n_results,
+                "scope": scope,
+                "response": response,
+                "stored_at": time.time(),
+            }
+            self._next_id += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            self._matrix = None
+
+    def invalidate(self, corpus_version: Optional[str] = None):
+        """
+        Drop every entry, or only entries from before `corpus_version` when given.
+
+        Counted as an invalidation only when entries are actually dropped.
+        """
+        with self._lock:
+            if corpus_version is not None:
+                self._check_version(corpus_version)
+                return
+            if self._entries:
+                self.invalidations += 1
+            self._entries.clear()
+            self._matrix = None
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "entries": len(self._entries),
+                "invalidations": self.invalidations,
+            }
+
+
+def load_example_questions(path: Path) -> List[str]:
+    """Extract the quoted questions from sample-queries/example-questions.md."""
+    if not path.exists():
+        return []
+    text = path.read_text()
+    return [q.strip() for q in re.findall(r'\*\*Question:\*\*\s*\n"(.+?)"\s*\n', text, re.DOTALL)]
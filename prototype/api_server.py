@@ -5,19 +5,40 @@ Provides REST API for querying K Fund regulations.
 """
 
 import os
+import json
+import asyncio
 import secrets
+import time
+import threading
 from pathlib import Path
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
 from contextlib import asynccontextmanager
 from fastapi import FastAPI, HTTPException, Depends, status
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse, HTMLResponse
+from fastapi.responses import FileResponse, HTMLResponse, JSONResponse, StreamingResponse
 from fastapi.security import HTTPBasic, HTTPBasicCredentials
 from pydantic import BaseModel
 import chromadb
-from openai import OpenAI
+from openai import OpenAI, AsyncOpenAI, DefaultAsyncHttpxClient, DEFAULT_CONNECTION_LIMITS, Timeout
 from dotenv import load_dotenv
-from typing import List, Dict
+from typing import List, Dict, Optional, Union
+import rule_engine
+import batch_classifier
+import vector_index
+import bm25_index
+import context_packer
+import rank_fusion
+import prompt_layout
+import incremental_ingest
+import index_snapshot
+import collection_versions
+import metadata_filter
+import batch_embedder
+from embedding_cache import cached_embeddings, acached_embeddings, get_default_cache
+from rate_limit import RateLimitGate
+from answer_cache import SemanticAnswerCache, load_example_questions
 
 load_dotenv()
 
@@ -40,15 +61,219 @@ def verify_credentials(credentials: HTTPBasicCredentials = Depends(security)):
     return credentials.username
 
 # Initialize clients
-openai_client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+# Retries happen above the SDK (the rate-limit gate, or BatchEmbedder for
+# ingestion), so both clients make a single attempt per call. SDK retries would
+# repeat a 429 before the shared pause engages and multiply the attempts.
+# Sync client for ingestion/startup work; request handlers use the async client
+openai_client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"), max_retries=0)
+
+# Pool limits and timeout use the SDK's own HTTP types: its client may not be
+# built on the httpx package, and foreign Limits/Timeout objects break every call
+Limits = type(DEFAULT_CONNECTION_LIMITS)
+
+# One pooled, keep-alive HTTP client shared by every in-flight request
+async_openai_client = AsyncOpenAI(
+    api_key=os.getenv("OPENAI_API_KEY"),
+    max_retries=0,
+    http_client=DefaultAsyncHttpxClient(
+        limits=Limits(
+            max_connections=int(os.getenv("OPENAI_MAX_CONNECTIONS", "200")),
+            max_keepalive_connections=int(os.getenv("OPENAI_MAX_KEEPALIVE", "50")),
+            keepalive_expiry=float(os.getenv("OPENAI_KEEPALIVE_SECONDS", "30"))
+        ),
+        timeout=Timeout(float(os.getenv("OPENAI_TIMEOUT_SECONDS", "60")), connect=5.0)
+    )
+)
+
+# Shared 429 handling: one throttled call pauses every worker until Retry-After
+rate_limit_gate = RateLimitGate(max_retries=int(os.getenv("OPENAI_RATE_LIMIT_RETRIES", "5")))
+
+# Decide clear-cut line items from K-Fund-Line-Item-Rules without the LLM
+RULE_ENGINE_ENABLED = os.getenv("RULE_ENGINE_ENABLED", "true").lower() != "false"
+classification_paths = Counter()
+_classification_paths_lock = threading.Lock()
+
+
+def record_classification_path(path: str):
+    """Count which classification path served a request (rule_engine vs rag_llm)."""
+    with _classification_paths_lock:
+        classification_paths[path] += 1
+
+# Near-duplicate question cache for /api/v1/query
+ANSWER_CACHE_ENABLED = os.getenv("ANSWER_CACHE_ENABLED", "true").lower() != "false"
+ANSWER_CACHE_PREWARM = os.getenv("ANSWER_CACHE_PREWARM", "false").lower() == "true"
+answer_cache = SemanticAnswerCache(
+    threshold=float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.95")),
+    ttl_seconds=float(os.getenv("ANSWER_CACHE_TTL_SECONDS", "3600")),
+    max_entries=int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "512"))
+)
+
+# Max line items classified in parallel per /api/v1/classify-batch request
+CLASSIFY_BATCH_CONCURRENCY = int(os.getenv("CLASSIFY_BATCH_CONCURRENCY", "8"))
+
+# Batched mode: many line items per chat completion with one shared context
+CLASSIFY_BATCH_MODE = os.getenv("CLASSIFY_BATCH_MODE", "concurrent")
+CLASSIFY_BATCH_TOKEN_BUDGET = int(os.getenv("CLASSIFY_BATCH_TOKEN_BUDGET", "4000"))
+CLASSIFY_BATCH_MAX_ITEMS = int(os.getenv("CLASSIFY_BATCH_MAX_ITEMS", "25"))
+CLASSIFY_BATCH_CONTEXT_CHUNKS = int(os.getenv("CLASSIFY_BATCH_CONTEXT_CHUNKS", "8"))
+
+# Prompt context assembly: retrieved chunks are merged and trimmed to this many tokens
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "1500"))
+context_packing = Counter()
+_context_packing_lock = threading.Lock()
+
+
+def record_context_packing(label: str, packed: context_packer.PackedContext):
+    """Log and accumulate the tokens saved by packing one request's context."""
+    with _context_packing_lock:
+        context_packing["requests"] += 1
+        context_packing["tokens"] += packed.tokens
+        context_packing["tokens_saved"] += packed.tokens_saved
+        context_packing["chunks_dropped"] += packed.dropped
+    print(f"Context: {label} packed to {packed.tokens} tokens "
+          f"({packed.tokens_saved} saved, {packed.dropped} chunks over budget)")
+
+# Stable prompt prefix (system prompt + canonical rules) for provider prompt caching
+RULES_BLOCK = prompt_layout.load_rules_block(prompt_layout.find_rules_file())
+prompt_usage = Counter()
+_prompt_usage_lock = threading.Lock()
+
+
+def record_prompt_usage(label: str, usage):
+    """Log and accumulate prompt, cached-prompt and completion tokens for one completion."""
+    tokens = prompt_layout.usage_tokens(usage)
+    with _prompt_usage_lock:
+        prompt_usage["completions"] += 1
+        for key, value in tokens.items():
+            prompt_usage[key] += value
+    print(f"LLM: {label} used {tokens['prompt_tokens']} prompt tokens "
+          f"({tokens['cached_tokens']} cached), {tokens['completion_tokens']} completion tokens")
 
 # ChromaDB path - use /tmp for Render (ephemeral storage)
 chroma_path = os.getenv("CHROMA_PATH", "./chroma_db")
 chroma_client = chromadb.PersistentClient(path=chroma_path)
 
+# Blue/green collections: queries use whichever version the alias points at (see collection_versions.py)
+collection_alias = collection_versions.AliasPointer(chroma_path)
 
-def get_embeddings_batch(texts: list) -> list:
-    """Get embeddings for a list of texts using OpenAI API."""
+
+def get_active_collection():
+    """The collection version currently behind the alias."""
+    return chroma_client.get_collection(collection_alias.name())
+
+# Chroma calls block, so they run on a dedicated pool instead of the event loop
+chroma_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv("CHROMA_THREADS", "16")),
+    thread_name_prefix="chroma"
+)
+
+
+async def run_blocking(fn, *args, **kwargs):
+    """Run a blocking (Chroma) call on the dedicated pool without stalling the event loop."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(chroma_executor, lambda: fn(*args, **kwargs))
+
+# Vector search backend: "chroma", or "numpy" for the in-process matrix index
+# built from the Chroma collection (see vector_index.py)
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "chroma")
+VECTOR_INDEX_PATH = os.getenv("VECTOR_INDEX_PATH", os.path.join(chroma_path, "numpy_index"))
+numpy_index = None
+
+
+def load_numpy_index():
+    """Load (or rebuild from Chroma) the NumPy index used when VECTOR_BACKEND=numpy."""
+    global numpy_index
+    collection = get_active_collection()
+    numpy_index = vector_index.load_or_build(collection, VECTOR_INDEX_PATH)
+    print(f"✅ NumPy vector index ready with {numpy_index.count()} chunks")
+
+
+# Hybrid retrieval: BM25 over the same chunks, fused with vector scores (see bm25_index.py)
+HYBRID_SEARCH_ENABLED = os.getenv("HYBRID_SEARCH_ENABLED", "true").lower() != "false"
+HYBRID_ALPHA = float(os.getenv("HYBRID_ALPHA", "0.6"))
+BM25_INDEX_PATH = os.getenv("BM25_INDEX_PATH", os.path.join(chroma_path, "bm25_index.json"))
+lexical_index = None
+
+
+def load_bm25_index():
+    """Load the BM25 index written at ingest time, rebuilding it if it is missing or stale."""
+    global lexical_index
+    collection = get_active_collection()
+    index = bm25_index.BM25Index.load(BM25_INDEX_PATH)
+    if index is None or index.version != incremental_ingest.corpus_version(collection):
+        index = bm25_index.BM25Index.from_collection(collection)
+        index.save(BM25_INDEX_PATH)
+    lexical_index = index
+    print(f"✅ BM25 index ready with {len(index.ids)} chunks and {len(index.postings)} terms")
+
+
+# Prebuilt index snapshot (see index_snapshot.py), served instead of ingesting when current
+SNAPSHOT_PATH = os.getenv("SNAPSHOT_PATH", str(index_snapshot.DEFAULT_PATH))
+SNAPSHOT_VERIFY = os.getenv("SNAPSHOT_VERIFY", "true").lower() != "false"
+snapshot_in_use = False
+
+
+def load_index_snapshot() -> bool:
+    """Serve searches from a current snapshot; False if it is missing or stale."""
+    global numpy_index, lexical_index, snapshot_in_use
+    start = time.perf_counter()
+    regulations_dir = incremental_ingest.find_regulations_dir()
+    documents = incremental_ingest.load_kfund_documents(regulations_dir) if regulations_dir else None
+    index, reason = index_snapshot.load_snapshot(
+        SNAPSHOT_PATH, documents,
+        embedding_model=os.getenv("EMBEDDING_MODEL", "text-embedding-3-small"),
+        verify=SNAPSHOT_VERIFY
+    )
+    if index is None:
+        print(f"ℹ️ Index snapshot not used ({reason}); ingesting instead")
+        return False
+    numpy_index = index
+    snapshot_in_use = True
+    if HYBRID_SEARCH_ENABLED:
+        lexical_index = bm25_index.BM25Index(index.ids, index.documents, index.metadatas, version=index.id)
+    update_index_state(document_count=index.count(), corpus_version=index.id)
+    print(f"✅ Loaded index snapshot {index.id} ({index.count()} chunks) "
+          f"in {(time.perf_counter() - start) * 1000:.0f} ms")
+    return True
+
+
+_derived_indexes_lock = threading.Lock()
+
+
+def refresh_derived_indexes(collection=None):
+    """Reload the BM25 (and NumPy) indexes if the active collection version moved on."""
+    collection = collection or get_active_collection()
+    version = incremental_ingest.corpus_version(collection)
+    with _derived_indexes_lock:
+        if HYBRID_SEARCH_ENABLED and (lexical_index is None or lexical_index.version != version):
+            load_bm25_index()
+        if VECTOR_BACKEND == "numpy" and (numpy_index is None or numpy_index.id != version):
+            load_numpy_index()
+    update_index_state(document_count=collection.count(), corpus_version=version)
+
+
+async def get_search_collection():
+    """
+    The collection (or Chroma-compatible index) that serves searches.
+
+    Callers keep the returned object for the whole request, so a blue/green
+    swap mid-request does not change the version they search.
+    """
+    if snapshot_in_use:
+        return numpy_index
+    collection = await run_blocking(get_active_collection)
+    version = incremental_ingest.corpus_version(collection)
+    stale_lexical = HYBRID_SEARCH_ENABLED and (lexical_index is None or lexical_index.version != version)
+    stale_numpy = VECTOR_BACKEND == "numpy" and (numpy_index is None or numpy_index.id != version)
+    if stale_lexical or stale_numpy:
+        await run_blocking(refresh_derived_indexes, collection)
+    if VECTOR_BACKEND == "numpy" and numpy_index is not None and numpy_index.id == version:
+        return numpy_index
+    return collection
+
+
+def _embed_request(texts: list) -> list:
+    """One OpenAI embeddings request, without retries."""
     response = openai_client.embeddings.create(
         model=os.getenv("EMBEDDING_MODEL", "text-embedding-3-small"),
         input=texts
@@ -56,97 +281,171 @@ def get_embeddings_batch(texts: list) -> list:
     return [item.embedding for item in response.data]
 
 
-def auto_ingest_if_empty():
-    """Auto-ingest K Fund documents if the collection is empty or doesn't exist."""
-    try:
-        collection = chroma_client.get_collection("compliance_regulations")
-        if collection.count() > 0:
-            print(f"✅ ChromaDB already has {collection.count()} documents")
-            return
-    except Exception:
-        pass  # Collection doesn't exist, will create it
-    
-    print("🚀 Auto-ingesting K Fund documents...")
+# Splits large inputs by count/tokens and embeds sub-batches concurrently with retries
+_embed_uncached = batch_embedder.from_env(_embed_request)
+
+
+def get_embeddings_batch(texts: list) -> list:
+    """Get embeddings for a list of texts, served from the embedding cache when possible."""
+    return cached_embeddings(
+        texts,
+        model=os.getenv("EMBEDDING_MODEL", "text-embedding-3-small"),
+        embed_fn=_embed_uncached,
+        cache=get_default_cache()
+    )
+
+
+async def _aembed_uncached(texts: list) -> list:
+    """Call the OpenAI embeddings API directly (async)."""
+    response = await rate_limit_gate.acall(
+        async_openai_client.embeddings.create,
+        model=os.getenv("EMBEDDING_MODEL", "text-embedding-3-small"),
+        input=texts
+    )
+    return [item.embedding for item in response.data]
+
+
+async def aget_embeddings_batch(texts: list) -> list:
+    """Async get_embeddings_batch for request handlers."""
+    return await acached_embeddings(
+        texts,
+        model=os.getenv("EMBEDDING_MODEL", "text-embedding-3-small"),
+        embed_fn=_aembed_uncached,
+        cache=get_default_cache()
+    )
+
+
+async def aget_embedding(text: str) -> List[float]:
+    """Async get_embedding for request handlers."""
+    return (await aget_embeddings_batch([text]))[0]
+
+
+def auto_ingest(progress=None):
+    """
+    Build the next blue/green collection version from the K Fund documents and switch to it.
+
+    The live version is never modified: the new one is seeded from it, only
+    new or changed chunks are embedded (see incremental_ingest.py), and the
+    alias moves once the build validates (see collection_versions.py).
+    `progress` receives short status messages.
+    """
+    print("🚀 Syncing K Fund documents...")
     
-    # Find regulations directory
-    script_dir = Path(__file__).parent
-    regulations_dir = script_dir.parent / "sample-regulations"
-    if not regulations_dir.exists():
-        regulations_dir = script_dir / "sample-regulations"
-    if not regulations_dir.exists():
+    regulations_dir = incremental_ingest.find_regulations_dir()
+    if regulations_dir is None:
         print("⚠️ No sample-regulations directory found")
         return
     
-    # Load K Fund documents
-    documents = []
-    for file_path in regulations_dir.glob("*.md"):
-        filename = file_path.stem
-        if 'K-Fund' not in filename and 'K_Fund' not in filename:
-            continue
-        with open(file_path, 'r') as f:
-            content = f.read()
-        documents.append({
-            'content': content,
-            'metadata': {'source': filename, 'regulation_type': 'K_FUND'}
-        })
-    
+    documents = incremental_ingest.load_kfund_documents(regulations_dir)
     if not documents:
         print("⚠️ No K Fund documents found")
         return
     
-    # Chunk documents
-    all_chunks = []
-    for doc in documents:
-        lines = doc['content'].split('\n')
-        current_chunk = []
-        current_size = 0
-        for line in lines:
-            if current_size + len(line) > 1000 and current_chunk:
-                chunk_text = '\n'.join(current_chunk)
-                all_chunks.append({
-                    'content': chunk_text,
-                    'metadata': {**doc['metadata'], 'chunk_index': len(all_chunks)}
-                })
-                current_chunk = current_chunk[-3:] if len(current_chunk) > 3 else current_chunk
-                current_size = sum(len(l) for l in current_chunk)
-            current_chunk.append(line)
-            current_size += len(line)
-        if current_chunk:
-            all_chunks.append({
-                'content': '\n'.join(current_chunk),
-                'metadata': {**doc['metadata'], 'chunk_index': len(all_chunks)}
-            })
-    
-    # Create collection and add documents
-    try:
-        chroma_client.delete_collection("compliance_regulations")
-    except Exception:
-        pass
-    
-    collection = chroma_client.create_collection(
-        name="compliance_regulations",
-        metadata={"description": "K Fund guidelines"}
+    stats = collection_versions.build_and_swap(
+        chroma_client, documents, incremental_ingest.chunk_regulation, get_embeddings_batch, chroma_path,
+        metadata={"description": "K Fund guidelines"}, progress=progress,
+        batch_size=_embed_uncached.parallel_batch_size
     )
     
-    # Get embeddings and add to collection
-    chunk_texts = [c['content'] for c in all_chunks]
-    embeddings = get_embeddings_batch(chunk_texts)
+    if stats["swapped"] or not os.path.exists(BM25_INDEX_PATH):
+        collection = chroma_client.get_collection(stats["name"])
+        bm25_index.BM25Index.from_collection(collection).save(BM25_INDEX_PATH)
+    if stats["swapped"]:
+        # Answers already cached against the new version stay valid
+        answer_cache.invalidate(
+            incremental_ingest.corpus_version(chroma_client.get_collection(stats["name"]))
+        )
+    removed = f", removed {', '.join(stats['removed_collections'])}" if stats["removed_collections"] else ""
+    print(f"✅ Ingestion: {stats['name']} active with {stats['added']} chunks embedded, "
+          f"{stats['deleted']} removed, {stats['unchanged']} unchanged{removed}")
+
+
+async def prewarm_answer_cache():
+    """Answer the example questions once so they are served from cache."""
+    questions_path = Path(__file__).parent.parent / "sample-queries" / "example-questions.md"
+    questions = load_example_questions(questions_path)
     
-    collection.add(
-        documents=chunk_texts,
-        embeddings=embeddings,
-        metadatas=[c['metadata'] for c in all_chunks],
-        ids=[f"chunk_{i}" for i in range(len(all_chunks))]
-    )
+    async def warm(question):
+        try:
+            await query_compliance(QueryRequest(question=question))
+        except Exception as e:
+            print(f"⚠️ Could not pre-warm answer cache for '{question[:40]}...': {e}")
     
-    print(f"✅ Ingested {len(all_chunks)} chunks from {len(documents)} K Fund documents")
+    await asyncio.gather(*(warm(q) for q in questions))
+    print(f"✅ Pre-warmed answer cache with {answer_cache.stats()['entries']} answers")
+
+
+# Startup state, read by the health endpoints instead of querying Chroma per probe
+index_state = {
+    "status": "starting",  # starting, ingesting, warming_up, ready, failed
+    "ready": False,
+    "progress": "",
+    "document_count": 0,
+    "corpus_version": "",
+    "reindexing": False,
+    "error": ""
+}
+_index_state_lock = threading.Lock()
+WARMUP_CONNECTIONS = int(os.getenv("WARMUP_CONNECTIONS", "4"))
+
+
+def update_index_state(**fields):
+    with _index_state_lock:
+        index_state.update(fields)
+
+
+def index_state_snapshot() -> Dict:
+    with _index_state_lock:
+        return dict(index_state)
+
+
+def report_progress(message: str):
+    update_index_state(progress=message)
+    print(f"   {message}")
+
+
+def build_index():
+    """Blocking startup work: load the snapshot, or ingest and load the derived search indexes."""
+    if load_index_snapshot():
+        return
+    update_index_state(status="ingesting")
+    auto_ingest(progress=report_progress)
+    refresh_derived_indexes()
+
+
+async def warm_up():
+    """Pre-embed the fixed classification query and open model provider connections."""
+    update_index_state(status="warming_up")
+    report_progress("warming up")
+    try:
+        await aget_embeddings_batch([RULES_LIST_QUERY])
+        await asyncio.gather(*(async_openai_client.models.list() for _ in range(WARMUP_CONNECTIONS)))
+    except Exception as e:
+        print(f"⚠️ Warm-up incomplete: {e}")
+    if ANSWER_CACHE_ENABLED and ANSWER_CACHE_PREWARM:
+        await prewarm_answer_cache()
+
+
+async def startup():
+    """Background startup; the readiness probe reports 503 until this finishes."""
+    try:
+        await run_blocking(build_index)
+        await warm_up()
+        update_index_state(status="ready", ready=True, progress="")
+        print(f"✅ Ready with {index_state_snapshot()['document_count']} documents")
+    except Exception as e:
+        update_index_state(status="failed", error=str(e))
+        print(f"❌ Startup failed: {e}")
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    """Startup and shutdown events."""
-    auto_ingest_if_empty()
+    """Startup and shutdown events. Ingestion runs in the background so the server accepts probes at once."""
+    startup_task = asyncio.create_task(startup())
     yield
+    startup_task.cancel()
+    await async_openai_client.close()
+    chroma_executor.shutdown(wait=False)
 
 
 app = FastAPI(title="K Fund Allocation API", version="1.0.0", lifespan=lifespan)
@@ -160,9 +459,16 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+class RetrievalFilters(BaseModel):
+    """Restrict retrieval to chunks whose metadata matches (a value or any of a list)."""
+    regulation_type: Optional[Union[str, List[str]]] = None
+    source: Optional[Union[str, List[str]]] = None
+    section: Optional[Union[str, List[str]]] = None
+
 class QueryRequest(BaseModel):
     question: str
-    n_results: int = 5
+    n_results: int = 4
+    filters: Optional[RetrievalFilters] = None
 
 class Citation(BaseModel):
     source: str
@@ -196,90 +502,255 @@ def api_info():
         "status": "operational",
         "endpoints": [
             "/api/v1/query - POST - Query K Fund guidelines",
-            "/api/v1/health - GET - Health check"
+            "/api/v1/query/stream - POST - Query K Fund guidelines (Server-Sent Events)",
+            "/api/v1/health - GET - Health check",
+            "/api/v1/health/live - GET - Liveness probe",
+            "/api/v1/health/ready - GET - Readiness probe (503 until the index is ready)",
+            "/api/v1/reindex - POST - Re-ingest into a new collection version (blue/green)",
+            "/api/v1/metrics - GET - Cache statistics"
         ]
     }
 
-def get_embedding(text: str) -> List[float]:
-    """Get embedding using OpenAI API."""
-    response = openai_client.embeddings.create(
-        model=os.getenv("EMBEDDING_MODEL", "text-embedding-3-small"),
-        input=text
+QUERY_SYSTEM_PROMPT = """You are an expert K Fund (EDCS) compliance assistant for the U.S. Department of State.
+Answer questions about K Fund allowability for representational expenses based ONLY on the provided guidelines.
+Cite specific authorities (22 U.S.C. § 2671, 22 U.S.C. § 2694, GAO guidance, etc.).
+End with a confidence level: HIGH, MEDIUM, or LOW."""
+
+
+def request_where(filters: Optional[RetrievalFilters], default: Optional[Dict] = None) -> Optional[Dict]:
+    """Chroma where clause for a request's filters, or for `default` when it sent none."""
+    return metadata_filter.build_where(filters.model_dump(exclude_none=True) if filters else default)
+
+
+async def prepare_question(request: QueryRequest):
+    """
+    Embed the question and check the semantic answer cache.
+    
+    Returns:
+        (collection, query embedding, corpus version, cached response or None)
+    """
+    query_embedding = await aget_embedding(request.question)
+    collection = await get_search_collection()
+    # Ingestion bumps the corpus version whenever chunk content changes
+    corpus_version = incremental_ingest.corpus_version(collection)
+    cached = None
+    if ANSWER_CACHE_ENABLED:
+        cached = answer_cache.lookup(query_embedding, request.n_results, corpus_version,
+                                     metadata_filter.where_key(request_where(request.filters)))
+    return collection, query_embedding, corpus_version, cached
+
+
+async def search_chunks(collection, query_texts: List[str], query_embeddings: List[List[float]], n_results: int,
+                        where: Optional[Dict] = None):
+    """
+    Search for several queries at once.
+
+    With hybrid search enabled, vector candidates (twice n_results per query)
+    are fused with BM25 hits for the same query text; otherwise this is a
+    plain vector query. A `where` metadata filter is applied inside both
+    indexes, before top-k.
+    """
+    hybrid = (
+        HYBRID_SEARCH_ENABLED and lexical_index is not None
+        and lexical_index.version == incremental_ingest.corpus_version(collection)
+    )
+    results = await run_blocking(
+        collection.query,
+        query_embeddings=query_embeddings,
+        n_results=n_results * 2 if hybrid else n_results,
+        where=where
+    )
+    if not hybrid:
+        return results
+    vector_scores = [relevance_scores(results, q) for q in range(len(query_texts))]
+    return bm25_index.hybrid_search(results, vector_scores, lexical_index, query_texts, n_results, HYBRID_ALPHA, where)
+
+
+async def retrieve_for_question(collection, question: str, query_embedding: List[float], n_results: int,
+                                where: Optional[Dict] = None):
+    """Search the regulations collection for a question."""
+    return await search_chunks(collection, [question], [query_embedding], n_results, where)
+
+
+def result_chunks(results, query_index: int = 0) -> List[Dict]:
+    """Hits for one query as chunk dicts (id, content, source, chunk_index, score), best first."""
+    return [
+        {
+            "id": chunk_id,
+            "content": content,
+            "source": meta['source'],
+            "chunk_index": meta.get('chunk_index'),
+            "score": score
+        }
+        for chunk_id, content, meta, score in zip(
+            results['ids'][query_index], results['documents'][query_index],
+            results['metadatas'][query_index], relevance_scores(results, query_index)
+        )
+    ]
+
+
+def build_query_messages(question: str, results) -> List[Dict]:
+    """Chat messages for answering a question from retrieved chunks."""
+    packed = context_packer.pack_context(result_chunks(results), CONTEXT_TOKEN_BUDGET)
+    record_context_packing("query", packed)
+    return prompt_layout.build_messages(
+        QUERY_SYSTEM_PROMPT, RULES_BLOCK, "Regulations", packed.text, f"Question: {question}"
     )
-    return response.data[0].embedding
+
+
+def relevance_scores(results, query_index: int = 0) -> List[float]:
+    """Relevance per hit for one query in a search result (cosine, or fused when hybrid)."""
+    if results.get('scores'):
+        return results['scores'][query_index]
+    if results.get('distances'):
+        # Chroma's default l2 space returns squared L2; for unit vectors cos = 1 - d/2
+        return [max(0.0, 1.0 - d / 2.0) for d in results['distances'][query_index]]
+    return [1.0 - (i * 0.1) for i in range(len(results['documents'][query_index]))]
+
+
+def build_citations(results) -> List[Citation]:
+    """Format citations with matched text chunks."""
+    return [
+        Citation(
+            source=meta['source'],
+            regulation_type=meta['regulation_type'],
+            relevance_score=round(score, 4),
+            matched_text=content
+        )
+        for meta, content, score in zip(results['metadatas'][0], results['documents'][0], relevance_scores(results))
+    ]
+
+
+def extract_confidence(answer_text: str) -> str:
+    """Extract confidence (simple heuristic)."""
+    if "HIGH" in answer_text.upper():
+        return "high"
+    if "LOW" in answer_text.upper():
+        return "low"
+    return "medium"
+
 
 @app.post("/api/v1/query", response_model=QueryResponse)
-def query_compliance(request: QueryRequest):
+async def query_compliance(request: QueryRequest):
     """
     Submit a compliance question and get an answer with citations.
     """
     try:
-        # Get embedding for the question
-        query_embedding = get_embedding(request.question)
-        
-        # Search regulations
-        collection = chroma_client.get_collection(name="compliance_regulations")
-        
-        results = collection.query(
-            query_embeddings=[query_embedding],
-            n_results=request.n_results
-        )
+        collection, query_embedding, corpus_version, cached = await prepare_question(request)
+        if cached is not None:
+            return QueryResponse(**cached)
         
-        # Build context
-        context = "\n\n---\n\n".join([
-            f"[Source: {meta['source']}]\n{content}"
-            for content, meta in zip(results['documents'][0], results['metadatas'][0])
-        ])
+        results = await retrieve_for_question(collection, request.question, query_embedding, request.n_results,
+                                              request_where(request.filters))
         
-        # Generate answer
-        system_prompt = """You are an expert K Fund (EDCS) compliance assistant for the U.S. Department of State.
-Answer questions about K Fund allowability for representational expenses based ONLY on the provided guidelines.
-Cite specific authorities (22 U.S.C. § 2671, 22 U.S.C. § 2694, GAO guidance, etc.).
-End with a confidence level: HIGH, MEDIUM, or LOW."""
-
-        response = openai_client.chat.completions.create(
+        response = await rate_limit_gate.acall(
+            async_openai_client.chat.completions.create,
             model=os.getenv("LLM_MODEL", "gpt-5.2-chat-latest"),
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": f"Question: {request.question}\n\nRegulations:\n{context}"}
-            ],
+            messages=build_query_messages(request.question, results),
             max_completion_tokens=2000
         )
+        record_prompt_usage("query", response.usage)
         
         answer_text = response.choices[0].message.content
         
-        # Extract confidence (simple heuristic)
-        confidence = "medium"
-        if "HIGH" in answer_text.upper():
-            confidence = "high"
-        elif "LOW" in answer_text.upper():
-            confidence = "low"
-        
-        # Format citations with matched text chunks
-        citations = [
-            Citation(
-                source=meta['source'],
-                regulation_type=meta['regulation_type'],
-                relevance_score=1.0 - (i * 0.1),
-                matched_text=content
-            )
-            for i, (meta, content) in enumerate(zip(results['metadatas'][0], results['documents'][0]))
-        ]
-        
-        return QueryResponse(
+        query_response = QueryResponse(
             answer=answer_text,
-            citations=citations,
-            confidence=confidence
+            citations=build_citations(results),
+            confidence=extract_confidence(answer_text)
         )
+        if ANSWER_CACHE_ENABLED:
+            answer_cache.store(query_embedding, request.n_results, corpus_version, query_response.model_dump(),
+                               metadata_filter.where_key(request_where(request.filters)))
+        return query_response
+        
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+def sse_event(event: str, data: dict) -> str:
+    """Encode one Server-Sent Event."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+async def cached_answer_events(cached: Dict):
+    """Replay a cached QueryResponse as citations, token and done events."""
+    yield sse_event("citations", {"citations": cached["citations"]})
+    yield sse_event("token", {"text": cached["answer"]})
+    yield sse_event("done", {"confidence": cached["confidence"]})
+
+
+@app.post("/api/v1/query/stream")
+async def query_compliance_stream(request: QueryRequest):
+    """
+    Streaming variant of /api/v1/query over Server-Sent Events.
+    
+    Events, in order: `citations` as soon as retrieval finishes, one `token`
+    per answer fragment, then `done` with the confidence level. Failures
+    before retrieval finishes return HTTP 500; later ones, including opening
+    the completion, are reported as an `error` event.
+    Cached answers are sent as a single `token` event.
+    """
+    try:
+        collection, query_embedding, corpus_version, cached = await prepare_question(request)
+        if cached is not None:
+            return StreamingResponse(
+                cached_answer_events(cached),
+                media_type="text/event-stream",
+                headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+            )
         
+        results = await retrieve_for_question(collection, request.question, query_embedding, request.n_results,
+                                              request_where(request.filters))
+        messages = build_query_messages(request.question, results)
+        citations = build_citations(results)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+    
+    async def events():
+        # Citations go out before the completion is opened (and before any rate-limit pause)
+        yield sse_event("citations", {"citations": [c.model_dump() for c in citations]})
+        answer_parts = []
+        try:
+            stream = await rate_limit_gate.acall(
+                async_openai_client.chat.completions.create,
+                model=os.getenv("LLM_MODEL", "gpt-5.2-chat-latest"),
+                messages=messages,
+                max_completion_tokens=2000,
+                stream=True,
+                stream_options={"include_usage": True}
+            )
+            async for chunk in stream:
+                if getattr(chunk, "usage", None) is not None:
+                    record_prompt_usage("query_stream", chunk.usage)
+                if not chunk.choices:
+                    continue
+                text = chunk.choices[0].delta.content
+                if text:
+                    answer_parts.append(text)
+                    yield sse_event("token", {"text": text})
+        except Exception as e:
+            yield sse_event("error", {"detail": str(e)})
+            return
+        answer_text = "".join(answer_parts)
+        confidence = extract_confidence(answer_text)
+        if ANSWER_CACHE_ENABLED:
+            answer_cache.store(query_embedding, request.n_results, corpus_version, QueryResponse(
+                answer=answer_text, citations=citations, confidence=confidence
+            ).model_dump(), metadata_filter.where_key(request_where(request.filters)))
+        yield sse_event("done", {"confidence": confidence})
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 class LineItemRequest(BaseModel):
     item: str
     cost: float
     foreign_guests: int = 0
     total_guests: int = 0
+    filters: Optional[RetrievalFilters] = None  # defaults to CLASSIFY_DEFAULT_FILTERS
 
 class ClassificationResponse(BaseModel):
     item: str
@@ -297,12 +768,16 @@ class ClassificationResponse(BaseModel):
     flagged: bool = False
     flag_reason: str = ""
     per_person_cost: float = 0.0
+    classification_path: str = "rag_llm"  # rule_engine, rag_llm or rag_llm_batch
+    rule_id: str = ""
 
 class BatchClassifyRequest(BaseModel):
     line_items: List[LineItemRequest]
     event_name: str = ""
     foreign_guests: int = 0
     total_guests: int = 0
+    filters: Optional[RetrievalFilters] = None  # defaults to CLASSIFY_DEFAULT_FILTERS
+    mode: str = ""  # concurrent or batched; defaults to CLASSIFY_BATCH_MODE
 
 class BatchClassifyResponse(BaseModel):
     event_name: str
@@ -313,62 +788,35 @@ class BatchClassifyResponse(BaseModel):
     totals: Dict[str, float]
 
 @app.post("/api/v1/classify", response_model=ClassificationResponse)
-def classify_line_item(request: LineItemRequest):
+async def classify_line_item(request: LineItemRequest):
     """
-    Classify a single line item for K Fund allowability using RAG.
+    Classify a single line item for K Fund allowability.
     
-    RAG Pipeline:
+    Clear-cut items are decided by the rule engine (K-Fund-Line-Item-Rules)
+    without retrieval or an LLM call. Everything else goes through RAG:
     1. Generate multiple search queries for better retrieval
     2. Search ChromaDB vector database for relevant K Fund guidelines
     3. Build context from retrieved chunks with source citations
     4. Send to GPT-4 for classification with grounded reasoning
     """
     try:
-        # Get relevant K Fund guidelines from vector DB
-        collection = chroma_client.get_collection(name="compliance_regulations")
-        
-        # Generate multiple search queries for better retrieval coverage
-        search_queries = [
-            f"Is {request.item} allowable under K Fund EDCS representational expenses?",
-            f"K Fund classification rules for {request.item}",
-            f"22 U.S.C. 2671 allowable expenses {request.item}",
-            "K Fund always allowable never allowable items list"
-        ]
-        
-        # Retrieve chunks for each query and deduplicate
-        all_chunks = {}
-        for query in search_queries:
-            query_embedding = get_embedding(query)
-            results = collection.query(
-                query_embeddings=[query_embedding],
-                n_results=4
+        verdict = rule_engine.evaluate(request.item, request.cost) if RULE_ENGINE_ENABLED else None
+        if verdict is not None:
+            record_classification_path("rule_engine")
+            return build_classification_response(
+                request, verdict.as_result(), [rule_engine.RULES_SOURCE],
+                path="rule_engine", rule_id=verdict.rule_id
             )
-            if results['documents'] and results['documents'][0]:
-                for content, meta in zip(results['documents'][0], results['metadatas'][0]):
-                    key = hash(content[:100])
-                    is_kfund = 'K-Fund' in meta.get('source', '') or 'K_Fund' in meta.get('source', '')
-                    if key not in all_chunks or is_kfund:
-                        all_chunks[key] = {"content": content, "source": meta['source'], "is_kfund": is_kfund}
-        
-        # Build rich context with source citations
-        # Sort to prioritize K Fund docs first
-        sorted_chunks = sorted(all_chunks.values(), key=lambda x: (not x.get('is_kfund', False), x['source']))
-        
-        context_parts = []
-        sources_used = set()
-        for chunk in sorted_chunks[:6]:  # Top 6 unique chunks, K Fund first
-            context_parts.append(f"[Source: {chunk['source']}]\n{chunk['content']}")
-            sources_used.add(chunk['source'])
-        
-        context = "\n\n---\n\n".join(context_parts)
-        
-        print(f"RAG: Retrieved {len(context_parts)} chunks from {len(sources_used)} sources for '{request.item}'")
         
-        # Calculate proration
-        foreign_pct = request.foreign_guests / request.total_guests if request.total_guests > 0 else 1.0
+        record_classification_path("rag_llm")
+        result, sources_used = await classify_with_rag(request)
+        return build_classification_response(request, result, list(sources_used))
         
-        # Use AI to classify
-        system_prompt = """You are a K Fund (EDCS) classification expert for the U.S. Department of State.
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+CLASSIFICATION_SYSTEM_PROMPT = """You are a K Fund (EDCS) classification expert for the U.S. Department of State.
 Classify the line item as one of:
 - K_FUND_ALLOWABLE: Representational expense for foreign officials (gifts, hospitality, courtesies)
 - NOT_ALLOWABLE: Operational, capital, personnel, or transportation expense
@@ -385,93 +833,272 @@ Respond in this exact JSON format:
     "questions": ["question1", "question2"] (only if LEGAL_REVIEW)
 }"""
 
-        response = openai_client.chat.completions.create(
-            model=os.getenv("LLM_MODEL", "gpt-5.2-chat-latest"),
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": f"Line item: {request.item}\nCost: ${request.cost}\nForeign guests: {request.foreign_guests}/{request.total_guests}\n\nK Fund Guidelines:\n{context}"}
-            ],
-            max_completion_tokens=1000,
-            response_format={"type": "json_object"}
-        )
-        
-        import json
-        result = json.loads(response.choices[0].message.content)
-        
-        # Calculate K Fund amount
-        needs_proration = result.get("needs_proration", False)
-        if result["classification"] == "K_FUND_ALLOWABLE":
-            k_fund_amount = request.cost * foreign_pct if needs_proration else request.cost
-        else:
-            k_fund_amount = 0
+RULES_LIST_QUERY = "K Fund always allowable never allowable items list"
 
-        # Calculate Per-Person Cost
-        per_person = request.cost / request.total_guests if request.total_guests > 0 else 0
-        
-        # Determine Payer and Check Flags
-        payer = "Operating Funds"
-        flagged = False
-        flag_reason = ""
+# Multi-query retrieval: hits per query, fused with reciprocal rank fusion (see rank_fusion.py)
+RETRIEVAL_CHUNKS_PER_QUERY = int(os.getenv("RETRIEVAL_CHUNKS_PER_QUERY", "3"))
+RRF_K = int(os.getenv("RRF_K", str(rank_fusion.RRF_K)))
+
+# Classification searches only the K Fund partition unless a request sends its own filters
+CLASSIFY_DEFAULT_FILTERS = {"regulation_type": os.getenv("CLASSIFY_REGULATION_TYPE", "K_FUND")}
+
+
+async def retrieve_guidelines(search_queries: List[str], n_results: int = RETRIEVAL_CHUNKS_PER_QUERY,
+                              max_chunks: int = 6, where: Optional[Dict] = None):
+    """
+    Retrieve guideline chunks for several queries, fused into one ranking.
+
+    All queries are embedded in one request and searched in one pass, inside
+    the `where` partition; hits are merged by chunk id with reciprocal rank
+    fusion.
+
+    Returns:
+        (context string, set of sources used)
+    """
+    collection = await get_search_collection()
+    query_embeddings = await aget_embeddings_batch(search_queries)
+    results = await search_chunks(collection, search_queries, query_embeddings, n_results, where)
+    relevance = [relevance_scores(results, q) for q in range(len(search_queries))]
+    candidates = rank_fusion.reciprocal_rank_fusion(results, relevance, k=RRF_K)
+    
+    # Adjacent chunks are merged and the context trimmed to the token budget
+    packed = context_packer.pack_context(candidates, CONTEXT_TOKEN_BUDGET, max_chunks=max_chunks)
+    record_context_packing("guidelines", packed)
+    return packed.text, set(packed.sources)
+
+
+async def classify_with_rag(request: LineItemRequest):
+    """Retrieve K Fund guidance and ask the LLM for a classification."""
+    # Hybrid search matches the item name lexically, so two queries cover what
+    # vector-only retrieval needed four phrasings for
+    if HYBRID_SEARCH_ENABLED:
+        search_queries = [
+            f"Is {request.item} allowable under K Fund EDCS representational expenses?",
+            RULES_LIST_QUERY
+        ]
+    else:
+        search_queries = [
+            f"Is {request.item} allowable under K Fund EDCS representational expenses?",
+            f"K Fund classification rules for {request.item}",
+            f"22 U.S.C. 2671 allowable expenses {request.item}",
+            RULES_LIST_QUERY
+        ]
+    context, sources_used = await retrieve_guidelines(
+        search_queries, where=request_where(request.filters, CLASSIFY_DEFAULT_FILTERS)
+    )
+    
+    print(f"RAG: Retrieved context from {len(sources_used)} sources for '{request.item}'")
+    
+    # Use AI to classify
+    response = await rate_limit_gate.acall(
+        async_openai_client.chat.completions.create,
+        model=os.getenv("LLM_MODEL", "gpt-5.2-chat-latest"),
+        messages=prompt_layout.build_messages(
+            CLASSIFICATION_SYSTEM_PROMPT, RULES_BLOCK, "K Fund Guidelines", context,
+            f"Line item: {request.item}\nCost: ${request.cost}\nForeign guests: {request.foreign_guests}/{request.total_guests}"
+        ),
+        max_completion_tokens=1000,
+        response_format={"type": "json_object"}
+    )
+    record_prompt_usage("classify", response.usage)
+    
+    result = json.loads(response.choices[0].message.content)
+    return result, sources_used
+
+
+def build_classification_response(request: LineItemRequest, result: dict, sources: List[str],
+                                  path: str = "rag_llm", rule_id: str = "") -> ClassificationResponse:
+    """Apply proration, payer and flag rules to a raw classification."""
+    # Calculate proration
+    foreign_pct = request.foreign_guests / request.total_guests if request.total_guests > 0 else 1.0
+    
+    # Calculate K Fund amount
+    needs_proration = result.get("needs_proration", False)
+    if result["classification"] == "K_FUND_ALLOWABLE":
+        k_fund_amount = request.cost * foreign_pct if needs_proration else request.cost
+    else:
+        k_fund_amount = 0
+
+    # Calculate Per-Person Cost
+    per_person = request.cost / request.total_guests if request.total_guests > 0 else 0
+    
+    # Determine Payer and Check Flags
+    payer = "Operating Funds"
+    flagged = False
+    flag_reason = ""
+    
+    # 1. Check Prohibited Items (Personal)
+    if rule_engine.is_prohibited(request.item):
+        payer = "Personal Funds"
+        flagged = True
+        flag_reason = "Prohibited item detected (e.g., personal/lavish)"
+        result["classification"] = "NOT_ALLOWABLE" # Override AI if it missed it
+        k_fund_amount = 0
         
-        item_lower = request.item.lower()
+    # 2. Check Allowability for Payer
+    elif result["classification"] == "K_FUND_ALLOWABLE":
+        if needs_proration:
+            payer = "K Fund / Operating (Split)"
+        else:
+            payer = "K Fund (EDCS)"
+    elif result["classification"] == "LEGAL_REVIEW":
+        payer = "Pending Review"
         
-        # 1. Check Prohibited Items (Personal)
-        prohibited_keywords = ['yacht', 'casino', 'gambling', 'spouse', 'family', 'vacation', 'personal']
-        if any(bad in item_lower for bad in prohibited_keywords):
-            payer = "Personal Funds"
-            flagged = True
-            flag_reason = "Prohibited item detected (e.g., personal/lavish)"
-            result["classification"] = "NOT_ALLOWABLE" # Override AI if it missed it
-            k_fund_amount = 0
-            
-        # 2. Check Allowability for Payer
-        elif result["classification"] == "K_FUND_ALLOWABLE":
-            if needs_proration:
-                payer = "K Fund / Operating (Split)"
+    # 3. Check Cost Caps (Soft Cap: $150/pp for food/event)
+    if not flagged and per_person > 150:
+        flagged = True
+        flag_reason = f"High per-person cost (${per_person:.2f}). Justification required."
+        if payer == "K Fund (EDCS)":
+            payer = "K Fund (Requires Memo)"
+    
+    return ClassificationResponse(
+        item=request.item,
+        cost=request.cost,
+        classification=result["classification"],
+        k_fund_amount=k_fund_amount,
+        authority=result.get("authority", ""),
+        rationale=result.get("rationale", ""),
+        regulation_text=result.get("regulation_text", ""),
+        confidence=result.get("confidence", "medium"),
+        prorated=needs_proration and result["classification"] == "K_FUND_ALLOWABLE",
+        questions=result.get("questions", []),
+        sources_consulted=sources,
+        payer=payer,
+        flagged=flagged,
+        flag_reason=flag_reason,
+        per_person_cost=per_person,
+        classification_path=path,
+        rule_id=rule_id
+    )
+
+
+async def classify_items_batched(request: BatchClassifyRequest) -> List[ClassificationResponse]:
+    """
+    Classify line items with as few chat completions as possible.
+    
+    Rule engine verdicts are used where available. Remaining items are
+    de-duplicated, packed to CLASSIFY_BATCH_TOKEN_BUDGET and sent with one
+    shared K Fund context (retrieved with the request's filters); anything
+    the model fails to answer falls back to single-item classification, run
+    concurrently.
+    """
+    items = request.line_items
+    results = [None] * len(items)
+    pending = []
+    for index, item in enumerate(items):
+        verdict = rule_engine.evaluate(item.item, item.cost) if RULE_ENGINE_ENABLED else None
+        if verdict is not None:
+            record_classification_path("rule_engine")
+            results[index] = build_classification_response(
+                item, verdict.as_result(), [rule_engine.RULES_SOURCE],
+                path="rule_engine", rule_id=verdict.rule_id
+            )
+        else:
+            pending.append((index, item.item, item.cost))
+    
+    if not pending:
+        return results
+    
+    groups = batch_classifier.group_items(pending, rule_engine.MAX_FAST_PATH_COST)
+    search_queries = [RULES_LIST_QUERY] + [f"K Fund classification rules for {g.item}" for g in groups]
+    context, sources_used = await retrieve_guidelines(
+        search_queries, max_chunks=CLASSIFY_BATCH_CONTEXT_CHUNKS,
+        where=request_where(request.filters, CLASSIFY_DEFAULT_FILTERS)
+    )
+    packs = batch_classifier.pack_groups(groups, CLASSIFY_BATCH_TOKEN_BUDGET, CLASSIFY_BATCH_MAX_ITEMS)
+    
+    print(f"RAG: Classifying {len(pending)} items as {len(groups)} distinct items in {len(packs)} completion(s)")
+    
+    semaphore = asyncio.Semaphore(CLASSIFY_BATCH_CONCURRENCY)
+    
+    async def classify_pack(pack):
+        async with semaphore:
+            return await classify_pack_with_llm(pack, context, request.foreign_guests, request.total_guests)
+    
+    answered = await asyncio.gather(*(classify_pack(pack) for pack in packs))
+    
+    def record(group, entry, sources, path):
+        for index in group.indexes:
+            record_classification_path(path)
+            results[index] = build_classification_response(items[index], dict(entry), sources, path=path)
+    
+    unanswered = []
+    for pack, parsed in zip(packs, answered):
+        for group in pack:
+            entry = parsed.get(group.item_id)
+            if entry is not None:
+                record(group, entry, list(sources_used), "rag_llm_batch")
             else:
-                payer = "K Fund (EDCS)"
-        elif result["classification"] == "LEGAL_REVIEW":
-            payer = "Pending Review"
-            
-        # 3. Check Cost Caps (Soft Cap: $150/pp for food/event)
-        if not flagged and per_person > 150:
-            flagged = True
-            flag_reason = f"High per-person cost (${per_person:.2f}). Justification required."
-            if payer == "K Fund (EDCS)":
-                payer = "K Fund (Requires Memo)"
-        
-        return ClassificationResponse(
-            item=request.item,
-            cost=request.cost,
-            classification=result["classification"],
-            k_fund_amount=k_fund_amount,
-            authority=result.get("authority", ""),
-            rationale=result.get("rationale", ""),
-            regulation_text=result.get("regulation_text", ""),
-            confidence=result.get("confidence", "medium"),
-            prorated=needs_proration and result["classification"] == "K_FUND_ALLOWABLE",
-            questions=result.get("questions", []),
-            sources_consulted=list(sources_used),
-            payer=payer,
-            flagged=flagged,
-            flag_reason=flag_reason,
-            per_person_cost=per_person
-        )
-        
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+                unanswered.append(group)
+    
+    # Groups the batch reply missed are classified one by one, concurrently
+    async def classify_single(group):
+        async with semaphore:
+            return await classify_with_rag(items[group.indexes[0]])
+    
+    fallbacks = await asyncio.gather(*(classify_single(group) for group in unanswered))
+    for group, (entry, fallback_sources) in zip(unanswered, fallbacks):
+        record(group, entry, list(fallback_sources), "rag_llm")
+    
+    return results
+
+
+async def classify_pack_with_llm(groups: List[batch_classifier.ItemGroup], context: str,
+                                 foreign_guests: int, total_guests: int) -> Dict[int, dict]:
+    """Classify a pack of distinct line items in one chat completion."""
+    items_block = batch_classifier.build_items_block(groups, foreign_guests, total_guests)
+    response = await rate_limit_gate.acall(
+        async_openai_client.chat.completions.create,
+        model=os.getenv("LLM_MODEL", "gpt-5.2-chat-latest"),
+        messages=prompt_layout.build_messages(
+            f"{CLASSIFICATION_SYSTEM_PROMPT}\n\n{batch_classifier.BATCH_INSTRUCTIONS}", RULES_BLOCK,
+            "K Fund Guidelines", context, items_block
+        ),
+        max_completion_tokens=200 + batch_classifier.OUTPUT_TOKENS_PER_ITEM * len(groups) * 2,
+        response_format={"type": "json_object"}
+    )
+    record_prompt_usage("classify_batch", response.usage)
+    return batch_classifier.parse_batch_response(response.choices[0].message.content, groups)
+
 
 @app.post("/api/v1/classify-batch", response_model=BatchClassifyResponse)
-def classify_batch(request: BatchClassifyRequest):
+async def classify_batch(request: BatchClassifyRequest):
     """
     Classify multiple line items for K Fund allowability.
+
+    mode="concurrent" classifies each item on its own, at most
+    CLASSIFY_BATCH_CONCURRENCY in flight. mode="batched" sends many items per
+    chat completion with one shared context and rejects per-item filters.
+    Results are in input order.
     """
-    results = []
+    mode = request.mode or CLASSIFY_BATCH_MODE
+    if mode not in ("concurrent", "batched"):
+        raise HTTPException(status_code=400, detail=f"Unknown batch mode: {mode}")
+    # Batched mode retrieves one shared context, so every item must use the request's filters
+    if mode == "batched" and any(item.filters is not None and item.filters != request.filters
+                                 for item in request.line_items):
+        raise HTTPException(status_code=400,
+                            detail="Per-item filters are not supported in batched mode; set filters on the request")
+    
     for item in request.line_items:
         item.foreign_guests = request.foreign_guests
         item.total_guests = request.total_guests
-        result = classify_line_item(item)
-        results.append(result)
+        item.filters = item.filters or request.filters
+    
+    results = []
+    if request.line_items and mode == "batched":
+        try:
+            results = await classify_items_batched(request)
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=str(e))
+    elif request.line_items:
+        semaphore = asyncio.Semaphore(CLASSIFY_BATCH_CONCURRENCY)
+        
+        async def classify_bounded(item):
+            async with semaphore:
+                return await classify_line_item(item)
+        
+        results = list(await asyncio.gather(*(classify_bounded(item) for item in request.line_items)))
     
     # Calculate totals
     k_fund_total = sum(r.k_fund_amount for r in results if r.classification == "K_FUND_ALLOWABLE")
@@ -496,20 +1123,77 @@ def classify_batch(request: BatchClassifyRequest):
 
 @app.get("/api/v1/health")
 def health_check():
-    """Health check endpoint."""
-    try:
-        collection = chroma_client.get_collection("compliance_regulations")
-        doc_count = collection.count()
-        return {
-            "status": "healthy",
-            "database": "connected",
-            "document_count": doc_count
-        }
-    except Exception as e:
+    """Health check endpoint (cached startup state; does not query Chroma)."""
+    state = index_state_snapshot()
+    if state["status"] == "failed":
         return {
             "status": "unhealthy",
-            "error": str(e)
+            "error": state["error"]
         }
+    return {
+        "status": "healthy" if state["ready"] else "starting",
+        "database": "connected" if state["ready"] else state["status"],
+        "document_count": state["document_count"],
+        "progress": state["progress"]
+    }
+
+@app.get("/api/v1/health/live")
+def liveness():
+    """Liveness probe: the process is up and serving requests."""
+    return {"status": "alive"}
+
+@app.get("/api/v1/health/ready")
+def readiness():
+    """Readiness probe: 200 once ingestion and warm-up are done, 503 before."""
+    state = index_state_snapshot()
+    return JSONResponse(status_code=200 if state["ready"] else 503, content=state)
+
+reindex_task = None
+
+
+async def reindex():
+    """Re-ingest in the background; requests keep using the active version until the alias swap."""
+    global snapshot_in_use
+    try:
+        await run_blocking(auto_ingest, report_progress)
+        snapshot_in_use = False
+        await run_blocking(refresh_derived_indexes)
+        update_index_state(reindexing=False, progress="")
+    except Exception as e:
+        update_index_state(reindexing=False, progress=f"re-ingestion failed: {e}")
+        print(f"❌ Re-ingestion failed: {e}")
+
+@app.post("/api/v1/reindex", status_code=202)
+async def start_reindex(username: str = Depends(verify_credentials)):
+    """Build and switch to a new collection version without interrupting queries."""
+    global reindex_task
+    if index_state_snapshot()["reindexing"]:
+        raise HTTPException(status_code=409, detail="Re-ingestion already running")
+    update_index_state(reindexing=True)
+    reindex_task = asyncio.create_task(reindex())
+    return {"status": "started"}
+
+def classification_path_stats() -> Dict:
+    """Counts per classification path and the share that bypassed the LLM."""
+    with _classification_paths_lock:
+        counts = dict(classification_paths)
+    total = sum(counts.values())
+    return {
+        **counts,
+        "bypass_rate": round(counts.get("rule_engine", 0) / total, 4) if total else 0.0
+    }
+
+@app.get("/api/v1/metrics")
+def metrics():
+    """Cache hit/miss counters."""
+    return {
+        "embedding_cache": get_default_cache().stats(),
+        "answer_cache": answer_cache.stats(),
+        "rate_limit_pauses": rate_limit_gate.throttled,
+        "classification_paths": classification_path_stats(),
+        "context_packing": dict(context_packing),
+        "prompt_usage": dict(prompt_usage)
+    }
 
 # Serve static files (HTML, CSS, JS)
 static_path = Path(__file__).parent / "static"
@@ -0,0 +1,122 @@
+"""
+Helpers for classifying many line items in a single chat completion.
+
+Items are de-duplicated by a normalized name, packed into groups that fit a
+token budget, and sent with one shared K Fund context. The model answers with
+a JSON array keyed by item id, which is mapped back to the original items.
+"""
+
+import json
+import re
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+from token_estimate import estimate_tokens
+
+VALID_CLASSIFICATIONS = {"K_FUND_ALLOWABLE", "NOT_ALLOWABLE", "LEGAL_REVIEW"}
+
+# Rough completion size of one classification object in the JSON array
+OUTPUT_TOKENS_PER_ITEM = 150
+
+BATCH_INSTRUCTIONS = """You will receive several numbered line items from the same event.
+Classify each one independently using the same rules and fields as above.
+Respond with a JSON object of the form:
+{"results": [{"id": <line item number>, "classification": ..., "authority": ..., "rationale": ...,
+"regulation_text": ..., "confidence": ..., "needs_proration": ..., "questions": [...]}]}
+Return exactly one result per line item id."""
+
+
+def normalize_item(name: str) -> str:
+    """Canonical form used to spot identical or near-identical line items."""
+    words = re.findall(r"[a-z0-9]+", name.lower())
+    # Singularize simple plurals so "Floral centerpieces" == "floral centerpiece"
+    words = [w[:-1] if len(w) > 3 and w.endswith("s") and not w.endswith("ss") else w for w in words]
+    return " ".join(sorted(set(words)))
+
+
+@dataclass
+class ItemGroup:
+    """One distinct line item to classify, plus the request indexes it covers."""
+    item_id: int
+    item: str
+    cost: float
+    indexes: List[int] = field(default_factory=list)
+
+    def prompt_line(self) -> str:
+        return f"{self.item_id}. {self.item} | Cost: ${self.cost}"
+
+
+def group_items(items: List[tuple], high_value_threshold: float = 5000) -> List[ItemGroup]:
+    """
+    Collapse duplicate items into groups.
+
+    Args:
+        items: (index, item name, cost) tuples
+        high_value_threshold: Items above this cost are never merged with cheaper ones
+
+    Returns:
+        ItemGroups in first-seen order, numbered from 1
+    """
+    groups: Dict[tuple, ItemGroup] = {}
+    for index, name, cost in items:
+        key = (normalize_item(name), cost > high_value_threshold)
+        if key not in groups:
+            groups[key] = ItemGroup(item_id=len(groups) + 1, item=name, cost=cost)
+        groups[key].indexes.append(index)
+    return list(groups.values())
+
+
+def pack_groups(groups: List[ItemGroup], token_budget: int, max_items: int) -> List[List[ItemGroup]]:
+    """Split groups into completions that each stay within the token budget."""
+    packs, current, used = [], [], 0
+    for group in groups:
+        cost = estimate_tokens(group.prompt_line()) + OUTPUT_TOKENS_PER_ITEM
+        if current and (used + cost > token_budget or len(current) >= max_items):
+            packs.append(current)
+            current, used = [], 0
+        current.append(group)
+        used += cost
+    if current:
+        packs.append(current)
+    return packs
+
+
+def build_items_block(groups: List[ItemGroup], foreign_guests: int, total_guests: int) -> str:
+    """Per-event variables and numbered line items for the user message."""
+    lines = [f"Foreign guests: {foreign_guests}/{total_guests}", "Line items:"]
+    lines.extend(group.prompt_line() for group in groups)
+    return "\n".join(lines)
+
+
+def parse_batch_response(content: str, groups: List[ItemGroup]) -> Dict[int, dict]:
+    """
+    Map the model's JSON array back to item ids.
+
+    Entries that are missing, malformed or carry an unknown classification are
+    left out so the caller can fall back to single-item classification.
+    """
+    try:
+        payload = json.loads(content)
+    except (TypeError, ValueError):
+        return {}
+
+    entries = payload.get("results", []) if isinstance(payload, dict) else payload
+    if not isinstance(entries, list):
+        return {}
+
+    expected = {group.item_id for group in groups}
+    parsed: Dict[int, dict] = {}
+    for entry in entries:
+        if not isinstance(entry, dict):
+            continue
+        item_id = _as_int(entry.get("id"))
+        if item_id in expected and entry.get("classification") in VALID_CLASSIFICATIONS:
+            parsed[item_id] = entry
+    return parsed
+
+
+def _as_int(value) -> Optional[int]:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
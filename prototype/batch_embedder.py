@@ -0,0 +1,117 @@
+"""
+Size-aware, parallel, retrying embedder for large corpora.
+
+Providers cap each embeddings request by input count and total tokens, so a
+list of texts is split into sub-batches on both limits. Sub-batches run
+concurrently on a bounded thread pool; each one is retried with exponential
+backoff and jitter on transient errors, so one failed request no longer
+aborts a whole ingestion. Results come back in input order.
+"""
+
+import os
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Optional
+
+from rate_limit import is_transient, retry_after_seconds
+from token_estimate import estimate_tokens
+
+
+def split_batches(texts: List[str], max_items: int, max_tokens: int) -> List[range]:
+    """
+    Consecutive index ranges that respect both limits. A single text larger
+    than max_tokens gets a batch of its own.
+    """
+    batches = []
+    start = 0
+    tokens = 0
+    for i, text in enumerate(texts):
+        size = estimate_tokens(text) + 1
+        if i > start and (i - start >= max_items or tokens + size > max_tokens):
+            batches.append(range(start, i))
+            start, tokens = i, 0
+        tokens += size
+    if start < len(texts):
+        batches.append(range(start, len(texts)))
+    return batches
+
+
+class BatchEmbedder:
+    """
+    Embed any number of texts through an embed_fn that takes one request's worth.
+
+    Args:
+        embed_fn: Embeds one list of texts in a single provider request
+        max_items: Most inputs per request
+        max_tokens: Most estimated tokens per request
+        max_workers: Concurrent requests
+        max_retries: Retries per sub-batch on transient errors
+        base_delay, max_delay: Exponential backoff bounds in seconds
+    """
+
+    def __init__(self, embed_fn: Callable[[List[str]], List[List[float]]], max_items: int = 256,
+                 max_tokens: int = 100000, max_workers: int = 4, max_retries: int = 5,
+                 base_delay: float = 1.0, max_delay: float = 30.0):
+        self.embed_fn = embed_fn
+        self.max_items = max_items
+        self.max_tokens = max_tokens
+        self.max_workers = max_workers
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.retries = 0
+
+    @property
+    def parallel_batch_size(self) -> int:
+        """Inputs per call that give every worker a full sub-batch; callers should send at least this many."""
+        return self.max_items * self.max_workers
+
+    def backoff_delay(self, error: Exception, attempt: int) -> float:
+        """Retry-After when the provider sends one, else full-jitter exponential backoff."""
+        delay = retry_after_seconds(error)
+        if delay is None:
+            delay = random.uniform(0, self.base_delay * (2 ** attempt))
+        return min(delay, self.max_delay)
+
+    def embed_with_retry(self, texts: List[str]) -> List[List[float]]:
+        attempt = 0
+        while True:
+            try:
+                embeddings = self.embed_fn(texts)
+                if len(embeddings) != len(texts):
+                    raise ValueError(f"expected {len(texts)} embeddings, got {len(embeddings)}")
+                return embeddings
+            except Exception as e:
+                if not is_transient(e) or attempt >= self.max_retries:
+                    raise
+                self.retries += 1
+                time.sleep(self.backoff_delay(e, attempt))
+                attempt += 1
+
+    def __call__(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        batches = split_batches(texts, self.max_items, self.max_tokens)
+        if len(batches) == 1:
+            return self.embed_with_retry(list(texts))
+
+        results: List[Optional[List[float]]] = [None] * len(texts)
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(batches)),
+                                thread_name_prefix="embed") as pool:
+            futures = [(batch, pool.submit(self.embed_with_retry, [texts[i] for i in batch])) for batch in batches]
+            for batch, future in futures:
+                for i, embedding in zip(batch, future.result()):
+                    results[i] = embedding
+        return results
+
+
+def from_env(embed_fn: Callable[[List[str]], List[List[float]]]) -> BatchEmbedder:
+    """BatchEmbedder configured from EMBEDDING_BATCH_* environment variables."""
+    return BatchEmbedder(
+        embed_fn,
+        max_items=int(os.getenv("EMBEDDING_BATCH_MAX_ITEMS", "256")),
+        max_tokens=int(os.getenv("EMBEDDING_BATCH_MAX_TOKENS", "100000")),
+        max_workers=int(os.getenv("EMBEDDING_CONCURRENCY", "4")),
+        max_retries=int(os.getenv("EMBEDDING_MAX_RETRIES", "5")),
+    )
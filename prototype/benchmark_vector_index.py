@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Benchmark the NumPy vector index against ChromaDB.
+
+Builds a synthetic corpus of normalized random embeddings, loads it into a
+throwaway Chroma collection and a NumpyVectorIndex, and times the four-query
+lookup pattern used by classify_line_item. No API key is needed.
+
+Usage:
+    python benchmark_vector_index.py [--chunks 500] [--dims 1536] [--queries 4] [--k 4] [--rounds 200]
+"""
+
+import argparse
+import statistics
+import tempfile
+import time
+
+import chromadb
+import numpy as np
+
+from vector_index import NumpyVectorIndex, normalize_rows
+
+
+def time_calls(fn, rounds: int) -> dict:
+    """Mean and p95 latency of fn() in milliseconds."""
+    fn()  # warm up
+    samples = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return {
+        "mean_ms": statistics.mean(samples),
+        "p95_ms": samples[int(len(samples) * 0.95) - 1],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, default=500)
+    parser.add_argument("--dims", type=int, default=1536)
+    parser.add_argument("--queries", type=int, default=4)
+    parser.add_argument("--k", type=int, default=4)
+    parser.add_argument("--rounds", type=int, default=200)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    embeddings = normalize_rows(rng.standard_normal((args.chunks, args.dims)))
+    queries = normalize_rows(rng.standard_normal((args.queries, args.dims)))
+    ids = [f"chunk_{i}" for i in range(args.chunks)]
+    documents = [f"chunk text {i}" for i in range(args.chunks)]
+    metadatas = [{"source": "bench", "regulation_type": "K_FUND"} for _ in range(args.chunks)]
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        client = chromadb.PersistentClient(path=tmpdir)
+        collection = client.create_collection("bench")
+        collection.add(ids=ids, documents=documents, metadatas=metadatas, embeddings=embeddings.tolist())
+
+        index = NumpyVectorIndex(ids, documents, metadatas, embeddings)
+        index.save(tmpdir + "/numpy_index")
+        mapped = NumpyVectorIndex.load(tmpdir + "/numpy_index", mmap=True)
+
+        query_list = queries.tolist()
+        results = {
+            "chroma, one query() per vector": time_calls(
+                lambda: [collection.query(query_embeddings=[q], n_results=args.k) for q in query_list], args.rounds),
+            "chroma, batched query()": time_calls(
+                lambda: collection.query(query_embeddings=query_list, n_results=args.k), args.rounds),
+            "numpy, batched query()": time_calls(
+                lambda: index.query(query_list, n_results=args.k), args.rounds),
+            "numpy (mmap), batched query()": time_calls(
+                lambda: mapped.query(query_list, n_results=args.k), args.rounds),
+        }
+
+        # Recall of the approximate HNSW search against the exact matrix search
+        chroma_ids = collection.query(query_embeddings=query_list, n_results=args.k)["ids"]
+        exact_ids = index.query(query_list, n_results=args.k)["ids"]
+        overlap = np.mean([len(set(a) & set(b)) / args.k for a, b in zip(chroma_ids, exact_ids)])
+
+    print(f"Corpus: {args.chunks} chunks x {args.dims} dims, {args.queries} queries, top-{args.k}, {args.rounds} rounds")
+    print(f"{'backend':<34}{'mean ms':>10}{'p95 ms':>10}")
+    for name, stats in results.items():
+        print(f"{name:<34}{stats['mean_ms']:>10.3f}{stats['p95_ms']:>10.3f}")
+    print(f"Chroma top-{args.k} overlap with exact search: {overlap:.2%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+"""
+Lexical BM25 index over regulation chunks, and hybrid score fusion.
+
+Exact terms such as "motorcade", "quartet" or "calligraphy" are easy for an
+inverted index and sometimes missed by dense embeddings. The index is built
+at ingest time next to the vector store; hybrid_search fuses normalized
+BM25 scores with vector cosine scores in one pass over the union of
+candidates.
+"""
+
+import json
+import math
+import re
+from collections import Counter, defaultdict
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from incremental_ingest import corpus_version
+from metadata_filter import matches
+
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "can", "do", "for", "from", "how", "i", "if",
+    "in", "is", "it", "of", "on", "or", "that", "the", "this", "to", "under", "what", "when",
+    "which", "with", "k", "fund",
+}
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase word/section tokens with stopwords removed and simple plurals folded."""
+    tokens = []
+    for token in re.findall(r"[a-z0-9]+(?:\.[0-9]+)*", text.lower()):
+        if token in STOPWORDS:
+            continue
+        if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+            token = token[:-1]
+        tokens.append(token)
+    return tokens
+
+
+class BM25Index:
+    """
+    Okapi BM25 over an inverted index of chunk tokens.
+
+    Args:
+        ids: Chunk ids
+        documents: Chunk texts
+        metadatas: Chunk metadata dicts
+        version: Corpus version of the collection the index was built from
+        k1, b: BM25 term-frequency saturation and length normalization
+    """
+
+    def __init__(self, ids: List[str], documents: List[str], metadatas: List[Dict],
+                 version: str = "", k1: float = 1.5, b: float = 0.75):
+        self.ids = list(ids)
+        self.documents = list(documents)
+        self.metadatas = list(metadatas)
+        self.version = version
+        self.k1 = k1
+        self.b = b
+        self.postings: Dict[str, List[tuple]] = defaultdict(list)
+        self.doc_lengths: List[int] = []
+        for position, text in enumerate(self.documents):
+            counts = Counter(tokenize(text))
+            self.doc_lengths.append(sum(counts.values()))
+            for term, tf in counts.items():
+                self.postings[term].append((position, tf))
+        self.avg_length = (sum(self.doc_lengths) / len(self.doc_lengths)) if self.doc_lengths else 0.0
+        n = len(self.documents)
+        self.idf = {
+            term: math.log(1 + (n - len(posting) + 0.5) / (len(posting) + 0.5))
+            for term, posting in self.postings.items()
+        }
+
+    def scores(self, query: str) -> Dict[int, float]:
+        """BM25 score per matching chunk position (non-matching chunks are omitted)."""
+        totals: Dict[int, float] = defaultdict(float)
+        for term in set(tokenize(query)):
+            idf = self.idf.get(term)
+            if idf is None:
+                continue
+            for position, tf in self.postings[term]:
+                length_norm = 1 - self.b + self.b * self.doc_lengths[position] / (self.avg_length or 1)
+                totals[position] += idf * tf * (self.k1 + 1) / (tf + self.k1 * length_norm)
+        return totals
+
+    def top(self, query: str, n_results: int, where: Optional[Dict] = None) -> List[tuple]:
+        """(position, score) pairs for the best lexical matches among chunks matching `where`, best first."""
+        scored = self.scores(query).items()
+        if where:
+            scored = [(position, score) for position, score in scored if matches(self.metadatas[position] or {}, where)]
+        ranked = sorted(scored, key=lambda item: item[1], reverse=True)
+        return ranked[:n_results]
+
+    def save(self, path):
+        """Persist the chunk texts and metadata; postings are rebuilt on load."""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "w") as f:
+            json.dump({
+                "version": self.version,
+                "ids": self.ids,
+                "documents": self.documents,
+                "metadatas": self.metadatas,
+            }, f)
+
+    @classmethod
+    def load(cls, path) -> Optional["BM25Index"]:
+        path = Path(path)
+        if not path.exists():
+            return None
+        with open(path) as f:
+            data = json.load(f)
+        return cls(data["ids"], data["documents"], data["metadatas"], version=data.get("version", ""))
+
+    @classmethod
+    def from_collection(cls, collection) -> "BM25Index":
+        """Build from every chunk stored in a Chroma collection."""
+        data = collection.get(include=["documents", "metadatas"])
+        return cls(data["ids"], data["documents"], data["metadatas"], version=corpus_version(collection))
+
+
+def hybrid_search(vector_results: Dict, vector_scores: List[List[float]], index: BM25Index,
+                  query_texts: List[str], n_results: int, alpha: float = 0.6,
+                  where: Optional[Dict] = None) -> Dict:
+    """
+    Fuse vector and BM25 hits per query.
+
+    Each side is normalized to [0, 1] by its best score for that query, then
+    combined as alpha * vector + (1 - alpha) * lexical over the union of both
+    candidate lists.
+
+    Args:
+        vector_results: Chroma-shaped result (ids/documents/metadatas per query)
+        vector_scores: Cosine similarity per vector hit, aligned with vector_results
+        index: Lexical index over the same chunks
+        query_texts: Query strings, one per query embedding
+        n_results: Hits to keep per query
+        alpha: Weight of the vector score
+        where: Metadata filter the vector hits were already restricted to; applied to lexical hits
+
+    Returns:
+        Chroma-shaped result with fused `scores` per query
+    """
+    fused = {"ids": [], "documents": [], "metadatas": [], "scores": []}
+    for q, text in enumerate(query_texts):
+        candidates: Dict[str, dict] = {}
+
+        v_ids = vector_results["ids"][q]
+        v_best = max(vector_scores[q], default=0.0) or 1.0
+        for chunk_id, doc, meta, score in zip(v_ids, vector_results["documents"][q],
+                                              vector_results["metadatas"][q], vector_scores[q]):
+            candidates[chunk_id] = {"document": doc, "metadata": meta,
+                                    "vector": max(score, 0.0) / v_best, "lexical": 0.0}
+
+        lexical = index.top(text, n_results * 2, where)
+        l_best = lexical[0][1] if lexical else 1.0
+        for position, score in lexical:
+            chunk_id = index.ids[position]
+            entry = candidates.setdefault(chunk_id, {
+                "document": index.documents[position], "metadata": index.metadatas[position],
+                "vector": 0.0, "lexical": 0.0,
+            })
+            entry["lexical"] = score / l_best
+
+        ranked = sorted(
+            candidates.items(),
+            key=lambda item: alpha * item[1]["vector"] + (1 - alpha) * item[1]["lexical"],
+            reverse=True,
+        )[:n_results]
+        fused["ids"].append([chunk_id for chunk_id, _ in ranked])
+        fused["documents"].append([entry["document"] for _, entry in ranked])
+        fused["metadatas"].append([entry["metadata"] for _, entry in ranked])
+        fused["scores"].append([
+            round(alpha * entry["vector"] + (1 - alpha) * entry["lexical"], 6) for _, entry in ranked
+        ])
+    return fused
@@ -0,0 +1,229 @@
+"""
+Blue/green versioned collections behind an alias pointer.
+
+Re-ingestion never modifies the collection queries are running against. A
+new `compliance_regulations_v{n}` is seeded with the active version's chunks
+and embeddings, brought up to date incrementally (so only new or changed
+chunks are embedded), validated, and then made active by atomically
+replacing the alias file `active_collection.json`. The previous version is
+kept so requests that already hold it can finish; older ones are deleted.
+
+A build records `{name}.checkpoint.json` once seeding is done; if it is
+interrupted, the next build with the same active version resumes the
+half-built collection instead of starting over.
+"""
+
+import json
+import os
+import re
+import shutil
+import threading
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional
+
+from incremental_ingest import document_hash, load_manifest, sync_collection
+from markdown_chunker import CHUNKER_VERSION
+
+BASE_NAME = "compliance_regulations"
+ALIAS_FILE = "active_collection.json"
+KEEP_VERSIONS = 2
+COPY_BATCH_SIZE = 500
+
+
+def version_name(generation: int) -> str:
+    return f"{BASE_NAME}_v{generation}"
+
+
+def generation_of(name: str) -> int:
+    """Generation number of a versioned name; the unversioned legacy collection is 0."""
+    match = re.fullmatch(rf"{BASE_NAME}_v(\d+)", name)
+    return int(match.group(1)) if match else 0
+
+
+def manifest_path(base_path, name: str) -> Path:
+    return Path(base_path) / f"{name}.manifest.json"
+
+
+def checkpoint_path(base_path, name: str) -> Path:
+    return Path(base_path) / f"{name}.checkpoint.json"
+
+
+def read_alias(base_path) -> Optional[Dict]:
+    path = Path(base_path) / ALIAS_FILE
+    if not path.exists():
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def write_alias(base_path, name: str, corpus_version: str):
+    """Point the alias at `name`; readers see either the old or the new file, never a partial one."""
+    path = Path(base_path) / ALIAS_FILE
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(".tmp")
+    with open(tmp, "w") as f:
+        json.dump({"name": name, "generation": generation_of(name), "corpus_version": corpus_version}, f)
+    os.replace(tmp, path)
+
+
+class AliasPointer:
+    """
+    Cached view of the alias file, re-read only when it changes on disk, so
+    a swap made by another process (e.g. ingest_documents.py) is picked up.
+    """
+
+    def __init__(self, base_path):
+        self.path = Path(base_path) / ALIAS_FILE
+        self._lock = threading.Lock()
+        self._mtime = None
+        self._name = BASE_NAME
+
+    def name(self) -> str:
+        try:
+            mtime = self.path.stat().st_mtime_ns
+        except FileNotFoundError:
+            return BASE_NAME
+        with self._lock:
+            if mtime != self._mtime:
+                with open(self.path) as f:
+                    self._name = json.load(f)["name"]
+                self._mtime = mtime
+            return self._name
+
+
+def active_collection(client, base_path):
+    """The collection the alias points at (or the legacy unversioned one), or None."""
+    alias = read_alias(base_path)
+    name = alias["name"] if alias else BASE_NAME
+    try:
+        return client.get_collection(name)
+    except Exception:
+        return None
+
+
+def is_current(collection, documents: List[Dict], base_path, chunker: str = CHUNKER_VERSION) -> bool:
+    """True if the collection was built from exactly these documents with this chunker version."""
+    if collection is None or collection.count() == 0:
+        return False
+    manifest = load_manifest(manifest_path(base_path, collection.name))
+    if manifest.get("chunker") != chunker:
+        return False
+    files = manifest["files"]
+    current = {doc["metadata"]["source"]: document_hash(doc) for doc in documents}
+    return {source: entry["sha256"] for source, entry in files.items()} == current
+
+
+def copy_collection(source, target, batch_size: int = COPY_BATCH_SIZE):
+    """Copy every chunk, with its embedding, from one collection to another."""
+    offset = 0
+    while True:
+        data = source.get(include=["embeddings", "documents", "metadatas"], limit=batch_size, offset=offset)
+        if not data["ids"]:
+            break
+        target.add(ids=data["ids"], documents=data["documents"], metadatas=data["metadatas"],
+                   embeddings=data["embeddings"])
+        offset += len(data["ids"])
+
+
+def validate(collection, stats: Dict):
+    """Refuse to activate a build that is empty or missing chunks."""
+    expected = stats["added"] + stats["unchanged"]
+    count = collection.count()
+    if count == 0 or count != expected:
+        raise RuntimeError(f"{collection.name} has {count} chunks, expected {expected}")
+    probe = collection.get(limit=1, include=["embeddings"])
+    if probe["embeddings"] is None or len(probe["embeddings"]) == 0:
+        raise RuntimeError(f"{collection.name} has no embeddings")
+
+
+def resumable_build(client, base_path, name: str, active):
+    """The half-built collection `name` if it was seeded from the current active version, else None."""
+    path = checkpoint_path(base_path, name)
+    if not path.exists():
+        return None
+    with open(path) as f:
+        checkpoint = json.load(f)
+    if checkpoint.get("base") != (active.name if active else None):
+        return None
+    try:
+        return client.get_collection(name)
+    except Exception:
+        return None
+
+
+def write_checkpoint(base_path, name: str, active):
+    path = checkpoint_path(base_path, name)
+    with open(path, "w") as f:
+        json.dump({"base": active.name if active else None}, f)
+
+
+def collect_garbage(client, active_name: str, keep: int = KEEP_VERSIONS) -> List[str]:
+    """Delete all but the `keep` newest versions (the active one is never deleted)."""
+    names = [c if isinstance(c, str) else c.name for c in client.list_collections()]
+    versions = sorted(
+        (n for n in names if n == BASE_NAME or re.fullmatch(rf"{BASE_NAME}_v\d+", n)),
+        key=generation_of, reverse=True
+    )
+    deleted = []
+    for name in versions[keep:]:
+        if name != active_name:
+            client.delete_collection(name)
+            deleted.append(name)
+    return deleted
+
+
+def build_and_swap(client, documents: List[Dict], chunk_fn: Callable[[Dict], Iterable[Dict]],
+                   embed_fn: Callable[[List[str]], List[List[float]]], base_path,
+                   metadata: Optional[Dict] = None, progress: Optional[Callable[[str], None]] = None,
+                   keep: int = KEEP_VERSIONS, batch_size: int = 1024,
+                   chunk_map: Optional[Callable] = None, chunker: str = CHUNKER_VERSION) -> Dict:
+    """
+    Build the next collection version and switch the alias to it.
+
+    `chunker` is the version of chunk_fn's rules (see sync_collection); an
+    active version built with a different one is rebuilt.
+
+    Returns:
+        Sync counts plus the active collection name, whether the alias was
+        swapped, the collections deleted and the corpus version
+    """
+    report = progress or (lambda message: None)
+    active = active_collection(client, base_path)
+    if is_current(active, documents, base_path, chunker):
+        return {"name": active.name, "swapped": False, "added": 0, "deleted": 0,
+                "unchanged": active.count(), "removed_collections": [],
+                "corpus_version": (active.metadata or {}).get("corpus_version", "")}
+
+    alias = read_alias(base_path)
+    generation = max(alias["generation"] if alias else 0, generation_of(active.name) if active else 0) + 1
+    name = version_name(generation)
+    target = resumable_build(client, base_path, name, active)
+    if target is not None:
+        report(f"resuming interrupted build of {name}")
+    else:
+        try:
+            client.delete_collection(name)  # leftover from a build that cannot be resumed
+        except Exception:
+            pass
+        manifest_path(base_path, name).unlink(missing_ok=True)
+        target = client.create_collection(name=name, metadata=metadata)
+        if active is not None:
+            report(f"seeding {name} from {active.name}")
+            copy_collection(active, target)
+            if manifest_path(base_path, active.name).exists():
+                shutil.copyfile(manifest_path(base_path, active.name), manifest_path(base_path, name))
+        write_checkpoint(base_path, name, active)
+
+    stats = sync_collection(target, documents, chunk_fn, embed_fn, manifest_path(base_path, name),
+                            progress=progress, batch_size=batch_size, chunk_map=chunk_map,
+                            chunker=chunker)
+    validate(target, stats)
+    write_alias(base_path, name, stats["corpus_version"])
+    checkpoint_path(base_path, name).unlink(missing_ok=True)
+    report(f"switched alias to {name}")
+
+    removed = collect_garbage(client, name, keep)
+    for old in removed:
+        manifest_path(base_path, old).unlink(missing_ok=True)
+        checkpoint_path(base_path, old).unlink(missing_ok=True)
+    return {**stats, "name": name, "swapped": True, "removed_collections": removed}
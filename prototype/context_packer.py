@@ -0,0 +1,121 @@
+"""
+Token-budgeted context assembly for LLM prompts.
+
+When markdown_chunker splits a long section, each continuation chunk
+starts by repeating the section heading, so concatenating retrieved chunks
+verbatim pays for that heading again. The packer takes chunks best first,
+keeps as many as fit the token budget, merges adjacent chunks from the same
+source into one block without the repeated heading, and reports the tokens
+saved.
+"""
+
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+from token_estimate import estimate_tokens
+from markdown_chunker import HEADING
+
+BLOCK_SEPARATOR = "\n\n---\n\n"
+
+
+@dataclass
+class PackedContext:
+    """Assembled prompt context and what packing saved."""
+    text: str
+    sources: List[str] = field(default_factory=list)
+    chunk_ids: List[str] = field(default_factory=list)
+    tokens: int = 0
+    raw_tokens: int = 0
+    dropped: int = 0
+
+    @property
+    def tokens_saved(self) -> int:
+        """Tokens the verbatim concatenation of the packed chunks would have cost extra."""
+        return max(0, self.raw_tokens - self.tokens)
+
+
+def repeated_heading(previous: List[str], following: List[str]) -> int:
+    """1 if `following` starts with the heading of the section `previous` ends in, else 0."""
+    if not following or not HEADING.match(following[0].rstrip()):
+        return 0
+    current = next((line for line in reversed(previous) if HEADING.match(line.rstrip())), None)
+    return 1 if current is not None and current.rstrip() == following[0].rstrip() else 0
+
+
+def format_block(source: str, content: str) -> str:
+    return f"[Source: {source}]\n{content}"
+
+
+def _merge_blocks(chunks: List[Dict]) -> List[Dict]:
+    """
+    Merge adjacent chunks (same source, consecutive chunk_index) into blocks.
+
+    Blocks are returned in order of their best-ranked chunk.
+    """
+    ordered = sorted(
+        enumerate(chunks),
+        key=lambda item: (item[1]["source"], item[1].get("chunk_index", -1), item[0])
+    )
+    blocks = []
+    for rank, chunk in ordered:
+        lines = chunk["content"].split("\n")
+        last = blocks[-1] if blocks else None
+        index = chunk.get("chunk_index")
+        if (last is not None and index is not None and last["source"] == chunk["source"]
+                and last["chunk_index"] is not None and index == last["chunk_index"] + 1):
+            last["lines"].extend(lines[repeated_heading(last["lines"], lines):])
+            last["chunk_index"] = index
+            last["rank"] = min(last["rank"], rank)
+            last["ids"].append(chunk.get("id", ""))
+        else:
+            blocks.append({"source": chunk["source"], "chunk_index": index, "lines": lines,
+                           "rank": rank, "ids": [chunk.get("id", "")]})
+    blocks.sort(key=lambda block: block["rank"])
+    return blocks
+
+
+def _render(blocks: List[Dict]) -> str:
+    return BLOCK_SEPARATOR.join(format_block(b["source"], "\n".join(b["lines"])) for b in blocks)
+
+
+def pack_context(chunks: List[Dict], token_budget: int, max_chunks: Optional[int] = None) -> PackedContext:
+    """
+    Assemble chunks into a prompt context within a token budget.
+
+    Args:
+        chunks: Dicts with content, source, and optionally id and chunk_index,
+            best first
+        token_budget: Maximum estimated tokens for the assembled context
+        max_chunks: Optional cap on the number of chunks used
+
+    Returns:
+        PackedContext with the merged text, sources and token accounting
+    """
+    selected: List[Dict] = []
+    blocks: List[Dict] = []
+    dropped = 0
+    for chunk in chunks:
+        if max_chunks is not None and len(selected) >= max_chunks:
+            dropped += 1
+            continue
+        candidate = _merge_blocks(selected + [chunk])
+        if estimate_tokens(_render(candidate)) > token_budget and selected:
+            dropped += 1
+            continue
+        selected.append(chunk)
+        blocks = candidate
+
+    text = _render(blocks)
+    raw = BLOCK_SEPARATOR.join(format_block(c["source"], c["content"]) for c in selected)
+    sources = []
+    for block in blocks:
+        if block["source"] not in sources:
+            sources.append(block["source"])
+    return PackedContext(
+        text=text,
+        sources=sources,
+        chunk_ids=[chunk_id for block in blocks for chunk_id in block["ids"]],
+        tokens=estimate_tokens(text),
+        raw_tokens=estimate_tokens(raw),
+        dropped=dropped,
+    )
@@ -0,0 +1,230 @@
+"""
+Content-addressed embedding cache.
+
+Embeddings are keyed by (model, dimensions, sha256(text)) so identical text is
+only ever sent to the embedding API once. A small in-memory LRU sits in front
+of a SQLite store that survives restarts; both tiers are size-bounded.
+"""
+
+import os
+import asyncio
+import sqlite3
+import hashlib
+import threading
+from array import array
+from pathlib import Path
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, List, Optional
+
+
+def cache_key(model: str, text: str, dimensions: Optional[int] = None) -> str:
+    """Build the content-addressed key for a piece of text."""
+    digest = hashlib.sha256(text.encode("utf-8")).hexdigest()
+    return f"{model}:{dimensions or 0}:{digest}"
+
+
+def _unpack(blob: bytes) -> array:
+    values = array("f")
+    values.frombytes(blob)
+    return values
+
+
+class EmbeddingCache:
+    """
+    Two-tier (memory LRU + SQLite) embedding cache with hit/miss counters.
+
+    Safe to share across threads; all SQLite access is serialized by a lock.
+    """
+
+    def __init__(self, path: str = None, max_memory_items: int = 2048, max_disk_items: int = 100000):
+        """
+        Initialize the cache.
+
+        Args:
+            path: SQLite file for the persistent tier (None or ":memory:" disables persistence)
+            max_memory_items: Entries kept in the in-process LRU
+            max_disk_items: Entries kept on disk before least-recently-used eviction
+        """
+        self.path = path or ":memory:"
+        self.max_memory_items = max_memory_items
+        self.max_disk_items = max_disk_items
+        # Vectors are held as float32 arrays to keep the LRU compact
+        self._memory: "OrderedDict[str, array]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._clock = 0
+        self.hits = 0
+        self.misses = 0
+        self.disk_hits = 0
+        self.evictions = 0
+
+        if self.path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            " key TEXT PRIMARY KEY, vector BLOB NOT NULL, last_used INTEGER NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_last_used ON embeddings(last_used)")
+        row = self._conn.execute("SELECT COALESCE(MAX(last_used), 0) FROM embeddings").fetchone()
+        self._clock = row[0]
+        self._conn.commit()
+
+    def _remember(self, key: str, vector: array):
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_items:
+            self._memory.popitem(last=False)
+
+    def get_many(self, keys: List[str]) -> Dict[str, List[float]]:
+        """Return cached vectors for the given keys (missing keys are omitted)."""
+        found = {}
+        with self._lock:
+            pending = []
+            for key in keys:
+                if key in self._memory:
+                    self._memory.move_to_end(key)
+                    found[key] = self._memory[key].tolist()
+                elif key not in found:
+                    pending.append(key)
+
+            if pending:
+                self._clock += 1
+                for start in range(0, len(pending), 500):
+                    batch = pending[start:start + 500]
+                    placeholders = ",".join("?" * len(batch))
+                    rows = self._conn.execute(
+                        f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", batch
+                    ).fetchall()
+                    for key, blob in rows:
+                        vector = _unpack(blob)
+                        found[key] = vector.tolist()
+                        self._remember(key, vector)
+                        self.disk_hits += 1
+                    if rows:
+                        self._conn.executemany(
+                            "UPDATE embeddings SET last_used = ? WHERE key = ?",
+                            [(self._clock, key) for key, _ in rows]
+                        )
+                self._conn.commit()
+
+            for key in keys:
+                if key in found:
+                    self.hits += 1
+                else:
+                    self.misses += 1
+        return found
+
+    def put_many(self, items: Dict[str, List[float]]):
+        """Store vectors in both tiers, evicting the least recently used on disk."""
+        if not items:
+            return
+        with self._lock:
+            self._clock += 1
+            rows = []
+            for key, vector in items.items():
+                packed = array("f", vector)
+                self._remember(key, packed)
+                rows.append((key, packed.tobytes(), self._clock))
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vector, last_used) VALUES (?, ?, ?)", rows
+            )
+            count = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+            overflow = count - self.max_disk_items
+            if overflow > 0:
+                self._conn.execute(
+                    "DELETE FROM embeddings WHERE key IN ("
+                    " SELECT key FROM embeddings ORDER BY last_used ASC LIMIT ?)",
+                    (overflow,)
+                )
+                self.evictions += overflow
+            self._conn.commit()
+
+    def stats(self) -> Dict:
+        """Hit/miss counters and tier sizes."""
+        with self._lock:
+            disk_items = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "disk_hits": self.disk_hits,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "memory_items": len(self._memory),
+                "disk_items": disk_items,
+                "evictions": self.evictions,
+            }
+
+
+def cached_embeddings(
+    texts: List[str],
+    model: str,
+    embed_fn: Callable[[List[str]], List[List[float]]],
+    cache: EmbeddingCache,
+    dimensions: Optional[int] = None,
+) -> List[List[float]]:
+    """
+    Return embeddings for texts, calling embed_fn only for cache misses.
+
+    Duplicate texts within one call are embedded once. Output order matches input.
+    """
+    keys = [cache_key(model, text, dimensions) for text in texts]
+    found = cache.get_many(keys)
+
+    missing = {}
+    for key, text in zip(keys, texts):
+        if key not in found and key not in missing:
+            missing[key] = text
+
+    if missing:
+        vectors = embed_fn(list(missing.values()))
+        fresh = dict(zip(missing.keys(), vectors))
+        cache.put_many(fresh)
+        found.update(fresh)
+
+    return [found[key] for key in keys]
+
+
+async def acached_embeddings(
+    texts: List[str],
+    model: str,
+    embed_fn: Callable[[List[str]], Awaitable[List[List[float]]]],
+    cache: EmbeddingCache,
+    dimensions: Optional[int] = None,
+) -> List[List[float]]:
+    """
+    Async variant of cached_embeddings for use on the event loop.
+
+    SQLite lookups and writes run in a worker thread; embed_fn is awaited.
+    """
+    keys = [cache_key(model, text, dimensions) for text in texts]
+    found = await asyncio.to_thread(cache.get_many, keys)
+
+    missing = {}
+    for key, text in zip(keys, texts):
+        if key not in found and key not in missing:
+            missing[key] = text
+
+    if missing:
+        vectors = await embed_fn(list(missing.values()))
+        fresh = dict(zip(missing.keys(), vectors))
+        await asyncio.to_thread(cache.put_many, fresh)
+        found.update(fresh)
+
+    return [found[key] for key in keys]
+
+
+_default_cache: Optional[EmbeddingCache] = None
+_default_lock = threading.Lock()
+
+
+def get_default_cache() -> EmbeddingCache:
+    """Process-wide cache configured from EMBEDDING_CACHE_* environment variables."""
+    global _default_cache
+    with _default_lock:
+        if _default_cache is None:
+            _default_cache = EmbeddingCache(
+                path=os.getenv("EMBEDDING_CACHE_PATH", str(Path(__file__).parent / "embedding_cache.sqlite3")),
+                max_memory_items=int(os.getenv("EMBEDDING_CACHE_MEMORY_ITEMS", "2048")),
+                max_disk_items=int(os.getenv("EMBEDDING_CACHE_DISK_ITEMS", "100000")),
+            )
+        return _default_cache
@@ -0,0 +1,258 @@
+"""
+Manifest-driven incremental ingestion.
+
+Chunk ids are derived from the source name and chunk text, so an unchanged
+chunk keeps its id across runs. A manifest per collection (kept next to the
+Chroma data, see collection_versions.py) records each file's content hash
+and chunk ids; a run re-chunks only files whose hash changed, embeds and
+upserts only chunks the collection does not have, and deletes chunks that
+no longer exist. Re-running on an unchanged corpus makes no embedding calls.
+
+The manifest also records the chunker version (markdown_chunker
+CHUNKER_VERSION); when it differs every file is re-chunked. Chunks whose
+text is unchanged keep their embeddings and only get new metadata.
+
+The collection's `corpus_version` metadata (a hash of all chunk ids) changes
+whenever the content does and scopes the answer cache and derived indexes.
+
+Syncing streams: documents may reference a file by `path` instead of holding
+its `content`, chunkers may be generators, and new chunks are embedded and
+upserted a batch at a time, so memory stays bounded by one batch rather than
+the corpus. The manifest doubles as a checkpoint: it is saved periodically
+during a sync, and an interrupted run resumes without re-embedding chunks
+already written or re-chunking files already finished.
+"""
+
+import hashlib
+import json
+import time
+from collections import deque
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from markdown_chunker import CHUNKER_VERSION, chunk_markdown
+
+READ_BLOCK_SIZE = 1 << 20
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def document_hash(doc: Dict) -> str:
+    """content_hash of a document, streaming it from `path` when it has no `content`."""
+    if "content" in doc:
+        return content_hash(doc["content"])
+    digest = hashlib.sha256()
+    with open(doc["path"], "r") as f:
+        for block in iter(lambda: f.read(READ_BLOCK_SIZE), ""):
+            digest.update(block.encode("utf-8"))
+    return digest.hexdigest()
+
+
+def document_lines(doc: Dict) -> Iterator[str]:
+    """A document's lines, identical to content.split('\\n') but read lazily from `path` if needed."""
+    if "content" in doc:
+        yield from doc["content"].split("\n")
+        return
+    with open(doc["path"], "r") as f:
+        line = ""
+        for line in f:
+            yield line[:-1] if line.endswith("\n") else line
+        if line == "" or line.endswith("\n"):
+            yield ""
+
+
+def iter_chunk_ids(source: str, chunks: Iterable[Dict]) -> Iterator[Tuple[str, Dict]]:
+    """(id, chunk) pairs with stable ids from source + chunk text; repeats get an ordinal suffix."""
+    seen: Dict[str, int] = {}
+    for chunk in chunks:
+        base = "chunk_" + content_hash(f"{source}\0{chunk['content']}")[:24]
+        seen[base] = seen.get(base, 0) + 1
+        yield (base if seen[base] == 1 else f"{base}_{seen[base]}"), chunk
+
+
+def chunk_ids(source: str, chunks: List[Dict]) -> List[str]:
+    """Stable ids for a list of chunks (see iter_chunk_ids)."""
+    return [chunk_id for chunk_id, _ in iter_chunk_ids(source, chunks)]
+
+
+def corpus_version(collection) -> str:
+    """Content version of a collection (falls back to its id for collections built before manifests)."""
+    metadata = getattr(collection, "metadata", None) or {}
+    return metadata.get("corpus_version") or str(collection.id)
+
+
+def version_for_ids(ids) -> str:
+    """Corpus version for a set of chunk ids."""
+    return content_hash("\n".join(sorted(ids)))[:16]
+
+
+def find_regulations_dir() -> Optional[Path]:
+    """sample-regulations next to or above the prototype directory."""
+    script_dir = Path(__file__).parent
+    for regulations_dir in (script_dir.parent / "sample-regulations", script_dir / "sample-regulations"):
+        if regulations_dir.exists():
+            return regulations_dir
+    return None
+
+
+def load_kfund_documents(regulations_dir) -> List[Dict]:
+    """K Fund markdown files as documents with source and regulation_type metadata."""
+    documents = []
+    for file_path in sorted(Path(regulations_dir).glob("*.md")):
+        filename = file_path.stem
+        if 'K-Fund' not in filename and 'K_Fund' not in filename:
+            continue
+        with open(file_path, 'r') as f:
+            content = f.read()
+        documents.append({
+            'content': content,
+            'metadata': {'source': filename, 'regulation_type': 'K_FUND'}
+        })
+    return documents
+
+
+def chunk_regulation(doc: Dict) -> List[Dict]:
+    """Split one regulation document into section-aligned chunks (see markdown_chunker)."""
+    return list(chunk_markdown(document_lines(doc), doc['metadata']))
+
+
+def load_manifest(path) -> Dict:
+    path = Path(path)
+    if not path.exists():
+        return {"corpus_version": "", "chunker": "", "files": {}}
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_manifest(path, manifest: Dict):
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(".tmp")
+    with open(tmp, "w") as f:
+        json.dump(manifest, f, indent=2)
+    tmp.replace(path)
+
+
+def sync_collection(collection, documents: Iterable[Dict], chunk_fn: Callable[[Dict], Iterable[Dict]],
+                    embed_fn: Callable[[List[str]], List[List[float]]], manifest_path,
+                    progress: Optional[Callable[[str], None]] = None, batch_size: int = 1024,
+                    checkpoint_seconds: float = 30.0, chunk_map: Optional[Callable] = None,
+                    chunker: str = CHUNKER_VERSION) -> Dict:
+    """
+    Bring a collection in line with the given documents.
+
+    Args:
+        collection: Chroma collection to update in place
+        documents: Dicts with metadata (must include source) and either content or a path
+        chunk_fn: Splits one document into chunk dicts with content and metadata (may be a generator)
+        embed_fn: Embeds a list of texts
+        manifest_path: Where the file/chunk manifest is kept
+        progress: Optional callback receiving short progress messages
+        batch_size: New chunks embedded and upserted per step; at least
+            BatchEmbedder.parallel_batch_size so embed_fn can fan sub-batches out
+        checkpoint_seconds: Minimum interval between manifest checkpoints
+        chunk_map: Ordered map used to apply chunk_fn, e.g. parallel_chunking.pool_map()
+            to chunk in worker processes (chunk_fn must then be picklable); defaults to map
+        chunker: Version of chunk_fn's rules; a manifest written with another is ignored
+
+    Returns:
+        Counts of added, deleted, unchanged and re-chunked items, the new
+        corpus version and whether anything changed
+    """
+    manifest = load_manifest(manifest_path)
+    if manifest.get("chunker") != chunker:
+        manifest = {"corpus_version": manifest["corpus_version"], "chunker": chunker, "files": {}}
+    existing = set(collection.get(include=[])["ids"])
+    report = progress or (lambda message: None)
+
+    files = {}      # sources whose chunks are all written
+    chunked = {}    # sources fully chunked, some chunks possibly still in `pending`
+    desired = set()
+    pending: List[Tuple[str, Dict]] = []
+    moved: List[Tuple[str, Dict]] = []
+    counts = {"added": 0, "rechunked": 0, "documents": 0}
+    started = last_checkpoint = time.monotonic()
+
+    def flush():
+        if pending:
+            ids = [chunk_id for chunk_id, _ in pending]
+            texts = [chunk["content"] for _, chunk in pending]
+            collection.upsert(
+                ids=ids,
+                documents=texts,
+                embeddings=embed_fn(texts),
+                metadatas=[chunk["metadata"] for _, chunk in pending]
+            )
+            existing.update(ids)
+            counts["added"] += len(ids)
+            rate = counts["documents"] / max(time.monotonic() - started, 1e-9)
+            report(f"embedded {counts['added']} new chunks, {counts['documents']} files ({rate:.1f} docs/sec)")
+            pending.clear()
+        if moved:  # same text, position metadata shifted
+            collection.update(ids=[chunk_id for chunk_id, _ in moved], metadatas=[m for _, m in moved])
+            moved.clear()
+        files.update(chunked)
+        chunked.clear()
+
+    def checkpoint():
+        nonlocal last_checkpoint
+        if time.monotonic() - last_checkpoint >= checkpoint_seconds:
+            save_manifest(manifest_path, {"corpus_version": manifest["corpus_version"], "chunker": chunker,
+                                          "files": {**manifest["files"], **files}})
+            last_checkpoint = time.monotonic()
+
+    queued = deque()  # (source, digest) of documents handed to chunk_map, in order
+
+    def to_chunk():
+        for doc in documents:
+            counts["documents"] += 1
+            source = doc["metadata"]["source"]
+            digest = document_hash(doc)
+            entry = manifest["files"].get(source)
+            if entry and entry["sha256"] == digest and existing.issuperset(entry["chunks"]):
+                files[source] = entry
+                desired.update(entry["chunks"])
+                continue
+            queued.append((source, digest))
+            yield doc
+
+    for chunks in (chunk_map or map)(chunk_fn, to_chunk()):
+        source, digest = queued.popleft()
+        counts["rechunked"] += 1
+        ids = []
+        for chunk_id, chunk in iter_chunk_ids(source, chunks):
+            ids.append(chunk_id)
+            if chunk_id in existing:
+                moved.append((chunk_id, chunk["metadata"]))
+            else:
+                pending.append((chunk_id, chunk))
+            if len(pending) >= batch_size or len(moved) >= batch_size:
+                flush()
+                checkpoint()
+        desired.update(ids)
+        chunked[source] = {"sha256": digest, "chunks": ids}
+    flush()
+
+    stale = sorted(existing - desired)
+    for start in range(0, len(stale), batch_size):
+        collection.delete(ids=stale[start:start + batch_size])
+    rate = counts["documents"] / max(time.monotonic() - started, 1e-9)
+    report(f"{counts['rechunked']} files re-chunked, {counts['added']} new chunks embedded ({rate:.1f} docs/sec)")
+
+    version = version_for_ids(desired)
+    changed = version != (collection.metadata or {}).get("corpus_version")
+    if changed:
+        collection.modify(metadata={**(collection.metadata or {}), "corpus_version": version})
+    save_manifest(manifest_path, {"corpus_version": version, "chunker": chunker, "files": files})
+
+    return {
+        "added": counts["added"],
+        "deleted": len(stale),
+        "unchanged": len(desired) - counts["added"],
+        "files_rechunked": counts["rechunked"],
+        "docs_per_sec": round(rate, 1),
+        "corpus_version": version,
+        "changed": changed,
+    }
@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+"""
+Prebuilt index snapshots for instant cold starts.
+
+`python index_snapshot.py build` chunks and embeds sample-regulations/ once,
+offline, and writes a versioned snapshot directory:
+
+    embeddings.npy   normalized float32 matrix (memory-mapped at load)
+    chunks.json      chunk ids, texts and metadata
+    snapshot.json    format, corpus version, embedding model, chunker version,
+                     source file hashes and SHA-256 checksums of the two
+                     files above
+
+At startup the server loads a snapshot whose checksums verify and whose
+source hashes, embedding model and chunker version match the current corpus
+and code, and falls back to ingestion otherwise.
+
+Usage:
+    python index_snapshot.py build [--output index_snapshot]
+    python index_snapshot.py verify [--output index_snapshot]
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import sys
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+from incremental_ingest import (
+    chunk_ids, chunk_regulation, content_hash, find_regulations_dir, load_kfund_documents, version_for_ids
+)
+from markdown_chunker import CHUNKER_VERSION
+from vector_index import CHUNKS_FILE, EMBEDDINGS_FILE, NumpyVectorIndex
+
+SNAPSHOT_FILE = "snapshot.json"
+FORMAT_VERSION = 1
+DEFAULT_PATH = Path(__file__).parent / "index_snapshot"
+
+
+def file_sha256(path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def source_hashes(documents: List[Dict]) -> Dict[str, str]:
+    return {doc["metadata"]["source"]: content_hash(doc["content"]) for doc in documents}
+
+
+def build_snapshot(documents: List[Dict], chunk_fn: Callable[[Dict], List[Dict]],
+                   embed_fn: Callable[[List[str]], List[List[float]]], output,
+                   embedding_model: str, chunker: str = CHUNKER_VERSION) -> Dict:
+    """
+    Chunk, embed and write a snapshot.
+
+    `chunker` is the version of chunk_fn's rules, recorded so a snapshot
+    built with other chunking is not loaded.
+
+    The snapshot is written to a staging directory and swapped in with
+    renames: the previous snapshot is moved aside, the new one renamed into
+    place, and only then is the old one deleted. A crash mid-swap leaves the
+    previous snapshot at `<output>.old`, which the next build restores first.
+
+    Returns:
+        The snapshot metadata written to snapshot.json
+    """
+    output = Path(output)
+    staging = output.with_name(output.name + ".tmp")
+    previous = output.with_name(output.name + ".old")
+    if previous.exists():
+        if output.exists():
+            shutil.rmtree(previous)
+        else:
+            previous.rename(output)
+
+    ids, texts, metadatas = [], [], []
+    for doc in documents:
+        chunks = chunk_fn(doc)
+        ids.extend(chunk_ids(doc["metadata"]["source"], chunks))
+        texts.extend(chunk["content"] for chunk in chunks)
+        metadatas.extend(chunk["metadata"] for chunk in chunks)
+
+    version = version_for_ids(ids)
+    index = NumpyVectorIndex(ids, texts, metadatas, embed_fn(texts), id=version)
+
+    if staging.exists():
+        shutil.rmtree(staging)
+    index.save(staging)
+    meta = {
+        "format": FORMAT_VERSION,
+        "version": version,
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "embedding_model": embedding_model,
+        "chunker": chunker,
+        "dimensions": int(index.embeddings.shape[1]) if index.count() else 0,
+        "chunk_count": index.count(),
+        "sources": source_hashes(documents),
+        "checksums": {name: file_sha256(staging / name) for name in (EMBEDDINGS_FILE, CHUNKS_FILE)},
+    }
+    with open(staging / SNAPSHOT_FILE, "w") as f:
+        json.dump(meta, f, indent=2)
+
+    if output.exists():
+        output.rename(previous)
+    staging.rename(output)
+    if previous.exists():
+        shutil.rmtree(previous)
+    return meta
+
+
+def check_snapshot(path, documents: Optional[List[Dict]] = None, embedding_model: Optional[str] = None,
+                   verify: bool = True, chunker: str = CHUNKER_VERSION) -> Tuple[Optional[Dict], str]:
+    """
+    Validate a snapshot without loading it.
+
+    Returns:
+        (metadata, "") when usable, otherwise (None, reason)
+    """
+    path = Path(path)
+    if not (path / SNAPSHOT_FILE).exists():
+        return None, f"no snapshot at {path}"
+    with open(path / SNAPSHOT_FILE) as f:
+        meta = json.load(f)
+    if meta.get("format") != FORMAT_VERSION:
+        return None, f"unsupported snapshot format {meta.get('format')}"
+    if embedding_model and meta.get("embedding_model") != embedding_model:
+        return None, f"built with {meta.get('embedding_model')}, server uses {embedding_model}"
+    if meta.get("chunker") != chunker:
+        return None, "chunking rules changed since the snapshot was built"
+    if documents is not None and meta.get("sources") != source_hashes(documents):
+        return None, "regulation files changed since the snapshot was built"
+    if verify:
+        for name, expected in meta.get("checksums", {}).items():
+            if not (path / name).exists() or file_sha256(path / name) != expected:
+                return None, f"checksum mismatch for {name}"
+    return meta, ""
+
+
+def load_snapshot(path, documents: Optional[List[Dict]] = None, embedding_model: Optional[str] = None,
+                  verify: bool = True, chunker: str = CHUNKER_VERSION) -> Tuple[Optional[NumpyVectorIndex], str]:
+    """
+    Load a valid, current snapshot memory-mapped.
+
+    Returns:
+        (index, "") or (None, reason the snapshot was not used)
+    """
+    meta, reason = check_snapshot(path, documents, embedding_model, verify, chunker)
+    if meta is None:
+        return None, reason
+    index = NumpyVectorIndex.load(path, mmap=True)
+    if index.id != meta["version"] or index.count() != meta["chunk_count"]:
+        return None, "snapshot contents do not match its metadata"
+    return index, ""
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=["build", "verify"])
+    parser.add_argument("--output", default=os.getenv("SNAPSHOT_PATH", str(DEFAULT_PATH)))
+    args = parser.parse_args()
+
+    embedding_model = os.getenv("EMBEDDING_MODEL", "text-embedding-3-small")
+    regulations_dir = find_regulations_dir()
+    documents = load_kfund_documents(regulations_dir) if regulations_dir else []
+    if not documents:
+        print("⚠️ No K Fund documents found")
+        sys.exit(1)
+
+    if args.command == "verify":
+        meta, reason = check_snapshot(args.output, documents, embedding_model)
+        if meta is None:
+            print(f"❌ Snapshot not usable: {reason}")
+            sys.exit(1)
+        print(f"✅ Snapshot {meta['version']} is current ({meta['chunk_count']} chunks)")
+        return
+
+    from ingest_documents import get_embeddings
+
+    start = time.perf_counter()
+    meta = build_snapshot(documents, chunk_regulation, get_embeddings, args.output, embedding_model)
+    print(f"✅ Built snapshot {meta['version']}: {meta['chunk_count']} chunks x {meta['dimensions']} dims "
+          f"in {time.perf_counter() - start:.1f}s -> {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -5,33 +5,62 @@ Run this first to load the documents.
 """
 
 import os
+import resource
+import time
 import chromadb
 from pathlib import Path
 from dotenv import load_dotenv
 from openai import OpenAI
+from embedding_cache import cached_embeddings, get_default_cache
+from bm25_index import BM25Index
+from collection_versions import build_and_swap
+from incremental_ingest import document_lines
+from parallel_chunking import pool_map
+from markdown_chunker import chunk_markdown
+from batch_embedder import from_env as batch_embedder_from_env
 
 load_dotenv()
 
 # Initialize OpenAI client for embeddings
 openai_client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
 
-def get_embeddings(texts: list) -> list:
-    """Get embeddings for a list of texts using OpenAI API."""
-    response = openai_client.embeddings.create(
+# BatchEmbedder is the only retry layer for embeddings, so the SDK must not retry too
+_embed_client = openai_client.with_options(max_retries=0)
+
+def _embed_request(texts: list) -> list:
+    """One OpenAI embeddings request, without retries."""
+    response = _embed_client.embeddings.create(
         model=os.getenv("EMBEDDING_MODEL", "text-embedding-3-small"),
         input=texts
     )
     return [item.embedding for item in response.data]
 
+# Splits large inputs by count/tokens and embeds sub-batches concurrently with retries
+_embed_uncached = batch_embedder_from_env(_embed_request)
+
+def get_embeddings(texts: list) -> list:
+    """Get embeddings for a list of texts, reusing cached vectors for unchanged chunks."""
+    return cached_embeddings(
+        texts,
+        model=os.getenv("EMBEDDING_MODEL", "text-embedding-3-small"),
+        embed_fn=_embed_uncached,
+        cache=get_default_cache()
+    )
+
 def load_regulation_files():
-    """Load ONLY K Fund regulation markdown files."""
+    """
+    List ONLY K Fund regulation markdown files.
+
+    Documents carry a path rather than their content; files are read line by
+    line while chunking so a large dump is never held in memory at once.
+    """
     # Try both paths (running from prototype/ or from root)
     regulations_dir = Path("../sample-regulations")
     if not regulations_dir.exists():
         regulations_dir = Path("sample-regulations")
     documents = []
     
-    for file_path in regulations_dir.glob("*.md"):
+    for file_path in sorted(regulations_dir.glob("*.md")):
         filename = file_path.stem
         
         # ONLY load K Fund related documents
@@ -39,11 +68,8 @@ def load_regulation_files():
             print(f"   Skipping non-K-Fund file: {filename}")
             continue
         
-        with open(file_path, 'r') as f:
-            content = f.read()
-        
         documents.append({
-            'content': content,
+            'path': file_path,
             'metadata': {
                 'source': filename,
                 'regulation_type': 'K_FUND',
@@ -53,41 +79,13 @@ def load_regulation_files():
     
     return documents
 
-def chunk_document(content, metadata, chunk_size=1000, overlap=200):
-    """Split document into overlapping chunks."""
-    chunks = []
-    lines = content.split('\n')
-    current_chunk = []
-    current_size = 0
-    
-    for line in lines:
-        line_size = len(line)
-        
-        if current_size + line_size > chunk_size and current_chunk:
-            # Save current chunk
-            chunk_text = '\n'.join(current_chunk)
-            chunks.append({
-                'content': chunk_text,
-                'metadata': {**metadata, 'chunk_index': len(chunks)}
-            })
-            
-            # Start new chunk with overlap
-            overlap_lines = current_chunk[-3:] if len(current_chunk) > 3 else current_chunk
-            current_chunk = overlap_lines + [line]
-            current_size = sum(len(l) for l in current_chunk)
-        else:
-            current_chunk.append(line)
-            current_size += line_size
-    
-    # Add final chunk
-    if current_chunk:
-        chunk_text = '\n'.join(current_chunk)
-        chunks.append({
-            'content': chunk_text,
-            'metadata': {**metadata, 'chunk_index': len(chunks)}
-        })
-    
-    return chunks
+def iter_file_chunks(doc):
+    """Read and chunk one document lazily."""
+    return chunk_markdown(document_lines(doc), doc['metadata'])
+
+def chunk_file(doc):
+    """iter_file_chunks as a list, for worker processes."""
+    return list(iter_file_chunks(doc))
 
 def main():
     print("🚀 Starting document ingestion...")
@@ -98,48 +96,46 @@ def main():
     client = chromadb.PersistentClient(path=str(chroma_path))
     print(f"   Using ChromaDB at: {chroma_path}")
     
-    # Get or create collection (no embedding function - we'll provide embeddings directly)
-    try:
-        client.delete_collection("compliance_regulations")
-    except:
-        pass
-    
-    collection = client.create_collection(
-        name="compliance_regulations",
-        metadata={"description": "K Fund guidelines and representational expense policies"}
-    )
-    
     # Load and process documents
     print("📄 Loading regulation files...")
     documents = load_regulation_files()
     print(f"   Found {len(documents)} regulation files")
     
-    # Chunk and add to database
-    all_chunks = []
-    for doc in documents:
-        chunks = chunk_document(doc['content'], doc['metadata'])
-        all_chunks.extend(chunks)
-    
-    print(f"✂️  Created {len(all_chunks)} chunks")
-    
-    # Add to ChromaDB with embeddings
-    print("💾 Adding to vector database...")
-    
-    # Get embeddings for all chunks
-    print("🔢 Generating embeddings...")
-    chunk_texts = [chunk['content'] for chunk in all_chunks]
-    embeddings = get_embeddings(chunk_texts)
-    
-    collection.add(
-        documents=chunk_texts,
-        embeddings=embeddings,
-        metadatas=[chunk['metadata'] for chunk in all_chunks],
-        ids=[f"chunk_{i}" for i in range(len(all_chunks))]
+    # Build the next collection version (seeded from the live one, so only new
+    # or changed chunks are embedded) and switch the alias once it validates.
+    # A running API server keeps answering from the live version meanwhile.
+    # Files are read and chunked in worker processes that feed embedding as
+    # they finish (a single worker streams each file instead); an interrupted
+    # run resumes from its checkpoint.
+    workers = min(int(os.getenv("INGEST_WORKERS", "0")) or os.cpu_count() or 1, len(documents))
+    print(f"🔢 Syncing chunks and embeddings ({workers} chunking workers)...")
+    started = time.perf_counter()
+    stats = build_and_swap(
+        client, documents,
+        chunk_fn=chunk_file if workers > 1 else iter_file_chunks,
+        chunk_map=pool_map(workers),
+        embed_fn=get_embeddings,
+        batch_size=_embed_uncached.parallel_batch_size,
+        base_path=chroma_path,
+        metadata={"description": "K Fund guidelines and representational expense policies"},
+        progress=lambda message: print(f"   {message}")
     )
+    elapsed = time.perf_counter() - started
+    print(f"   {stats['added']} chunks embedded, {stats['deleted']} removed, {stats['unchanged']} unchanged")
+    print(f"   {len(documents)} files in {elapsed:.1f}s ({len(documents) / max(elapsed, 1e-9):.1f} docs/sec)")
+    collection = client.get_collection(stats['name'])
+    
+    # Lexical index for hybrid search, stored next to the Chroma data
+    bm25_path = chroma_path / "bm25_index.json"
+    if stats['swapped'] or not bm25_path.exists():
+        print("🔤 Building BM25 index...")
+        BM25Index.from_collection(collection).save(bm25_path)
     
-    print(f"✅ Successfully ingested {len(all_chunks)} chunks into ChromaDB")
+    print(f"✅ Ingestion complete (corpus version {stats['corpus_version']})")
     print(f"   Collection: {collection.name}")
     print(f"   Total items: {collection.count()}")
+    print(f"   Embedding cache: {get_default_cache().stats()}")
+    print(f"   Peak memory: {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss // 1024} MB")
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,28 @@
+"""
+Shared fixtures for the ingestion tests (not a test module itself).
+"""
+
+
+def paragraph_chunks(doc):
+    """One chunk per blank-line separated paragraph."""
+    return [
+        {"content": text, "metadata": {**doc["metadata"], "chunk_index": i}}
+        for i, text in enumerate(doc["content"].split("\n\n"))
+    ]
+
+
+class CountingEmbedder:
+    """Deterministic embedder that records how often and on what it was called."""
+
+    def __init__(self):
+        self.calls = 0
+        self.texts = []
+
+    def __call__(self, texts):
+        self.calls += 1
+        self.texts.extend(texts)
+        return [[float(len(t)), 1.0, 0.0] for t in texts]
+
+
+def doc(source, content):
+    return {"content": content, "metadata": {"source": source, "regulation_type": "K_FUND"}}
@@ -0,0 +1,76 @@
+"""
+Metadata filters for retrieval, applied inside the index query.
+
+A filter restricts a search to part of the corpus (a regulation type,
+source document or section) before top-k is taken, so every returned slot
+is a usable hit instead of one discarded afterwards. Filters are expressed
+once as a Chroma `where` clause; the NumPy and BM25 indexes evaluate the
+same clause against chunk metadata with `matches`.
+"""
+
+import json
+from typing import Dict, Optional
+
+FILTER_FIELDS = ("regulation_type", "source", "section")
+
+
+def build_where(filters: Optional[Dict]) -> Optional[Dict]:
+    """
+    Chroma `where` clause for {field: value or [values]} filters.
+
+    Empty values are ignored; several fields are combined with $and.
+    Returns None when nothing is filtered.
+    """
+    conditions = []
+    for field in FILTER_FIELDS:
+        value = (filters or {}).get(field)
+        if value is None or value == "" or value == []:
+            continue
+        if isinstance(value, (list, tuple)):
+            values = list(dict.fromkeys(str(v) for v in value))
+            conditions.append({field: {"$in": values}} if len(values) > 1 else {field: values[0]})
+        else:
+            conditions.append({field: str(value)})
+    if not conditions:
+        return None
+    return conditions[0] if len(conditions) == 1 else {"$and": conditions}
+
+
+def where_key(where: Optional[Dict]) -> str:
+    """Stable string for a where clause ("" for none), for cache keys."""
+    return json.dumps(where, sort_keys=True) if where else ""
+
+
+def _match_value(value, condition) -> bool:
+    if not isinstance(condition, dict):
+        return value == condition
+    for op, operand in condition.items():
+        if op == "$eq":
+            ok = value == operand
+        elif op == "$ne":
+            ok = value != operand
+        elif op == "$in":
+            ok = value in operand
+        elif op == "$nin":
+            ok = value not in operand
+        else:
+            raise ValueError(f"Unsupported filter operator: {op}")
+        if not ok:
+            return False
+    return True
+
+
+def matches(metadata: Dict, where: Optional[Dict]) -> bool:
+    """True if chunk metadata satisfies a where clause (the subset build_where produces, plus $or)."""
+    if not where:
+        return True
+    for key, condition in where.items():
+        if key == "$and":
+            ok = all(matches(metadata, clause) for clause in condition)
+        elif key == "$or":
+            ok = any(matches(metadata, clause) for clause in condition)
+        else:
+            ok = _match_value(metadata.get(key), condition)
+        if not ok:
+            return False
+    return True
@@ -0,0 +1,51 @@
+"""
+Process-pool parsing and chunking for large ingestion runs.
+
+Reading and chunking files (markdown_chunker) is CPU-bound Python, so
+for a large library they run in worker processes. `ordered_map` keeps a
+bounded number of documents in flight and yields their chunks in input
+order; the embedding stage (sync_collection) consumes them as they arrive,
+so chunking overlaps embedding and a slow embedder applies backpressure
+instead of letting parsed documents pile up.
+"""
+
+import multiprocessing
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Iterable, Iterator, Optional, TypeVar
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+def ordered_map(fn: Callable[[T], R], items: Iterable[T], workers: int,
+                window: Optional[int] = None) -> Iterator[R]:
+    """
+    Like map(fn, items), computed in a process pool with at most `window`
+    items in flight. Falls back to plain map for a single worker.
+
+    fn must be a picklable module-level function.
+    """
+    if workers <= 1:
+        yield from map(fn, items)
+        return
+    window = window or workers * 2
+    # spawn: forking a parent that already runs embedding/Chroma threads can deadlock
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+        in_flight = deque()
+        for item in items:
+            in_flight.append(pool.submit(fn, item))
+            if len(in_flight) >= window:
+                yield in_flight.popleft().result()
+        while in_flight:
+            yield in_flight.popleft().result()
+
+
+def pool_map(workers: Optional[int] = None) -> Callable[[Callable[[T], R], Iterable[T]], Iterator[R]]:
+    """A map function for sync_collection's chunk_map, sized from INGEST_WORKERS or the CPU count."""
+    if workers is None:
+        workers = int(os.getenv("INGEST_WORKERS", "0")) or os.cpu_count() or 1
+    return lambda fn, items: ordered_map(fn, items, workers)
+
@@ -0,0 +1,65 @@
+"""
+Prompt layout for provider-side prefix caching.
+
+Providers cache the longest previously seen prompt prefix (OpenAI from 1024
+tokens up), so every chat completion is assembled from the most stable part
+to the most variable one:
+
+    1. system prompt                      (identical for every call of a kind)
+    2. canonical K Fund rules block       (always/never allowable rule sets)
+    3. retrieved guideline context        (identical for repeat items)
+    4. per-request variables              (item, cost, guest counts, question)
+"""
+
+import re
+from pathlib import Path
+from typing import Dict, List
+
+RULES_FILE = "K-Fund-Line-Item-Rules.md"
+
+
+def load_rules_block(path) -> str:
+    """
+    The "Always Allowable" and "Never Allowable" rule sets from
+    K-Fund-Line-Item-Rules.md, or "" if the file is missing.
+    """
+    path = Path(path)
+    if not path.exists():
+        return ""
+    text = path.read_text()
+    match = re.search(r"^## Rule Set 1:.*?(?=^## Rule Set 3:|\Z)", text, re.MULTILINE | re.DOTALL)
+    block = match.group(0) if match else text
+    return block.strip().rstrip("-").strip()
+
+
+def find_rules_file() -> Path:
+    """Locate K-Fund-Line-Item-Rules.md next to or above the prototype directory."""
+    script_dir = Path(__file__).parent
+    for regulations_dir in (script_dir.parent / "sample-regulations", script_dir / "sample-regulations"):
+        if (regulations_dir / RULES_FILE).exists():
+            return regulations_dir / RULES_FILE
+    return script_dir.parent / "sample-regulations" / RULES_FILE
+
+
+def build_messages(system_prompt: str, rules_block: str, context_label: str, context: str,
+                   variables: str) -> List[Dict]:
+    """Chat messages ordered stable-first: system + rules, then context, then variables."""
+    system = system_prompt
+    if rules_block:
+        system = f"{system_prompt}\n\nCanonical K Fund line item rules:\n{rules_block}"
+    return [
+        {"role": "system", "content": system},
+        {"role": "user", "content": f"{context_label}:\n{context}\n\n{variables}"}
+    ]
+
+
+def usage_tokens(usage) -> Dict[str, int]:
+    """Prompt, cached-prompt and completion token counts from a response's usage field."""
+    if usage is None:
+        return {"prompt_tokens": 0, "cached_tokens": 0, "completion_tokens": 0}
+    details = getattr(usage, "prompt_tokens_details", None)
+    return {
+        "prompt_tokens": getattr(usage, "prompt_tokens", 0) or 0,
+        "cached_tokens": (getattr(details, "cached_tokens", 0) or 0) if details is not None else 0,
+        "completion_tokens": getattr(usage, "completion_tokens", 0) or 0,
+    }
@@ -9,6 +9,7 @@ import chromadb
 from chromadb.utils import embedding_functions
 from openai import OpenAI
 from dotenv import load_dotenv
+from collection_versions import read_alias
 
 load_dotenv()
 
@@ -24,8 +25,10 @@ def search_regulations(query, n_results=5):
         model_name=os.getenv("EMBEDDING_MODEL", "text-embedding-3-small")
     )
     
+    # Ingestion keeps versioned collections; search the one the alias points at
+    alias = read_alias("./chroma_db")
     collection = client.get_collection(
-        name="compliance_regulations",
+        name=alias["name"] if alias else "compliance_regulations",
         embedding_function=openai_ef
     )
     
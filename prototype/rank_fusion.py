@@ -0,0 +1,70 @@
+"""
+Reciprocal rank fusion of multi-query search results.
+
+Classification searches several phrasings of the same line item. Hits are
+keyed by their chunk id, and each chunk scores sum(1 / (k + rank)) over the
+queries that returned it, so chunks found near the top by several queries
+win. The per-hit relevance score breaks ties.
+"""
+
+from typing import Dict, List, Optional
+
+import numpy as np
+
+RRF_K = 60
+
+
+def reciprocal_rank_fusion(results: Dict, relevance: Optional[List[List[float]]] = None,
+                           k: int = RRF_K, limit: Optional[int] = None) -> List[Dict]:
+    """
+    Fuse a Chroma-shaped multi-query result into one ranked, de-duplicated list.
+
+    Args:
+        results: Query result with ids/documents/metadatas per query
+        relevance: Optional relevance score per hit, aligned with results
+        k: RRF damping constant
+        limit: Keep only the best `limit` chunks
+
+    Returns:
+        Chunk dicts (id, content, source, chunk_index, metadata, score,
+        relevance, hits), best first
+    """
+    ids, queries, ranks = [], [], []
+    documents, metadatas = {}, {}
+    for q, row in enumerate(results["ids"]):
+        for rank, chunk_id in enumerate(row):
+            ids.append(chunk_id)
+            queries.append(q)
+            ranks.append(rank)
+            documents.setdefault(chunk_id, results["documents"][q][rank])
+            metadatas.setdefault(chunk_id, results["metadatas"][q][rank])
+    if not ids:
+        return []
+
+    unique_ids, inverse = np.unique(np.asarray(ids, dtype=object), return_inverse=True)
+    rrf = np.bincount(inverse, weights=1.0 / (k + np.asarray(ranks) + 1), minlength=len(unique_ids))
+    hits = np.bincount(inverse, minlength=len(unique_ids))
+    best = np.zeros(len(unique_ids))
+    if relevance is not None:
+        flat = np.asarray([relevance[q][r] for q, r in zip(queries, ranks)], dtype=float)
+        best = np.full(len(unique_ids), -np.inf)
+        np.maximum.at(best, inverse, flat)
+
+    order = np.lexsort((-best, -rrf))
+    if limit is not None:
+        order = order[:limit]
+    fused = []
+    for i in order:
+        chunk_id = unique_ids[i]
+        meta = metadatas[chunk_id]
+        fused.append({
+            "id": chunk_id,
+            "content": documents[chunk_id],
+            "source": meta.get("source", ""),
+            "chunk_index": meta.get("chunk_index"),
+            "metadata": meta,
+            "score": float(rrf[i]),
+            "relevance": float(best[i]),
+            "hits": int(hits[i]),
+        })
+    return fused
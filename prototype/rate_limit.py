@@ -0,0 +1,119 @@
+"""
+Shared rate-limit handling for model provider calls.
+
+When any worker receives a 429, every worker sharing the gate pauses until the
+provider's Retry-After deadline instead of hammering the API in parallel.
+Other transient errors (server errors, timeouts, dropped connections) are
+retried by the failing caller alone. Clients behind the gate should be built
+with max_retries=0 so the SDK does not retry underneath it.
+"""
+
+import asyncio
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Callable, Optional
+
+
+def retry_after_seconds(error: Exception) -> Optional[float]:
+    """Extract the Retry-After delay (in seconds) from a provider error, if present."""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+
+    retry_after_ms = headers.get("retry-after-ms")
+    if retry_after_ms:
+        try:
+            return float(retry_after_ms) / 1000.0
+        except ValueError:
+            pass
+
+    retry_after = headers.get("retry-after")
+    if not retry_after:
+        return None
+    try:
+        return float(retry_after)
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(retry_after).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def is_rate_limited(error: Exception) -> bool:
+    """True for HTTP 429 errors from the model provider."""
+    return getattr(error, "status_code", None) == 429
+
+
+TRANSIENT_STATUS_CODES = {408, 409, 429, 500, 502, 503, 504}
+TRANSIENT_ERROR_NAMES = {"APIConnectionError", "APITimeoutError"}
+
+
+def is_transient(error: Exception) -> bool:
+    """True for errors worth retrying: throttling, server errors, timeouts and dropped connections."""
+    if getattr(error, "status_code", None) in TRANSIENT_STATUS_CODES:
+        return True
+    if isinstance(error, (ConnectionError, TimeoutError)):
+        return True
+    return any(cls.__name__ in TRANSIENT_ERROR_NAMES for cls in type(error).__mro__)
+
+
+class RateLimitGate:
+    """
+    Process-wide pause shared by all workers calling the same provider.
+
+    Args:
+        max_retries: Retries after the first 429 or transient error before it is raised
+        base_delay: Backoff used when the provider sends no Retry-After header
+        max_delay: Upper bound on any single pause
+    """
+
+    def __init__(self, max_retries: int = 5, base_delay: float = 1.0, max_delay: float = 60.0):
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._resume_at = 0.0
+        self._lock = threading.Lock()
+        self.throttled = 0
+
+    def pause_for(self, seconds: float):
+        """Hold every caller until `seconds` from now (never shortens an existing pause)."""
+        with self._lock:
+            self._resume_at = max(self._resume_at, time.monotonic() + seconds)
+            self.throttled += 1
+
+    def delay_remaining(self) -> float:
+        with self._lock:
+            return max(0.0, self._resume_at - time.monotonic())
+
+    def backoff_delay(self, error: Exception, attempt: int) -> float:
+        delay = retry_after_seconds(error)
+        if delay is None:
+            delay = self.base_delay * (2 ** attempt) * (1 + random.random() * 0.25)
+        return min(delay, self.max_delay)
+
+    async def acall(self, fn: Callable, *args, **kwargs):
+        """
+        Await fn, waiting out shared pauses without blocking the event loop and
+        retrying on 429s and transient errors.
+        """
+        attempt = 0
+        while True:
+            remaining = self.delay_remaining()
+            while remaining > 0:
+                await asyncio.sleep(remaining)
+                remaining = self.delay_remaining()
+            try:
+                return await fn(*args, **kwargs)
+            except Exception as e:
+                if not is_transient(e) or attempt >= self.max_retries:
+                    raise
+                delay = self.backoff_delay(e, attempt)
+                if is_rate_limited(e):
+                    self.pause_for(delay)
+                else:
+                    await asyncio.sleep(delay)
+                attempt += 1
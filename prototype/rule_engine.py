@@ -0,0 +1,177 @@
+"""
+Deterministic K Fund line item rules.
+
+Encodes the Rule Sets in sample-regulations/K-Fund-Line-Item-Rules.md so that
+clear-cut items can be classified without retrieval or an LLM call. The engine
+only returns a verdict when exactly one rule family matches and nothing calls
+for analysis; everything else falls through to the RAG pipeline.
+"""
+
+import os
+import re
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+
+@dataclass
+class Rule:
+    """A single trigger-word rule from the line item rules document."""
+    rule_id: str
+    title: str
+    keywords: List[str]
+    classification: str
+    authority: str
+    rationale: str
+    needs_proration: bool = False
+
+
+@dataclass
+class RuleVerdict:
+    """High-confidence classification produced without the LLM."""
+    classification: str
+    authority: str
+    rationale: str
+    regulation_text: str
+    rule_id: str
+    confidence: str = "high"
+    needs_proration: bool = False
+    prohibited: bool = False
+    questions: List[str] = field(default_factory=list)
+
+    def as_result(self) -> dict:
+        """Shape the verdict like the LLM's JSON classification."""
+        return {
+            "classification": self.classification,
+            "authority": self.authority,
+            "rationale": self.rationale,
+            "regulation_text": self.regulation_text,
+            "confidence": self.confidence,
+            "needs_proration": self.needs_proration,
+            "questions": self.questions,
+        }
+
+
+RULES_SOURCE = "K-Fund-Line-Item-Rules"
+
+# Keywords follow the document's trigger words, except that generic ones
+# ("arrangement", "program", "printed", "screening", "protection", "labor") are
+# only decisive in a qualified phrase; alone they are left to RAG, so "Hotel
+# arrangements" or "Film screening" get no high-confidence verdict.
+
+# Rule Set 1: Always Allowable
+ALWAYS_ALLOWABLE_RULES = [
+    Rule("1.1", "Gifts to Foreign Officials",
+         ['gift', 'present', 'commemorative', 'crystal', 'vase', 'portfolio', 'presentation item'],
+         "K_FUND_ALLOWABLE", "22 U.S.C. § 2694",
+         "Gifts to foreign officials are a statutory requirement and core representational function."),
+    Rule("1.2", "Food and Beverage for Foreign Guests",
+         ['dinner', 'lunch', 'breakfast', 'reception', 'catering', 'food', 'beverage',
+          'wine', 'champagne', 'meal', "hors d'oeuvres"],
+         "K_FUND_ALLOWABLE", "22 U.S.C. § 2671",
+         "Hospitality extended to foreign officials is a fundamental representational expense.",
+         needs_proration=True),
+    Rule("1.3", "Floral Arrangements in Guest Areas",
+         ['floral', 'flowers', 'centerpiece', 'flower arrangement', 'bouquet'],
+         "K_FUND_ALLOWABLE", "22 U.S.C. § 2671",
+         "Décor that enhances the guest experience is representational."),
+    Rule("1.4", "Printed Programs and Menus",
+         ['menu', 'printed program', 'event program', 'dinner program', 'place card', 'invitation',
+          'printed menu', 'calligraphy'],
+         "K_FUND_ALLOWABLE", "22 U.S.C. § 2671",
+         "Materials provided to guests are part of the representational experience."),
+]
+
+# Rule Set 2: Never Allowable
+NEVER_ALLOWABLE_RULES = [
+    Rule("2.1", "Security Costs",
+         ['security', 'security screening', 'guest screening', 'guard', 'protective detail',
+          'executive protection', 'surveillance'],
+         "NOT_ALLOWABLE", "22 U.S.C. § 2671",
+         "Security enables the event but is not received by guests as hospitality."),
+    Rule("2.2", "Venue Infrastructure",
+         ['stage construction', 'venue modification', 'permanent installation'],
+         "NOT_ALLOWABLE", "22 U.S.C. § 2671",
+         "Infrastructure improvements are capital expenses, not representational expenses."),
+    Rule("2.3", "Staff Costs",
+         ['staff overtime', 'personnel', 'salary', 'wages', 'labor cost', 'staff labor'],
+         "NOT_ALLOWABLE", "22 U.S.C. § 2671",
+         "Staff costs are operational, not representational."),
+    Rule("2.4", "Transportation",
+         ['transportation', 'vehicle', 'car service', 'shuttle', 'airport', 'motorcade'],
+         "NOT_ALLOWABLE", "22 U.S.C. § 2671",
+         "Transportation is logistical support, not representational."),
+]
+
+# Rule Set 3: Requires Analysis - never decided by the engine
+REQUIRES_ANALYSIS_KEYWORDS = [
+    'photography', 'photographer', 'photos', 'pictures',
+    'entertainment', 'music', 'band', 'orchestra', 'performer', 'quartet',
+    'a/v', 'audio', 'visual', 'sound system', 'microphone', 'screen', 'projector',
+    'décor', 'decoration', 'staging', 'lighting', 'setup', 'breakdown',
+    'interpretation', 'interpreter', 'translation', 'translator', 'language',
+]
+
+# Personal/lavish items are never payable from K Fund or operating funds
+PROHIBITED_KEYWORDS = ['yacht', 'casino', 'gambling', 'spouse', 'family', 'families', 'vacation', 'personal']
+
+# Legal Review Trigger 4: high-value items always get a full review
+MAX_FAST_PATH_COST = float(os.getenv("RULE_ENGINE_MAX_COST", "5000"))
+
+
+def _keyword_pattern(keywords: List[str], word_chars: str = r"\w") -> re.Pattern:
+    # Whole-word match with simple plurals, so "present" does not fire on "presentation"
+    alternatives = "|".join(re.escape(k) for k in sorted(keywords, key=len, reverse=True))
+    return re.compile(rf"(?<![{word_chars}])(?:{alternatives})(?:e?s)?(?![{word_chars}])", re.IGNORECASE)
+
+
+_RULE_PATTERNS = [(rule, _keyword_pattern(rule.keywords)) for rule in ALWAYS_ALLOWABLE_RULES + NEVER_ALLOWABLE_RULES]
+_ANALYSIS_PATTERN = _keyword_pattern(REQUIRES_ANALYSIS_KEYWORDS)
+# Hyphenated compounds count as one word here: "family-style dinner" is not a family expense
+_PROHIBITED_PATTERN = _keyword_pattern(PROHIBITED_KEYWORDS, r"\w-")
+
+
+def is_prohibited(item: str) -> bool:
+    """True if the item name mentions a personal/lavish expense."""
+    return _PROHIBITED_PATTERN.search(item) is not None
+
+
+def matching_rules(item: str) -> List[Rule]:
+    """All Rule Set 1 and 2 rules whose trigger words appear in the item name."""
+    return [rule for rule, pattern in _RULE_PATTERNS if pattern.search(item)]
+
+
+def evaluate(item: str, cost: float = 0.0) -> Optional[RuleVerdict]:
+    """
+    Classify a line item from the deterministic rules.
+
+    Returns None whenever the item is ambiguous (no match, conflicting rule
+    families, a Rule Set 3 trigger, or a high-value item) so the caller can
+    fall back to retrieval + LLM.
+    """
+    if is_prohibited(item):
+        return RuleVerdict(
+            classification="NOT_ALLOWABLE",
+            authority="22 U.S.C. § 2671",
+            rationale="Personal or lavish expenses are not representational and may not be charged to K Fund.",
+            regulation_text="Personal expenses - Items for personal use by U.S. officials",
+            rule_id="prohibited",
+            prohibited=True,
+        )
+
+    if cost > MAX_FAST_PATH_COST or _ANALYSIS_PATTERN.search(item):
+        return None
+
+    rules = matching_rules(item)
+    if not rules or len({rule.classification for rule in rules}) > 1:
+        return None
+
+    # Gifts carry their own authority; otherwise the first matching rule speaks for the family
+    rule = rules[0]
+    return RuleVerdict(
+        classification=rule.classification,
+        authority=rule.authority,
+        rationale=rule.rationale,
+        regulation_text=f"Rule {rule.rule_id}: {rule.title} ({RULES_SOURCE})",
+        rule_id=rule.rule_id,
+        needs_proration=any(r.needs_proration for r in rules),
+    )
@@ -0,0 +1,100 @@
+"""
+Unit Tests for the semantic answer cache.
+"""
+
+import tempfile
+import time
+import unittest
+from pathlib import Path
+
+from answer_cache import SemanticAnswerCache, load_example_questions
+
+RESPONSE = {"answer": "Yes.", "citations": [], "confidence": "high"}
+
+
+class TestSemanticAnswerCache(unittest.TestCase):
+
+    def test_near_duplicate_question_hits(self):
+        """A question embedding within the threshold reuses the stored answer."""
+        cache = SemanticAnswerCache(threshold=0.95)
+        cache.store([1.0, 0.0, 0.0], 5, "v1", RESPONSE)
+
+        self.assertEqual(cache.lookup([0.99, 0.05, 0.0], 5, "v1"), RESPONSE)
+        self.assertIsNone(cache.lookup([0.0, 1.0, 0.0], 5, "v1"))
+        self.assertEqual(cache.stats()["hits"], 1)
+        self.assertEqual(cache.stats()["misses"], 1)
+
+    def test_different_n_results_misses(self):
+        """Answers built from a different number of chunks are not reused."""
+        cache = SemanticAnswerCache()
+        cache.store([1.0, 0.0], 5, "v1", RESPONSE)
+
+        self.assertIsNone(cache.lookup([1.0, 0.0], 3, "v1"))
+
+    def test_different_filter_scope_misses(self):
+        """Answers retrieved under other metadata filters are not reused."""
+        cache = SemanticAnswerCache()
+        cache.store([1.0, 0.0], 5, "v1", RESPONSE, scope='{"regulation_type": "ITAR"}')
+
+        self.assertIsNone(cache.lookup([1.0, 0.0], 5, "v1"))
+        self.assertEqual(cache.lookup([1.0, 0.0], 5, "v1", '{"regulation_type": "ITAR"}'), RESPONSE)
+
+    def test_new_corpus_version_invalidates(self):
+        """Re-ingesting the collection drops every cached answer."""
+        cache = SemanticAnswerCache()
+        cache.store([1.0, 0.0], 5, "v1", RESPONSE)
+
+        self.assertIsNone(cache.lookup([1.0, 0.0], 5, "v2"))
+        self.assertEqual(cache.stats()["entries"], 0)
+        self.assertEqual(cache.stats()["invalidations"], 1)
+
+    def test_invalidate_counts_only_dropped_entries(self):
+        """Invalidating an empty cache (e.g. on every swap) is not reported."""
+        cache = SemanticAnswerCache()
+        cache.invalidate()
+        self.assertEqual(cache.stats()["invalidations"], 0)
+
+        cache.store([1.0, 0.0], 5, "v1", RESPONSE)
+        cache.invalidate()
+        cache.invalidate()
+        self.assertEqual(cache.stats()["invalidations"], 1)
+
+    def test_invalidate_keeps_entries_of_the_new_version(self):
+        """A swap to the version the cache already holds answers for drops nothing."""
+        cache = SemanticAnswerCache()
+        cache.store([1.0, 0.0], 5, "v2", RESPONSE)
+        cache.invalidate("v2")
+        self.assertEqual(cache.stats()["entries"], 1)
+        self.assertEqual(cache.stats()["invalidations"], 0)
+
+        cache.invalidate("v3")
+        self.assertEqual(cache.stats()["entries"], 0)
+        self.assertEqual(cache.stats()["invalidations"], 1)
+
+    def test_ttl_and_lru_eviction(self):
+        """Entries expire after the TTL and the least recently used is evicted first."""
+        cache = SemanticAnswerCache(ttl_seconds=0.01)
+        cache.store([1.0, 0.0], 5, "v1", RESPONSE)
+        time.sleep(0.02)
+        self.assertIsNone(cache.lookup([1.0, 0.0], 5, "v1"))
+
+        cache = SemanticAnswerCache(max_entries=2)
+        cache.store([1.0, 0.0, 0.0], 5, "v1", {"answer": "a"})
+        cache.store([0.0, 1.0, 0.0], 5, "v1", {"answer": "b"})
+        cache.lookup([1.0, 0.0, 0.0], 5, "v1")
+        cache.store([0.0, 0.0, 1.0], 5, "v1", {"answer": "c"})
+
+        self.assertIsNotNone(cache.lookup([1.0, 0.0, 0.0], 5, "v1"))
+        self.assertIsNone(cache.lookup([0.0, 1.0, 0.0], 5, "v1"))
+
+    def test_load_example_questions(self):
+        """Quoted questions are extracted from the example questions markdown."""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = Path(tmpdir) / "questions.md"
+            path.write_text('## Query 1\n\n**Question:** \n"Is this allowable?"\n\n**Key Considerations:**\n- x\n')
+            self.assertEqual(load_example_questions(path), ["Is this allowable?"])
+            self.assertEqual(load_example_questions(Path(tmpdir) / "missing.md"), [])
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
@@ -0,0 +1,56 @@
+"""
+Unit Tests for single-request batched classification helpers.
+"""
+
+import json
+import unittest
+
+from batch_classifier import group_items, normalize_item, pack_groups, parse_batch_response
+
+
+class TestBatchClassifier(unittest.TestCase):
+
+    def test_near_identical_items_share_a_group(self):
+        """Case, punctuation, word order and simple plurals do not split groups."""
+        self.assertEqual(normalize_item("Floral Centerpieces"), normalize_item("centerpiece, floral"))
+
+        groups = group_items([
+            (0, "Photography services", 1500),
+            (1, "String quartet", 2000),
+            (2, "photography service", 900),
+        ])
+
+        self.assertEqual(len(groups), 2)
+        self.assertEqual(groups[0].indexes, [0, 2])
+        self.assertEqual([g.item_id for g in groups], [1, 2])
+
+    def test_high_value_items_are_not_merged_with_cheap_ones(self):
+        """Cost above the legal review threshold changes the grouping key."""
+        groups = group_items([(0, "Gift", 100), (1, "Gift", 9000)], high_value_threshold=5000)
+        self.assertEqual(len(groups), 2)
+
+    def test_packing_respects_budget_and_item_limit(self):
+        """Groups are split into completions by token budget and max items."""
+        groups = group_items([(i, f"Item number {i}", 10) for i in range(10)])
+
+        self.assertEqual([len(p) for p in pack_groups(groups, token_budget=100000, max_items=4)], [4, 4, 2])
+        self.assertEqual(len(pack_groups(groups, token_budget=400, max_items=50)), 5)
+
+    def test_parse_maps_results_by_id_and_drops_bad_entries(self):
+        """Only well-formed entries for requested ids are returned."""
+        groups = group_items([(0, "A", 1), (1, "B", 1), (2, "C", 1)])
+        content = json.dumps({"results": [
+            {"id": 1, "classification": "K_FUND_ALLOWABLE"},
+            {"id": "3", "classification": "NOT_ALLOWABLE"},
+            {"id": 2, "classification": "MAYBE"},
+            {"id": 99, "classification": "LEGAL_REVIEW"},
+        ]})
+
+        parsed = parse_batch_response(content, groups)
+
+        self.assertEqual(sorted(parsed), [1, 3])
+        self.assertEqual(parse_batch_response("not json", groups), {})
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
@@ -0,0 +1,87 @@
+"""
+Unit Tests for the size-aware batch embedder.
+"""
+
+import threading
+import unittest
+
+from batch_embedder import BatchEmbedder, split_batches
+from rate_limit import is_transient
+
+
+class StatusError(Exception):
+    def __init__(self, status_code):
+        super().__init__(f"status {status_code}")
+        self.status_code = status_code
+
+
+class RecordingEmbedder:
+    """Embeds each text as [len]; optionally fails the first `failures` calls."""
+
+    def __init__(self, failures=0, error=None):
+        self.failures = failures
+        self.error = error
+        self.batches = []
+        self.lock = threading.Lock()
+
+    def __call__(self, texts):
+        with self.lock:
+            if self.failures:
+                self.failures -= 1
+                raise self.error
+            self.batches.append(list(texts))
+        return [[float(len(t))] for t in texts]
+
+
+class TestSplitBatches(unittest.TestCase):
+
+    def test_respects_item_and_token_limits(self):
+        texts = ["a" * 40] * 10  # 11 estimated tokens each
+        self.assertEqual([len(b) for b in split_batches(texts, max_items=4, max_tokens=1000)], [4, 4, 2])
+        self.assertEqual([len(b) for b in split_batches(texts, max_items=100, max_tokens=30)], [2, 2, 2, 2, 2])
+
+    def test_oversize_text_gets_own_batch(self):
+        batches = split_batches(["a", "b" * 400, "c"], max_items=10, max_tokens=50)
+        self.assertEqual([list(b) for b in batches], [[0], [1], [2]])
+
+
+class TestBatchEmbedder(unittest.TestCase):
+
+    def test_parallel_batches_preserve_order(self):
+        texts = ["x" * n for n in range(1, 50)]
+        embedder = RecordingEmbedder()
+        result = BatchEmbedder(embedder, max_items=5, max_workers=4)(texts)
+        self.assertEqual(result, [[float(n)] for n in range(1, 50)])
+        self.assertEqual(len(embedder.batches), 10)
+
+    def test_transient_errors_are_retried(self):
+        embedder = RecordingEmbedder(failures=2, error=StatusError(503))
+        batch = BatchEmbedder(embedder, base_delay=0)
+        self.assertEqual(batch(["ab"]), [[2.0]])
+        self.assertEqual(batch.retries, 2)
+
+    def test_permanent_errors_raise_immediately(self):
+        embedder = RecordingEmbedder(failures=1, error=StatusError(400))
+        batch = BatchEmbedder(embedder, base_delay=0)
+        with self.assertRaises(StatusError):
+            batch(["ab"])
+        self.assertEqual(batch.retries, 0)
+
+    def test_gives_up_after_max_retries(self):
+        embedder = RecordingEmbedder(failures=10, error=ConnectionError("reset"))
+        with self.assertRaises(ConnectionError):
+            BatchEmbedder(embedder, max_retries=2, base_delay=0)(["ab"])
+
+
+class TestIsTransient(unittest.TestCase):
+
+    def test_classification(self):
+        self.assertTrue(is_transient(StatusError(429)))
+        self.assertTrue(is_transient(StatusError(502)))
+        self.assertTrue(is_transient(TimeoutError()))
+        self.assertFalse(is_transient(StatusError(401)))
+        self.assertFalse(is_transient(ValueError("bad input")))
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
@@ -0,0 +1,89 @@
+"""
+Unit Tests for the BM25 index and hybrid score fusion.
+"""
+
+import tempfile
+import unittest
+from pathlib import Path
+
+from bm25_index import BM25Index, hybrid_search, tokenize
+
+
+def make_index():
+    ids = ["c0", "c1", "c2", "c3"]
+    documents = [
+        "Gifts to foreign officials are allowable under 22 U.S.C. 2694.",
+        "Motorcade and security costs are never allowable.",
+        "Musical entertainment such as a string quartet may be allowable.",
+        "Calligraphy for invitations and place cards is allowable.",
+    ]
+    metadatas = [{"source": "K-Fund-Guidelines"} for _ in ids]
+    return BM25Index(ids, documents, metadatas, version="v1")
+
+
+class TestTokenize(unittest.TestCase):
+
+    def test_stopwords_plurals_and_sections(self):
+        """Stopwords are dropped, plurals folded and section numbers kept whole."""
+        self.assertEqual(tokenize("The Gifts under Section 121.1"), ["gift", "section", "121.1"])
+        self.assertEqual(tokenize("glass"), ["glass"])
+
+
+class TestBM25Index(unittest.TestCase):
+
+    def test_exact_term_ranks_first(self):
+        """A rare exact term finds the one chunk containing it."""
+        index = make_index()
+        self.assertEqual(index.top("Is a motorcade allowable?", 2)[0][0], 1)
+        self.assertEqual([position for position, _ in index.top("quartet", 4)], [2])
+
+    def test_where_filter(self):
+        index = BM25Index(["a", "b"], ["gift rules", "gift rules"],
+                          [{"regulation_type": "K_FUND"}, {"regulation_type": "ITAR"}])
+        self.assertEqual([p for p, _ in index.top("gift", 2, where={"regulation_type": "ITAR"})], [1])
+
+    def test_unknown_terms_score_nothing(self):
+        self.assertEqual(make_index().scores("zeppelin"), {})
+
+    def test_save_and_load(self):
+        index = make_index()
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = Path(tmpdir) / "bm25_index.json"
+            index.save(path)
+            loaded = BM25Index.load(path)
+            self.assertEqual(loaded.version, "v1")
+            self.assertEqual(loaded.top("calligraphy", 1), index.top("calligraphy", 1))
+            self.assertIsNone(BM25Index.load(Path(tmpdir) / "missing.json"))
+
+
+class TestHybridSearch(unittest.TestCase):
+
+    def test_lexical_hit_missed_by_vectors_is_fused_in(self):
+        """A chunk only BM25 found joins the results; vector-only hits keep their place."""
+        index = make_index()
+        vector_results = {
+            "ids": [["c0", "c2"]],
+            "documents": [[index.documents[0], index.documents[2]]],
+            "metadatas": [[index.metadatas[0], index.metadatas[2]]],
+        }
+        fused = hybrid_search(vector_results, [[0.8, 0.4]], index, ["motorcade"], n_results=2, alpha=0.5)
+
+        self.assertEqual(len(fused["ids"][0]), 2)
+        self.assertIn("c1", fused["ids"][0])
+        self.assertEqual(fused["ids"][0][0], "c0")
+        self.assertAlmostEqual(fused["scores"][0][0], 0.5)
+        self.assertEqual(fused["documents"][0][fused["ids"][0].index("c1")], index.documents[1])
+
+    def test_agreeing_signals_outrank_either_alone(self):
+        index = make_index()
+        vector_results = {
+            "ids": [["c0", "c3"]],
+            "documents": [[index.documents[0], index.documents[3]]],
+            "metadatas": [[index.metadatas[0], index.metadatas[3]]],
+        }
+        fused = hybrid_search(vector_results, [[0.9, 0.85]], index, ["calligraphy"], n_results=3)
+        self.assertEqual(fused["ids"][0][0], "c3")
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
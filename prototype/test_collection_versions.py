@@ -0,0 +1,124 @@
+"""
+Unit Tests for blue/green collection versions.
+"""
+
+import tempfile
+import unittest
+
+import chromadb
+
+from collection_versions import (
+    BASE_NAME, AliasPointer, active_collection, build_and_swap, read_alias, version_name
+)
+from incremental_ingest import chunk_ids, chunk_regulation
+from ingest_test_helpers import CountingEmbedder, doc, paragraph_chunks
+
+
+class TestBuildAndSwap(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.client = chromadb.PersistentClient(path=self.tmpdir.name)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def build(self, documents, embedder=None, **kwargs):
+        return build_and_swap(self.client, documents, paragraph_chunks, embedder or CountingEmbedder(),
+                              self.tmpdir.name, **kwargs)
+
+    def names(self):
+        return sorted(c if isinstance(c, str) else c.name for c in self.client.list_collections())
+
+    def test_first_build_creates_v1_and_alias(self):
+        stats = self.build([doc("K-Fund", "Gifts\n\nFood")])
+        self.assertTrue(stats["swapped"])
+        self.assertEqual(stats["name"], version_name(1))
+        self.assertEqual(read_alias(self.tmpdir.name)["name"], version_name(1))
+        self.assertEqual(active_collection(self.client, self.tmpdir.name).count(), 2)
+
+    def test_unchanged_corpus_keeps_active_version(self):
+        documents = [doc("K-Fund", "Gifts\n\nFood")]
+        self.build(documents)
+        embedder = CountingEmbedder()
+        stats = self.build(documents, embedder)
+        self.assertFalse(stats["swapped"])
+        self.assertEqual(embedder.texts, [])
+        self.assertEqual(self.names(), [version_name(1)])
+
+    def test_old_version_untouched_until_swap_and_only_changes_embedded(self):
+        self.build([doc("K-Fund", "Gifts\n\nFood")])
+        held = self.client.get_collection(version_name(1))  # an in-flight request's collection
+
+        embedder = CountingEmbedder()
+        stats = self.build([doc("K-Fund", "Gifts\n\nCatering")], embedder)
+
+        self.assertEqual(embedder.texts, ["Catering"])
+        self.assertEqual(stats["name"], version_name(2))
+        self.assertEqual(sorted(held.get()["documents"]), ["Food", "Gifts"])
+        self.assertEqual(sorted(active_collection(self.client, self.tmpdir.name).get()["documents"]),
+                         ["Catering", "Gifts"])
+
+    def test_chunker_change_rebuilds_with_new_metadata(self):
+        content = "## Rule 1.1: Gifts\n\n" + "Gifts to foreign officials are allowable. " * 5
+        documents = [doc("K-Fund", content)]
+        self.build(documents, chunker="paragraphs")
+
+        stats = build_and_swap(self.client, documents, chunk_regulation, CountingEmbedder(), self.tmpdir.name)
+        self.assertTrue(stats["swapped"])
+        metadatas = active_collection(self.client, self.tmpdir.name).get()["metadatas"]
+        self.assertEqual([m.get("section") for m in metadatas], ["Rule 1.1"])
+
+    def test_interrupted_build_resumes(self):
+        self.build([doc("K-Fund", "Gifts")])
+
+        def failing(texts):
+            if "Travel" in texts:
+                raise ConnectionError("interrupted")
+            return CountingEmbedder()(texts)
+
+        documents = [doc("K-Fund", "Gifts\n\nFood"), doc("K-Fund-Rules", "Travel")]
+        with self.assertRaises(ConnectionError):
+            self.build(documents, failing, batch_size=1)
+        self.assertEqual(read_alias(self.tmpdir.name)["name"], version_name(1))
+
+        embedder = CountingEmbedder()
+        messages = []
+        stats = self.build(documents, embedder, progress=messages.append)
+        self.assertIn(f"resuming interrupted build of {version_name(2)}", messages)
+        self.assertEqual(embedder.texts, ["Travel"])
+        self.assertEqual(stats["name"], version_name(2))
+        self.assertEqual(active_collection(self.client, self.tmpdir.name).count(), 3)
+
+    def test_garbage_collection_keeps_previous_version(self):
+        for text in ("A", "B", "C"):
+            stats = self.build([doc("K-Fund", text)])
+        self.assertEqual(stats["removed_collections"], [version_name(1)])
+        self.assertEqual(self.names(), [version_name(2), version_name(3)])
+
+    def test_legacy_collection_is_migrated_without_re_embedding(self):
+        legacy = self.client.create_collection(BASE_NAME)
+        first = CountingEmbedder()
+        documents = [doc("K-Fund", "Gifts")]
+        legacy.add(ids=chunk_ids("K-Fund", paragraph_chunks(documents[0])), documents=["Gifts"],
+                   embeddings=first(["Gifts"]), metadatas=[{"source": "K-Fund", "chunk_index": 0}])
+
+        embedder = CountingEmbedder()
+        stats = self.build(documents, embedder)
+        self.assertEqual(embedder.texts, [])
+        self.assertEqual(stats["name"], version_name(1))
+
+
+class TestAliasPointer(unittest.TestCase):
+
+    def test_follows_swaps_on_disk(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            pointer = AliasPointer(tmpdir)
+            self.assertEqual(pointer.name(), BASE_NAME)
+            client = chromadb.PersistentClient(path=tmpdir)
+            build_and_swap(client, [doc("K-Fund", "Gifts")], paragraph_chunks, CountingEmbedder(), tmpdir)
+            self.assertEqual(pointer.name(), version_name(1))
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
@@ -0,0 +1,113 @@
+"""
+Unit Tests for token-budgeted context packing.
+"""
+
+import contextlib
+import importlib.util
+import io
+import unittest
+from pathlib import Path
+
+from context_packer import _merge_blocks, pack_context, repeated_heading
+from markdown_chunker import HEADING
+
+RAG_QUERY_PATH = Path(__file__).parent.parent / "src" / "search" / "rag_query.py"
+
+
+def chunk(chunk_id, source, index, lines):
+    return {"id": chunk_id, "source": source, "chunk_index": index, "content": "\n".join(lines)}
+
+
+class TestRepeatedHeading(unittest.TestCase):
+
+    def test_continuation_heading_detected(self):
+        self.assertEqual(repeated_heading(["## Gifts", "body"], ["## Gifts", "more"]), 1)
+        self.assertEqual(repeated_heading(["## Gifts", "body", "## Flowers", "x"], ["## Flowers", "y"]), 1)
+
+    def test_new_section_kept(self):
+        self.assertEqual(repeated_heading(["## Gifts", "body"], ["## Flowers", "more"]), 0)
+        self.assertEqual(repeated_heading(["body"], ["body", "more"]), 0)
+
+
+class TestPackContext(unittest.TestCase):
+
+    def test_adjacent_chunks_merged_without_repeated_heading(self):
+        """Consecutive chunks of one section become one block and the repeated heading is paid once."""
+        first = chunk("c0", "K-Fund", 0, ["## Gifts", "line two", "line three"])
+        second = chunk("c1", "K-Fund", 1, ["## Gifts", "line four", "Security"])
+        packed = pack_context([second, first], token_budget=1000)
+
+        self.assertEqual(packed.text, "[Source: K-Fund]\n## Gifts\nline two\nline three\nline four\nSecurity")
+        self.assertEqual(packed.chunk_ids, ["c0", "c1"])
+        self.assertGreater(packed.tokens_saved, 0)
+
+    def test_non_adjacent_chunks_kept_in_score_order(self):
+        packed = pack_context([
+            chunk("c5", "K-Fund", 5, ["Catering"]),
+            chunk("c1", "K-Fund", 1, ["Gifts"]),
+            chunk("x2", "Other", 2, ["Flowers"]),
+        ], token_budget=1000)
+
+        self.assertEqual(packed.chunk_ids, ["c5", "c1", "x2"])
+        self.assertEqual(packed.sources, ["K-Fund", "Other"])
+        self.assertEqual(packed.tokens_saved, 0)
+
+    def test_budget_and_max_chunks(self):
+        """Chunks that would overflow the budget are skipped; the best chunk is always kept."""
+        big = chunk("big", "K-Fund", 0, ["x" * 400])
+        small = chunk("small", "K-Fund", 9, ["short"])
+        packed = pack_context([big, chunk("huge", "K-Fund", 4, ["y" * 4000]), small], token_budget=120)
+
+        self.assertEqual(packed.chunk_ids, ["big", "small"])
+        self.assertEqual(packed.dropped, 1)
+        self.assertLessEqual(packed.tokens, 120)
+
+        capped = pack_context([big, small], token_budget=1000, max_chunks=1)
+        self.assertEqual(capped.chunk_ids, ["big"])
+        self.assertEqual(pack_context([big], token_budget=10).chunk_ids, ["big"])
+
+
+class TestLambdaContextMatches(unittest.TestCase):
+    """src/search/rag_query.py keeps its own copy of the merge logic; it must behave the same."""
+
+    @classmethod
+    def setUpClass(cls):
+        if not RAG_QUERY_PATH.exists():
+            raise unittest.SkipTest("src/search not present")
+        spec = importlib.util.spec_from_file_location("rag_query", RAG_QUERY_PATH)
+        cls.rag_query = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(cls.rag_query)
+
+    def test_heading_pattern_and_repeated_heading_match(self):
+        self.assertEqual(self.rag_query.HEADING.pattern, HEADING.pattern)
+        for previous, following in [(["## Gifts", "body"], ["## Gifts", "more"]),
+                                    (["## Gifts", "body", "## Flowers", "x"], ["## Flowers", "y"]),
+                                    (["## Gifts", "body"], ["## Flowers", "more"]),
+                                    (["body"], ["body", "more"]), (["## Gifts"], [])]:
+            self.assertEqual(self.rag_query._repeated_heading(previous, following),
+                             repeated_heading(previous, following))
+
+    def test_merged_blocks_match(self):
+        chunks = [
+            chunk("c5", "K-Fund", 5, ["Catering"]),
+            chunk("c1", "K-Fund", 1, ["## Gifts", "line four"]),
+            chunk("c0", "K-Fund", 0, ["## Gifts", "line two"]),
+            chunk("c2", "K-Fund", 2, ["## Flowers", "tables"]),
+            chunk("c9", "Rules", 0, ["Security"]),
+        ]
+        expected = [(b["source"], b["lines"]) for b in _merge_blocks(chunks)]
+        actual = [(b["source"], b["lines"]) for b in self.rag_query._merge_adjacent(chunks)]
+        self.assertEqual(actual, expected)
+
+    def test_build_context_respects_budget_and_merges(self):
+        chunks = [dict(chunk(f"c{i}", "K-Fund", i, ["## Gifts", "x" * 200]), regulation_type="K_FUND")
+                  for i in range(20)]
+        with contextlib.redirect_stdout(io.StringIO()):
+            context = self.rag_query.build_context(chunks, token_budget=300)
+        self.assertLessEqual(self.rag_query.estimate_tokens(context), 300)
+        self.assertEqual(context.count("## Gifts"), 1)
+        self.assertEqual(context.count("[Source"), 1)
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
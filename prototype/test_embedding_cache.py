@@ -0,0 +1,86 @@
+"""
+Unit Tests for the content-addressed embedding cache.
+"""
+
+import os
+import tempfile
+import unittest
+
+from embedding_cache import EmbeddingCache, cache_key, cached_embeddings
+
+
+class FakeEmbedder:
+    """Counts calls and returns a deterministic vector per text."""
+
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, texts):
+        self.calls.append(list(texts))
+        return [[float(len(text)), 1.0, 0.5] for text in texts]
+
+
+class TestEmbeddingCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, "cache.sqlite3")
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_key_includes_model_and_dimensions(self):
+        """Same text under a different model or dimension count is a different entry."""
+        self.assertNotEqual(cache_key("a", "text"), cache_key("b", "text"))
+        self.assertNotEqual(cache_key("a", "text", 256), cache_key("a", "text", 512))
+
+    def test_repeat_text_is_embedded_once(self):
+        """Identical text is only sent to the embedder on the first call."""
+        cache = EmbeddingCache(self.path)
+        embed = FakeEmbedder()
+
+        first = cached_embeddings(["K Fund list"], "m", embed, cache)
+        second = cached_embeddings(["K Fund list"], "m", embed, cache)
+
+        self.assertEqual(len(embed.calls), 1)
+        self.assertEqual(first, second)
+        self.assertEqual(cache.stats()["hits"], 1)
+        self.assertEqual(cache.stats()["misses"], 1)
+
+    def test_only_misses_are_embedded_and_order_is_preserved(self):
+        """Mixed hits and misses come back in input order; duplicates embed once."""
+        cache = EmbeddingCache(self.path)
+        embed = FakeEmbedder()
+        cached_embeddings(["bb"], "m", embed, cache)
+
+        vectors = cached_embeddings(["a", "bb", "ccc", "a"], "m", embed, cache)
+
+        self.assertEqual(embed.calls[-1], ["a", "ccc"])
+        self.assertEqual([v[0] for v in vectors], [1.0, 2.0, 3.0, 1.0])
+
+    def test_survives_restart(self):
+        """A new cache instance on the same file serves vectors from disk."""
+        embed = FakeEmbedder()
+        cached_embeddings(["reception catering"], "m", embed, EmbeddingCache(self.path))
+
+        reopened = EmbeddingCache(self.path)
+        cached_embeddings(["reception catering"], "m", embed, reopened)
+
+        self.assertEqual(len(embed.calls), 1)
+        self.assertEqual(reopened.stats()["disk_hits"], 1)
+
+    def test_disk_tier_is_size_bounded(self):
+        """Least recently used entries are evicted once the disk limit is reached."""
+        cache = EmbeddingCache(self.path, max_memory_items=1, max_disk_items=2)
+        embed = FakeEmbedder()
+        for text in ["one", "two", "three"]:
+            cached_embeddings([text], "m", embed, cache)
+
+        stats = cache.stats()
+        self.assertEqual(stats["disk_items"], 2)
+        self.assertEqual(stats["memory_items"], 1)
+        self.assertEqual(stats["evictions"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
@@ -0,0 +1,179 @@
+"""
+Unit Tests for manifest-driven incremental ingestion.
+"""
+
+import tempfile
+import threading
+import time
+import unittest
+from pathlib import Path
+
+import chromadb
+
+from batch_embedder import BatchEmbedder
+from incremental_ingest import (
+    chunk_ids, content_hash, corpus_version, document_hash, document_lines, load_manifest, sync_collection
+)
+from ingest_test_helpers import CountingEmbedder, doc, paragraph_chunks
+
+
+class TestChunkIds(unittest.TestCase):
+
+    def test_ids_depend_on_source_and_text_only(self):
+        chunks = [{"content": "Gifts"}, {"content": "Security"}, {"content": "Gifts"}]
+        ids = chunk_ids("K-Fund", chunks)
+        self.assertEqual(ids, chunk_ids("K-Fund", chunks))
+        self.assertEqual(len(set(ids)), 3)
+        self.assertNotEqual(ids[0], chunk_ids("Other", chunks)[0])
+        self.assertEqual(chunk_ids("K-Fund", chunks[1:2])[0], ids[1])
+
+
+class TestLazyDocuments(unittest.TestCase):
+
+    def test_path_documents_match_in_memory_content(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            for content in ("a\nb", "a\nb\n", "", "\n\nx"):
+                path = Path(tmpdir) / "doc.md"
+                path.write_text(content)
+                lazy = {"path": path, "metadata": {}}
+                self.assertEqual(list(document_lines(lazy)), content.split("\n"))
+                self.assertEqual(document_hash(lazy), content_hash(content))
+
+
+class FailingEmbedder(CountingEmbedder):
+    """Raises on call number `fail_on` (1-based)."""
+
+    def __init__(self, fail_on):
+        super().__init__()
+        self.fail_on = fail_on
+
+    def __call__(self, texts):
+        if self.calls + 1 == self.fail_on:
+            self.calls += 1
+            raise ConnectionError("interrupted")
+        return super().__call__(texts)
+
+
+class ConcurrencyProbe(CountingEmbedder):
+    """Records the most requests that were in flight at once."""
+
+    def __init__(self):
+        super().__init__()
+        self.lock = threading.Lock()
+        self.active = 0
+        self.peak = 0
+
+    def __call__(self, texts):
+        with self.lock:
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        time.sleep(0.05)
+        with self.lock:
+            self.active -= 1
+            return super().__call__(texts)
+
+
+class TestSyncCollection(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.client = chromadb.PersistentClient(path=self.tmpdir.name)
+        self.collection = self.client.get_or_create_collection("compliance_regulations")
+        self.manifest = Path(self.tmpdir.name) / "manifest.json"
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def sync(self, documents, embedder, **kwargs):
+        return sync_collection(self.collection, documents, paragraph_chunks, embedder, self.manifest, **kwargs)
+
+    def test_unchanged_corpus_makes_no_embedding_calls(self):
+        documents = [doc("K-Fund-Guidelines", "Gifts\n\nFood"), doc("K-Fund-Rules", "Security")]
+        first = self.sync(documents, CountingEmbedder())
+        self.assertEqual(first["added"], 3)
+        self.assertTrue(first["changed"])
+
+        embedder = CountingEmbedder()
+        second = self.sync(documents, embedder)
+        self.assertEqual(embedder.calls, 0)
+        self.assertFalse(second["changed"])
+        self.assertEqual(second["files_rechunked"], 0)
+        self.assertEqual(second["corpus_version"], first["corpus_version"])
+
+    def test_only_changed_chunks_embedded_and_removed_ones_deleted(self):
+        self.sync([doc("K-Fund-Guidelines", "Gifts\n\nFood\n\nFlowers"), doc("Old", "Gone")], CountingEmbedder())
+        version = corpus_version(self.client.get_collection("compliance_regulations"))
+
+        embedder = CountingEmbedder()
+        stats = self.sync([doc("K-Fund-Guidelines", "Gifts\n\nCatering\n\nFlowers")], embedder)
+
+        self.assertEqual(embedder.texts, ["Catering"])
+        self.assertEqual(stats["deleted"], 2)
+        self.assertEqual(self.collection.count(), 3)
+        self.assertEqual(sorted(self.collection.get()["documents"]), ["Catering", "Flowers", "Gifts"])
+        self.assertNotEqual(corpus_version(self.client.get_collection("compliance_regulations")), version)
+        self.assertEqual(list(load_manifest(self.manifest)["files"]), ["K-Fund-Guidelines"])
+
+    def test_shifted_chunk_keeps_embedding_but_updates_position(self):
+        self.sync([doc("K-Fund-Guidelines", "Gifts\n\nFood")], CountingEmbedder())
+        embedder = CountingEmbedder()
+        self.sync([doc("K-Fund-Guidelines", "Intro\n\nGifts\n\nFood")], embedder)
+
+        self.assertEqual(embedder.texts, ["Intro"])
+        data = self.collection.get(where={"chunk_index": 2})
+        self.assertEqual(data["documents"], ["Food"])
+
+    def test_chunker_change_rechunks_without_re_embedding_same_text(self):
+        documents = [doc("K-Fund-Guidelines", "Gifts\n\nFood")]
+        self.sync(documents, CountingEmbedder(), chunker="v1")
+
+        embedder = CountingEmbedder()
+        stats = self.sync(documents, embedder, chunker="v2")
+        self.assertEqual(stats["files_rechunked"], 1)
+        self.assertEqual(embedder.calls, 0)
+        self.assertEqual(load_manifest(self.manifest)["chunker"], "v2")
+
+    def test_interrupted_sync_resumes_without_re_embedding(self):
+        documents = [doc("A", "1\n\n2\n\n3"), doc("B", "4\n\n5"), doc("C", "6")]
+        with self.assertRaises(ConnectionError):
+            self.sync(documents, FailingEmbedder(fail_on=3), batch_size=2, checkpoint_seconds=0)
+        self.assertIn("A", load_manifest(self.manifest)["files"])
+
+        embedder = CountingEmbedder()
+        stats = self.sync(documents, embedder, batch_size=2)
+        self.assertEqual(embedder.texts, ["5", "6"])
+        self.assertEqual(stats["files_rechunked"], 2)
+        self.assertEqual(self.collection.count(), 6)
+
+    def test_generator_chunker_is_streamed_in_batches(self):
+        def lazy_chunks(document):
+            yield from paragraph_chunks(document)
+
+        embedder = CountingEmbedder()
+        sync_collection(self.collection, iter([doc("A", "1\n\n2\n\n3\n\n4\n\n5")]), lazy_chunks,
+                        embedder, self.manifest, batch_size=2)
+        self.assertEqual(embedder.calls, 3)
+        self.assertEqual(self.collection.count(), 5)
+
+    def test_flushes_fan_out_across_embedder_workers(self):
+        probe = ConcurrencyProbe()
+        embedder = BatchEmbedder(probe, max_items=2, max_workers=3)
+        documents = [doc("A", "\n\n".join(str(n) for n in range(12)))]
+        self.sync(documents, embedder, batch_size=embedder.parallel_batch_size)
+        self.assertEqual(self.collection.count(), 12)
+        self.assertEqual(probe.calls, 6)
+        self.assertGreater(probe.peak, 1)
+
+    def test_wiped_collection_is_rebuilt_despite_manifest(self):
+        documents = [doc("K-Fund-Guidelines", "Gifts")]
+        self.sync(documents, CountingEmbedder())
+        self.client.delete_collection("compliance_regulations")
+        self.collection = self.client.create_collection("compliance_regulations")
+
+        embedder = CountingEmbedder()
+        self.sync(documents, embedder)
+        self.assertEqual(embedder.texts, ["Gifts"])
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
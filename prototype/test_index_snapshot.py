@@ -0,0 +1,86 @@
+"""
+Unit Tests for prebuilt index snapshots.
+"""
+
+import json
+import tempfile
+import unittest
+from pathlib import Path
+
+import numpy as np
+
+from incremental_ingest import chunk_regulation
+from index_snapshot import SNAPSHOT_FILE, build_snapshot, check_snapshot, load_snapshot
+
+
+def fake_embed(texts):
+    return [[float(len(t)), 1.0, 0.5] for t in texts]
+
+
+DOCUMENTS = [
+    {"content": "Gifts to foreign officials\nare allowable.", "metadata": {"source": "K-Fund-Guidelines", "regulation_type": "K_FUND"}},
+    {"content": "Security is never allowable.", "metadata": {"source": "K-Fund-Line-Item-Rules", "regulation_type": "K_FUND"}},
+]
+
+
+class TestIndexSnapshot(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = Path(self.tmpdir.name) / "index_snapshot"
+        self.meta = build_snapshot(DOCUMENTS, chunk_regulation, fake_embed, self.path, "test-model")
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_build_and_memory_mapped_load(self):
+        index, reason = load_snapshot(self.path, DOCUMENTS, "test-model")
+
+        self.assertEqual(reason, "")
+        self.assertIsInstance(index.embeddings, np.memmap)
+        self.assertEqual(index.id, self.meta["version"])
+        self.assertEqual(index.count(), 2)
+        self.assertEqual(self.meta["dimensions"], 3)
+        self.assertFalse(self.path.with_name("index_snapshot.tmp").exists())
+
+    def test_version_stable_across_builds(self):
+        rebuilt = build_snapshot(DOCUMENTS, chunk_regulation, fake_embed, self.path, "test-model")
+        self.assertEqual(rebuilt["version"], self.meta["version"])
+        self.assertFalse(self.path.with_name("index_snapshot.old").exists())
+
+    def test_interrupted_swap_restores_previous_snapshot(self):
+        """A crash after moving the old snapshot aside does not lose it."""
+        self.path.rename(self.path.with_name("index_snapshot.old"))
+        self.assertIsNone(load_snapshot(self.path, DOCUMENTS, "test-model")[0])
+
+        def failing_embed(texts):
+            raise RuntimeError("embedding down")
+
+        with self.assertRaises(RuntimeError):
+            build_snapshot(DOCUMENTS, chunk_regulation, failing_embed, self.path, "test-model")
+        self.assertIsNotNone(load_snapshot(self.path, DOCUMENTS, "test-model")[0])
+
+    def test_stale_or_mismatched_snapshots_rejected(self):
+        changed = [dict(DOCUMENTS[0], content="Gifts are allowable."), DOCUMENTS[1]]
+        self.assertIsNone(load_snapshot(self.path, changed, "test-model")[0])
+        self.assertIn("other-model", check_snapshot(self.path, DOCUMENTS, "other-model")[1])
+        self.assertIn("chunking", check_snapshot(self.path, DOCUMENTS, "test-model", chunker="other")[1])
+        self.assertIsNone(load_snapshot(Path(self.tmpdir.name) / "missing")[0])
+
+    def test_corrupted_file_fails_checksum(self):
+        with open(self.path / "chunks.json", "a") as f:
+            f.write(" ")
+        meta, reason = check_snapshot(self.path, DOCUMENTS, "test-model")
+        self.assertIsNone(meta)
+        self.assertIn("chunks.json", reason)
+        self.assertIsNotNone(check_snapshot(self.path, DOCUMENTS, "test-model", verify=False)[0])
+
+    def test_metadata_records_sources(self):
+        with open(self.path / SNAPSHOT_FILE) as f:
+            meta = json.load(f)
+        self.assertEqual(sorted(meta["sources"]), ["K-Fund-Guidelines", "K-Fund-Line-Item-Rules"])
+        self.assertEqual(sorted(meta["checksums"]), ["chunks.json", "embeddings.npy"])
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
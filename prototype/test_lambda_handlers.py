@@ -0,0 +1,183 @@
+"""
+Unit Tests for the src/ Lambda handlers against local stand-ins.
+
+S3 is mocked by moto; Bedrock and OpenSearch are served in-process by
+src/local_stack/fake_services.py. Skipped when src/ or boto3/moto are not
+available.
+"""
+
+import io
+import json
+import math
+import os
+import sys
+import unittest
+from pathlib import Path
+from unittest import mock
+from urllib.parse import quote_plus
+
+SRC = Path(__file__).parent.parent / "src"
+BUCKET = "compliance-documents"
+
+try:
+    from botocore.response import StreamingBody
+    from moto import mock_aws
+except ImportError:  # boto3/moto are only needed for the Lambda packages
+    mock_aws = None
+
+ENV = {
+    "AWS_ACCESS_KEY_ID": "testing",
+    "AWS_SECRET_ACCESS_KEY": "testing",
+    "AWS_REGION": "us-gov-west-1",
+    "OPENSEARCH_SIGV4": "false",
+}
+
+SECTION = "## Rule {n}: Section {n}\n\n" + "Representational expenses for foreign officials. " * 20 + "\n"
+
+
+def setUpModule():
+    global aws, document_processor, fake, fake_server, rag_query, saved_environ
+    if mock_aws is None or not SRC.exists():
+        raise unittest.SkipTest("src/ or boto3/moto not available")
+    for package in ("local_stack", "ingestion", "search"):
+        sys.path.insert(0, str(SRC / package))
+    import fake_services
+
+    fake_server, fake = fake_services.start()
+    endpoint = f"http://127.0.0.1:{fake_server.server_port}"
+    saved_environ = dict(os.environ)
+    os.environ.update({**ENV, "BEDROCK_ENDPOINT_URL": endpoint, "OPENSEARCH_ENDPOINT": endpoint})
+    aws = mock_aws()
+    aws.start()
+
+    import document_processor
+    import rag_query
+    for module in (document_processor, rag_query):
+        module.OPENSEARCH_ENDPOINT = endpoint
+        module.OPENSEARCH_SIGV4 = False
+    document_processor.get_s3_client().create_bucket(
+        Bucket=BUCKET, CreateBucketConfiguration={"LocationConstraint": "us-gov-west-1"}
+    )
+
+
+def tearDownModule():
+    aws.stop()
+    fake_server.shutdown()
+    os.environ.clear()
+    os.environ.update(saved_environ)
+
+
+def s3_event(keys):
+    return {"Records": [{"s3": {"bucket": {"name": BUCKET}, "object": {"key": quote_plus(key)}}} for key in keys]}
+
+
+def upload(key, text):
+    document_processor.get_s3_client().put_object(Bucket=BUCKET, Key=key, Body=text.encode("utf-8"))
+
+
+class TestIngestionHandler(unittest.TestCase):
+
+    def test_missing_object_is_reported_with_207(self):
+        upload("regulations/ITAR Part 121.md", SECTION.format(n=1))
+        response = document_processor.lambda_handler(
+            s3_event(["regulations/ITAR Part 121.md", "regulations/Missing Policy.md"]), None
+        )
+        body = json.loads(response["body"])
+
+        self.assertEqual(response["statusCode"], 207)
+        self.assertEqual((body["processed"], body["failed"]), (1, 1))
+        statuses = {result["key"]: result["status"] for result in body["documents"]}
+        self.assertEqual(statuses, {"regulations/ITAR Part 121.md": "ok", "regulations/Missing Policy.md": "error"})
+
+    def test_rejected_chunks_are_reported_with_207(self):
+        upload("regulations/EAR Part 734.md", SECTION.format(n=1) + SECTION.format(n=2))
+        real = document_processor.generate_embedding
+
+        def embedding(text):
+            return ["not a number"] if "Rule 2" in text else real(text)
+
+        with mock.patch.object(document_processor, "generate_embedding", embedding):
+            response = document_processor.lambda_handler(s3_event(["regulations/EAR Part 734.md"]), None)
+        result = json.loads(response["body"])["documents"][0]
+
+        self.assertEqual(response["statusCode"], 207)
+        self.assertEqual(result["status"], "partial")
+        self.assertEqual((result["chunks"], result["indexed"]), (2, 1))
+        self.assertEqual(result["failed_chunks"][0]["status"], 400)
+
+    def test_chunks_indexed_in_bulk_batches(self):
+        text = "".join(SECTION.format(n=n) for n in range(7))
+        upload("regulations/State Policy.md", text)
+        before = fake.bulk_requests
+
+        with mock.patch.object(document_processor, "BULK_BATCH_SIZE", 3):
+            result = document_processor.process_document(BUCKET, "regulations/State Policy.md")
+
+        self.assertEqual((result["chunks"], result["indexed"]), (7, 7))
+        self.assertEqual(fake.bulk_requests - before, math.ceil(7 / 3))
+
+    def test_streamed_lines_match_whole_read(self):
+        for text in ("a\nb", "a\nb\n", "", "\n\nx", "§ 121.1 — Défense\n" * 5 + "end"):
+            data = text.encode("utf-8")
+            for chunk_size in (1, 2, 3, 7, 64):
+                lines = list(document_processor.iter_object_lines(StreamingBody(io.BytesIO(data), len(data)),
+                                                                  chunk_size))
+                self.assertEqual(lines, text.split("\n"), (text, chunk_size))
+
+
+class TestQueryHandler(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        upload("regulations/ITAR Part 122.md", SECTION.format(n=1) + SECTION.format(n=2))
+        upload("regulations/EAR Part 740.md", SECTION.format(n=3))
+        document_processor.lambda_handler(
+            s3_event(["regulations/ITAR Part 122.md", "regulations/EAR Part 740.md"]), None
+        )
+
+    def search_request(self, **kwargs):
+        requests = []
+        real = rag_query.opensearch_request
+
+        def recording(method, path, body=None):
+            requests.append(json.loads(body))
+            return real(method, path, body)
+
+        with mock.patch.object(rag_query, "opensearch_request", recording):
+            chunks = rag_query.vector_search(rag_query.generate_embedding("foreign officials"), **kwargs)
+        return requests[0], chunks
+
+    def test_knn_request_filters_inside_knn_and_trims_source(self):
+        query, chunks = self.search_request(top_k=2, filters={"regulation_type": ["ITAR"]}, k=50, ef_search=100)
+        knn = query["query"]["knn"]["embedding"]
+
+        self.assertEqual(query["size"], 2)
+        self.assertEqual(query["_source"], rag_query.SOURCE_FIELDS)
+        self.assertEqual(knn["k"], 50)
+        self.assertEqual(knn["method_parameters"], {"ef_search": 100})
+        self.assertEqual(knn["filter"], {"bool": {"filter": [{"terms": {"regulation_type": ["ITAR"]}}]}})
+        self.assertEqual([c["regulation_type"] for c in chunks], ["ITAR", "ITAR"])
+        self.assertLessEqual({c["regulation_section"] for c in chunks}, {"Rule 1", "Rule 2"})
+
+    def test_knn_defaults_without_filter(self):
+        with mock.patch.object(rag_query, "KNN_K", 0), mock.patch.object(rag_query, "KNN_EF_SEARCH", 0):
+            query, _ = self.search_request(top_k=3)
+        knn = query["query"]["knn"]["embedding"]
+
+        self.assertEqual(knn["k"], 3)
+        self.assertNotIn("filter", knn)
+        self.assertNotIn("method_parameters", knn)
+
+    def test_handler_answers_with_citations(self):
+        response = rag_query.lambda_handler({"body": json.dumps({
+            "question": "Are foreign official expenses allowable?", "filters": {"regulation_type": "EAR"}
+        })}, None)
+        body = json.loads(response["body"])
+
+        self.assertEqual(response["statusCode"], 200)
+        self.assertEqual(body["confidence"], "medium")
+        self.assertEqual({c["regulation"] for c in body["citations"]}, {"EAR"})
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
@@ -0,0 +1,78 @@
+"""
+Unit Tests for the shared structure-aware chunker.
+"""
+
+import unittest
+from pathlib import Path
+
+from markdown_chunker import chunk_markdown, section_label
+
+RULES = """# K Fund Line Item Classification Rules
+
+## Rule Set 1: Always Allowable
+
+### Rule 1.1: Gifts to Foreign Officials
+**Trigger Words:** gift, present, commemorative
+**Classification:** K_FUND_ALLOWABLE
+**Authority:** 22 U.S.C. § 2694
+
+---
+
+### Rule 1.2: Food and Beverage for Foreign Guests
+**Trigger Words:** dinner, lunch, reception, catering
+**Classification:** K_FUND_ALLOWABLE (may require proration)
+"""
+
+
+def chunks(text, **kwargs):
+    return list(chunk_markdown(text.split("\n"), {"source": "rules"}, **kwargs))
+
+
+class TestChunkMarkdown(unittest.TestCase):
+
+    def test_one_chunk_per_rule_with_section_metadata(self):
+        result = chunks(RULES)
+        self.assertEqual(len(result), 2)
+        first, second = result
+        self.assertTrue(first["content"].startswith("# K Fund Line Item Classification Rules"))
+        self.assertIn("### Rule 1.1", first["content"])
+        self.assertNotIn("Rule 1.2", first["content"])
+        self.assertNotIn("---", first["content"])
+        self.assertEqual(first["metadata"]["section"], "Rule 1.1")
+        self.assertEqual(second["metadata"]["heading_path"],
+                         "K Fund Line Item Classification Rules > Rule Set 1: Always Allowable > "
+                         "Rule 1.2: Food and Beverage for Foreign Guests")
+        self.assertEqual([c["metadata"]["chunk_index"] for c in result], [0, 1])
+        self.assertEqual(first["metadata"]["source"], "rules")
+
+    def test_long_section_split_at_paragraphs_with_heading_repeated(self):
+        paragraphs = "\n\n".join(f"Paragraph {i} " + "word " * 40 for i in range(6))
+        result = chunks(f"## § 121.1 General\n\n{paragraphs}", max_tokens=120)
+        self.assertGreater(len(result), 1)
+        for chunk in result:
+            self.assertTrue(chunk["content"].startswith("## § 121.1 General"))
+            self.assertLessEqual(len(chunk["content"]) // 4, 120)
+            self.assertEqual(chunk["metadata"]["section"], "§ 121.1")
+        body = "\n".join(c["content"] for c in result)
+        for i in range(6):
+            self.assertEqual(body.count(f"Paragraph {i} "), 1)
+
+    def test_headings_inside_code_fences_ignored(self):
+        result = chunks("## Real\n\n```\n# not a heading\n```\n" + "text " * 30)
+        self.assertEqual(len(result), 1)
+        self.assertEqual(result[0]["metadata"]["heading_path"], "Real")
+
+    def test_section_labels(self):
+        self.assertEqual(section_label("§121.16 Exemptions"), "§ 121.16")
+        self.assertEqual(section_label("Rule 2.1: Security Costs"), "Rule 2.1")
+        self.assertIsNone(section_label("Rule Set 2: Never Allowable"))
+
+    def test_lambda_copy_is_identical(self):
+        lambda_copy = Path(__file__).parent.parent / "src" / "ingestion" / "markdown_chunker.py"
+        if not lambda_copy.exists():
+            self.skipTest("src/ingestion not present")
+        self.assertEqual(lambda_copy.read_text(), (Path(__file__).parent / "markdown_chunker.py").read_text())
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
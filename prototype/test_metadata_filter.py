@@ -0,0 +1,45 @@
+"""
+Unit Tests for retrieval metadata filters.
+"""
+
+import unittest
+
+from metadata_filter import build_where, matches, where_key
+
+
+class TestBuildWhere(unittest.TestCase):
+
+    def test_no_filters(self):
+        self.assertIsNone(build_where(None))
+        self.assertIsNone(build_where({"regulation_type": None, "source": "", "section": []}))
+
+    def test_single_and_combined_fields(self):
+        self.assertEqual(build_where({"regulation_type": "K_FUND"}), {"regulation_type": "K_FUND"})
+        self.assertEqual(
+            build_where({"regulation_type": ["ITAR", "EAR"], "section": "§ 121.1"}),
+            {"$and": [{"regulation_type": {"$in": ["ITAR", "EAR"]}}, {"section": "§ 121.1"}]}
+        )
+        self.assertEqual(build_where({"source": ["K-Fund-Guidelines"]}), {"source": "K-Fund-Guidelines"})
+
+    def test_where_key_is_order_independent(self):
+        self.assertEqual(where_key({"a": 1, "b": 2}), where_key({"b": 2, "a": 1}))
+        self.assertEqual(where_key(None), "")
+
+
+class TestMatches(unittest.TestCase):
+
+    def test_evaluates_built_clauses(self):
+        meta = {"regulation_type": "ITAR", "section": "§ 121.1"}
+        self.assertTrue(matches(meta, build_where({"regulation_type": ["ITAR", "EAR"], "section": "§ 121.1"})))
+        self.assertFalse(matches(meta, build_where({"regulation_type": "K_FUND"})))
+        self.assertFalse(matches({"regulation_type": "ITAR"}, build_where({"section": "§ 121.1"})))
+        self.assertTrue(matches(meta, None))
+
+    def test_or_and_negation(self):
+        meta = {"regulation_type": "EAR"}
+        self.assertTrue(matches(meta, {"$or": [{"regulation_type": "ITAR"}, {"regulation_type": "EAR"}]}))
+        self.assertFalse(matches(meta, {"regulation_type": {"$nin": ["EAR"]}}))
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
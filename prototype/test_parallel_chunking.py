@@ -0,0 +1,56 @@
+"""
+Unit Tests for process-pool chunking.
+"""
+
+import tempfile
+import unittest
+from pathlib import Path
+
+import chromadb
+
+from incremental_ingest import sync_collection
+from ingest_test_helpers import paragraph_chunks
+from parallel_chunking import ordered_map, pool_map
+
+
+def square(n):
+    return n * n
+
+
+def embed(texts):
+    return [[float(len(t)), 1.0] for t in texts]
+
+
+class TestOrderedMap(unittest.TestCase):
+
+    def test_process_pool_preserves_order(self):
+        self.assertEqual(list(ordered_map(square, range(20), workers=2, window=3)), [n * n for n in range(20)])
+
+    def test_single_worker_is_lazy(self):
+        consumed = []
+
+        def items():
+            for n in range(5):
+                consumed.append(n)
+                yield n
+
+        results = ordered_map(square, items(), workers=1)
+        self.assertEqual(next(results), 0)
+        self.assertEqual(consumed, [0])
+
+    def test_sync_with_worker_processes_matches_serial(self):
+        documents = [{"content": f"{n}a\n\n{n}b", "metadata": {"source": f"doc-{n}"}} for n in range(6)]
+        with tempfile.TemporaryDirectory() as tmpdir:
+            client = chromadb.PersistentClient(path=tmpdir)
+            serial = client.create_collection("serial")
+            pooled = client.create_collection("pooled")
+            a = sync_collection(serial, documents, paragraph_chunks, embed, Path(tmpdir) / "a.json")
+            b = sync_collection(pooled, documents, paragraph_chunks, embed, Path(tmpdir) / "b.json",
+                                batch_size=3, chunk_map=pool_map(2))
+            self.assertEqual(a["corpus_version"], b["corpus_version"])
+            self.assertEqual(b["files_rechunked"], 6)
+            self.assertEqual(sorted(serial.get()["ids"]), sorted(pooled.get()["ids"]))
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
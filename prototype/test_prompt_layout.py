@@ -0,0 +1,51 @@
+"""
+Unit Tests for the cache-friendly prompt layout.
+"""
+
+import unittest
+from types import SimpleNamespace
+
+from prompt_layout import build_messages, find_rules_file, load_rules_block, usage_tokens
+
+
+class TestRulesBlock(unittest.TestCase):
+
+    def test_always_and_never_rule_sets_only(self):
+        block = load_rules_block(find_rules_file())
+        self.assertTrue(block.startswith("## Rule Set 1: Always Allowable"))
+        self.assertIn("### Rule 2.4: Transportation", block)
+        self.assertNotIn("Rule Set 3", block)
+
+    def test_missing_file(self):
+        self.assertEqual(load_rules_block("/nonexistent/rules.md"), "")
+
+
+class TestBuildMessages(unittest.TestCase):
+
+    def test_variables_come_last(self):
+        """Two items with the same context share everything up to their variables."""
+        first = build_messages("SYSTEM", "RULES", "K Fund Guidelines", "CONTEXT", "Line item: quartet")
+        second = build_messages("SYSTEM", "RULES", "K Fund Guidelines", "CONTEXT", "Line item: motorcade")
+
+        self.assertEqual(first[0], second[0])
+        self.assertIn("RULES", first[0]["content"])
+        prefix = "K Fund Guidelines:\nCONTEXT\n\n"
+        self.assertTrue(first[1]["content"].startswith(prefix))
+        self.assertTrue(first[1]["content"].endswith("Line item: quartet"))
+
+
+class TestUsageTokens(unittest.TestCase):
+
+    def test_cached_tokens_extracted(self):
+        usage = SimpleNamespace(prompt_tokens=2000, completion_tokens=80,
+                                prompt_tokens_details=SimpleNamespace(cached_tokens=1536))
+        self.assertEqual(usage_tokens(usage), {"prompt_tokens": 2000, "cached_tokens": 1536, "completion_tokens": 80})
+
+    def test_missing_usage_or_details(self):
+        self.assertEqual(usage_tokens(None)["cached_tokens"], 0)
+        usage = SimpleNamespace(prompt_tokens=10, completion_tokens=5, prompt_tokens_details=None)
+        self.assertEqual(usage_tokens(usage)["cached_tokens"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
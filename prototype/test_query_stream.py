@@ -0,0 +1,109 @@
+"""
+Unit Tests for the /api/v1/query/stream Server-Sent Events endpoint.
+"""
+
+import asyncio
+import json
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+import api_server
+from api_server import QueryRequest, query_compliance_stream
+
+RESULTS = {
+    "ids": [["chunk_1"]],
+    "documents": [["Gifts to foreign officials are allowable."]],
+    "metadatas": [[{"source": "K-Fund-Guidelines", "regulation_type": "K_FUND", "chunk_index": 0}]],
+    "distances": [[0.2]],
+}
+
+
+def stream_chunk(text):
+    return SimpleNamespace(usage=None, choices=[SimpleNamespace(delta=SimpleNamespace(content=text))])
+
+
+class FakeCompletions:
+    """chat.completions stand-in that logs when a stream is opened."""
+
+    def __init__(self, log, texts=(), error=None):
+        self.log = log
+        self.texts = texts
+        self.error = error
+
+    async def create(self, **kwargs):
+        self.log.append("open")
+        if self.error:
+            raise self.error
+
+        async def chunks():
+            for text in self.texts:
+                yield stream_chunk(text)
+
+        return chunks()
+
+
+def parse_event(raw):
+    lines = raw.strip().split("\n")
+    return lines[0][len("event: "):], json.loads(lines[1][len("data: "):])
+
+
+class TestQueryStream(unittest.TestCase):
+
+    def setUp(self):
+        self.log = []
+        patches = [
+            mock.patch.object(api_server, "ANSWER_CACHE_ENABLED", False),
+            mock.patch.object(api_server, "retrieve_for_question", mock.AsyncMock(return_value=RESULTS)),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def prepare(self, cached=None):
+        return mock.patch.object(api_server, "prepare_question",
+                                 mock.AsyncMock(return_value=(None, [1.0, 0.0], "v1", cached)))
+
+    def client(self, completions):
+        return mock.patch.object(api_server, "async_openai_client",
+                                 SimpleNamespace(chat=SimpleNamespace(completions=completions)))
+
+    def run_stream(self):
+        async def consume():
+            response = await query_compliance_stream(QueryRequest(question="Are gifts allowable?"))
+            events = []
+            async for raw in response.body_iterator:
+                event = parse_event(raw)
+                self.log.append(event[0])
+                events.append(event)
+            return events
+
+        return asyncio.run(consume())
+
+    def test_citations_sent_before_completion_is_opened(self):
+        with self.prepare(), self.client(FakeCompletions(self.log, ["Yes, ", "allowable. HIGH"])):
+            events = self.run_stream()
+        self.assertEqual(self.log, ["citations", "open", "token", "token", "done"])
+        self.assertEqual(events[0][1]["citations"][0]["source"], "K-Fund-Guidelines")
+        self.assertEqual("".join(data["text"] for name, data in events if name == "token"), "Yes, allowable. HIGH")
+        self.assertEqual(events[-1], ("done", {"confidence": "high"}))
+
+    def test_failure_to_open_completion_is_an_error_event(self):
+        with self.prepare(), self.client(FakeCompletions(self.log, error=ValueError("model unavailable"))):
+            events = self.run_stream()
+        self.assertEqual(self.log, ["citations", "open", "error"])
+        self.assertEqual(events[-1][1]["detail"], "model unavailable")
+
+    def test_cached_answer_is_replayed_without_completion(self):
+        cached = {"answer": "Cached answer", "confidence": "low",
+                  "citations": [{"source": "K-Fund-Guidelines", "regulation_type": "K_FUND",
+                                 "relevance_score": 0.9, "matched_text": "Gifts"}]}
+        with self.prepare(cached), self.client(FakeCompletions(self.log)):
+            events = self.run_stream()
+        self.assertEqual(self.log, ["citations", "token", "done"])
+        self.assertEqual(events[1], ("token", {"text": "Cached answer"}))
+        self.assertEqual(events[2], ("done", {"confidence": "low"}))
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
@@ -0,0 +1,50 @@
+"""
+Unit Tests for reciprocal rank fusion of multi-query results.
+"""
+
+import unittest
+
+from rank_fusion import reciprocal_rank_fusion
+
+
+def make_results(rows):
+    """Chroma-shaped result where each hit's text is derived from its id."""
+    return {
+        "ids": rows,
+        "documents": [[f"text of {chunk_id}" for chunk_id in row] for row in rows],
+        "metadatas": [[{"source": "K-Fund", "chunk_index": int(chunk_id[1:])} for chunk_id in row] for row in rows],
+    }
+
+
+class TestReciprocalRankFusion(unittest.TestCase):
+
+    def test_chunks_found_by_several_queries_rank_first(self):
+        """A chunk ranked second by two queries beats one ranked first by a single query."""
+        fused = reciprocal_rank_fusion(make_results([["c1", "c2"], ["c3", "c2"]]))
+
+        self.assertEqual(fused[0]["id"], "c2")
+        self.assertEqual(fused[0]["hits"], 2)
+        self.assertAlmostEqual(fused[0]["score"], 2 / 62)
+        self.assertEqual([c["id"] for c in fused], ["c2", "c1", "c3"])
+
+    def test_deduplicated_by_id_not_text_prefix(self):
+        """Chunks sharing a text prefix stay distinct; repeats of one id collapse."""
+        results = make_results([["c1", "c2"], ["c1"]])
+        results["documents"] = [["Shared prefix A", "Shared prefix B"], ["Shared prefix A"]]
+        fused = reciprocal_rank_fusion(results)
+
+        self.assertEqual(len(fused), 2)
+        self.assertEqual(fused[0]["content"], "Shared prefix A")
+        self.assertEqual(fused[0]["chunk_index"], 1)
+
+    def test_relevance_breaks_ties_and_limit(self):
+        fused = reciprocal_rank_fusion(make_results([["c1"], ["c2"]]), relevance=[[0.2], [0.9]], limit=1)
+        self.assertEqual([c["id"] for c in fused], ["c2"])
+        self.assertAlmostEqual(fused[0]["relevance"], 0.9)
+
+    def test_empty_results(self):
+        self.assertEqual(reciprocal_rank_fusion({"ids": [[]], "documents": [[]], "metadatas": [[]]}), [])
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
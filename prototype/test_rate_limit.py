@@ -0,0 +1,85 @@
+"""
+Unit Tests for shared 429 / Retry-After handling.
+"""
+
+import asyncio
+import unittest
+from types import SimpleNamespace
+
+from rate_limit import RateLimitGate, retry_after_seconds
+
+
+class FakeRateLimitError(Exception):
+    """Mimics the status_code/response shape of provider API errors."""
+
+    def __init__(self, headers):
+        super().__init__("rate limited")
+        self.status_code = 429
+        self.response = SimpleNamespace(headers=headers)
+
+
+class TestRateLimit(unittest.TestCase):
+
+    def test_retry_after_header_parsing(self):
+        """Both Retry-After and the millisecond variant are honoured."""
+        self.assertEqual(retry_after_seconds(FakeRateLimitError({"retry-after": "2"})), 2.0)
+        self.assertEqual(retry_after_seconds(FakeRateLimitError({"retry-after-ms": "250"})), 0.25)
+        self.assertIsNone(retry_after_seconds(FakeRateLimitError({})))
+        self.assertIsNone(retry_after_seconds(ValueError("no response")))
+
+    def test_retries_after_429_then_succeeds(self):
+        """A throttled call is retried after the provider's delay."""
+        gate = RateLimitGate(max_retries=3)
+        attempts = []
+
+        async def flaky():
+            attempts.append(1)
+            if len(attempts) < 3:
+                raise FakeRateLimitError({"retry-after-ms": "1"})
+            return "ok"
+
+        self.assertEqual(asyncio.run(gate.acall(flaky)), "ok")
+        self.assertEqual(len(attempts), 3)
+        self.assertEqual(gate.throttled, 2)
+
+    def test_gives_up_after_max_retries(self):
+        """The 429 is surfaced once retries are exhausted."""
+        gate = RateLimitGate(max_retries=1)
+
+        async def always_throttled():
+            raise FakeRateLimitError({"retry-after-ms": "1"})
+
+        with self.assertRaises(FakeRateLimitError):
+            asyncio.run(gate.acall(always_throttled))
+
+    def test_transient_errors_retried_without_shared_pause(self):
+        """A dropped connection is retried by its caller but does not pause everyone."""
+        gate = RateLimitGate(max_retries=2, base_delay=0)
+        attempts = []
+
+        async def flaky():
+            attempts.append(1)
+            if len(attempts) < 2:
+                raise ConnectionError("reset by peer")
+            return "ok"
+
+        self.assertEqual(asyncio.run(gate.acall(flaky)), "ok")
+        self.assertEqual(len(attempts), 2)
+        self.assertEqual(gate.throttled, 0)
+
+    def test_other_errors_are_not_retried(self):
+        """Non-transient errors propagate immediately."""
+        gate = RateLimitGate()
+        attempts = []
+
+        async def broken():
+            attempts.append(1)
+            raise ValueError("bad request")
+
+        with self.assertRaises(ValueError):
+            asyncio.run(gate.acall(broken))
+        self.assertEqual(len(attempts), 1)
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
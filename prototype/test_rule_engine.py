@@ -0,0 +1,78 @@
+"""
+Unit Tests for the K Fund rule engine fast path.
+"""
+
+import unittest
+
+import rule_engine
+
+
+class TestRuleEngine(unittest.TestCase):
+
+    def test_gift_is_decided_with_gift_authority(self):
+        """Gifts bypass the LLM under 22 U.S.C. § 2694."""
+        verdict = rule_engine.evaluate("Crystal vase gift for Ambassador", 2500)
+
+        self.assertEqual(verdict.classification, "K_FUND_ALLOWABLE")
+        self.assertEqual(verdict.authority, "22 U.S.C. § 2694")
+        self.assertEqual(verdict.rule_id, "1.1")
+        self.assertEqual(verdict.confidence, "high")
+
+    def test_food_and_beverage_requires_proration(self):
+        """Hospitality is allowable but prorated by foreign guest share."""
+        verdict = rule_engine.evaluate("Reception catering services", 4000)
+
+        self.assertEqual(verdict.classification, "K_FUND_ALLOWABLE")
+        self.assertTrue(verdict.needs_proration)
+
+    def test_never_allowable_item(self):
+        """Operational expenses are decided as NOT_ALLOWABLE."""
+        verdict = rule_engine.evaluate("Airport shuttle service for delegation", 2000)
+
+        self.assertEqual(verdict.classification, "NOT_ALLOWABLE")
+        self.assertEqual(verdict.rule_id, "2.4")
+
+    def test_prohibited_item(self):
+        """Personal expenses are rejected outright."""
+        verdict = rule_engine.evaluate("Spouse spa vacation", 900)
+
+        self.assertEqual(verdict.classification, "NOT_ALLOWABLE")
+        self.assertTrue(verdict.prohibited)
+
+    def test_prohibited_terms_match_whole_words(self):
+        """'personal' does not fire on 'personalized', nor 'family' on 'family-style'."""
+        self.assertFalse(rule_engine.is_prohibited("Personalized gift"))
+        self.assertFalse(rule_engine.is_prohibited("Family-style dinner"))
+        verdict = rule_engine.evaluate("Family-style dinner", 800)
+        self.assertTrue(verdict is None or not verdict.prohibited)
+        self.assertTrue(rule_engine.is_prohibited("Flowers for the ambassador's family"))
+        self.assertTrue(rule_engine.is_prohibited("Casinos"))
+
+    def test_whole_word_matching(self):
+        """'present' does not fire on 'presentation'; plurals still match."""
+        self.assertIsNone(rule_engine.evaluate("Slide presentation", 100))
+        self.assertEqual(rule_engine.evaluate("Guest gifts", 100).rule_id, "1.1")
+
+    def test_ambiguous_items_fall_through(self):
+        """Analysis triggers, conflicting rule families and unknown items go to RAG."""
+        self.assertIsNone(rule_engine.evaluate("Photography services", 1500))
+        self.assertIsNone(rule_engine.evaluate("Security for state dinner", 1500))
+        self.assertIsNone(rule_engine.evaluate("Staff overtime for event setup", 1500))
+        self.assertIsNone(rule_engine.evaluate("Miscellaneous event supplies", 500))
+
+    def test_generic_trigger_words_alone_fall_through(self):
+        """Generic words only decide in a qualified phrase ("printed program", "security screening")."""
+        for item in ("Hotel arrangements", "Cultural program performance fee",
+                     "Printed parking signs", "Film screening", "Floor protection", "Labor Day picnic"):
+            self.assertIsNone(rule_engine.evaluate(item, 500), item)
+        self.assertEqual(rule_engine.evaluate("Printed programs and place cards", 450).rule_id, "1.4")
+        self.assertEqual(rule_engine.evaluate("Guest screening at entrance", 500).rule_id, "2.1")
+        self.assertEqual(rule_engine.evaluate("Flower arrangements for tables", 300).rule_id, "1.3")
+
+    def test_high_value_items_fall_through(self):
+        """Items above the legal review threshold always get a full review."""
+        self.assertIsNone(rule_engine.evaluate("Dinner catering service", 10000))
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
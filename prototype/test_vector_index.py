@@ -0,0 +1,74 @@
+"""
+Unit Tests for the in-process NumPy vector index.
+"""
+
+import tempfile
+import unittest
+
+import numpy as np
+
+from vector_index import ROW_CACHE_SIZE, NumpyVectorIndex
+
+
+def make_index():
+    embeddings = np.array([
+        [1.0, 0.0, 0.0],
+        [0.0, 2.0, 0.0],   # not normalized on purpose
+        [0.7, 0.7, 0.0],
+        [0.0, 0.0, 1.0],
+    ])
+    ids = ["a", "b", "c", "d"]
+    documents = ["gift", "security", "gift and security", "catering"]
+    metadatas = [{"source": f"doc-{i}"} for i in ids]
+    return NumpyVectorIndex(ids, documents, metadatas, embeddings, id="v1")
+
+
+class TestNumpyVectorIndex(unittest.TestCase):
+
+    def test_batched_top_k_with_cosine_scores(self):
+        """Each query gets its own best-first top-k with real cosine scores."""
+        index = make_index()
+        results = index.query([[1.0, 0.0, 0.0], [0.0, 0.0, 5.0]], n_results=2)
+
+        self.assertEqual(results["ids"], [["a", "c"], ["d", "a"]])
+        self.assertAlmostEqual(results["scores"][0][0], 1.0, places=5)
+        self.assertAlmostEqual(results["scores"][0][1], 0.7071, places=3)
+        self.assertAlmostEqual(results["distances"][1][0], 0.0, places=5)
+        self.assertEqual(results["documents"][0][0], "gift")
+
+    def test_where_filter_applied_before_top_k(self):
+        """A filter returns the best matching rows, not the filtered remains of the global top-k."""
+        index = make_index()
+        results = index.query([[1.0, 0.0, 0.0]], n_results=2, where={"source": {"$in": ["doc-b", "doc-d"]}})
+        self.assertEqual(sorted(results["ids"][0]), ["b", "d"])
+        self.assertEqual(index.query([[1.0, 0.0, 0.0]], n_results=2, where={"source": "none"})["ids"], [[]])
+
+    def test_where_row_cache_is_bounded(self):
+        """Distinct request filters evict old row sets instead of growing the cache."""
+        index = make_index()
+        for i in range(ROW_CACHE_SIZE + 10):
+            index.rows({"source": f"doc-{i}"})
+        self.assertEqual(len(index._rows), ROW_CACHE_SIZE)
+        self.assertEqual(index.rows({"source": "doc-b"}).tolist(), [1])
+
+    def test_k_larger_than_corpus(self):
+        """Asking for more results than chunks returns every chunk, ranked."""
+        results = make_index().query([[0.0, 1.0, 0.0]], n_results=10)
+        self.assertEqual(results["ids"][0][:2], ["b", "c"])
+        self.assertEqual(len(results["ids"][0]), 4)
+
+    def test_save_and_memory_mapped_load(self):
+        """A saved index reloads memory-mapped with identical results."""
+        index = make_index()
+        with tempfile.TemporaryDirectory() as tmpdir:
+            index.save(tmpdir)
+            loaded = NumpyVectorIndex.load(tmpdir, mmap=True)
+
+            self.assertIsInstance(loaded.embeddings, np.memmap)
+            self.assertEqual(loaded.id, "v1")
+            self.assertEqual(loaded.count(), 4)
+            self.assertEqual(loaded.query([[0.6, 0.8, 0.0]], 3)["ids"], index.query([[0.6, 0.8, 0.0]], 3)["ids"])
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
@@ -0,0 +1,12 @@
+"""
+Cheap token estimates for budgeting prompts and embedding requests.
+
+Used where an exact tokenizer is not worth the dependency: packing prompt
+context, sizing batched classification prompts and splitting embedding
+requests under the provider's token limit.
+"""
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (~4 characters per token for English text)."""
+    return max(1, len(text) // 4)
@@ -0,0 +1,171 @@
+"""
+In-process NumPy vector index.
+
+The K Fund corpus is a few hundred chunks, small enough to keep as one float32
+matrix of normalized embeddings. A batch of query vectors is answered with a
+single matrix multiply plus argpartition top-k. The class mirrors the subset
+of the Chroma collection API the server uses (query with `where`, count, id),
+so it can be swapped in with VECTOR_BACKEND=numpy. A `where` filter restricts
+the multiply to the matching rows before top-k.
+"""
+
+import json
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from incremental_ingest import corpus_version
+from metadata_filter import matches, where_key
+
+EMBEDDINGS_FILE = "embeddings.npy"
+CHUNKS_FILE = "chunks.json"
+
+# Row sets kept for recently used where clauses; filters come from request
+# bodies, so the cache must not grow with every distinct clause
+ROW_CACHE_SIZE = 32
+
+
+def normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    """L2-normalize each row (zero rows are left as zeros)."""
+    matrix = np.asarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+class NumpyVectorIndex:
+    """
+    Cosine-similarity index over normalized float32 embeddings.
+
+    Args:
+        ids: Chunk ids, one per row
+        documents: Chunk texts, one per row
+        metadatas: Chunk metadata dicts, one per row
+        embeddings: (n, d) matrix; rows are normalized unless already_normalized
+        id: Corpus version of the source collection, used for cache scoping
+    """
+
+    def __init__(self, ids: List[str], documents: List[str], metadatas: List[Dict],
+                 embeddings, id: str = "", already_normalized: bool = False):
+        self.ids = list(ids)
+        self.documents = list(documents)
+        self.metadatas = list(metadatas)
+        if len(self.ids):
+            self.embeddings = embeddings if already_normalized else normalize_rows(embeddings)
+        else:
+            self.embeddings = np.zeros((0, 0), dtype=np.float32)
+        self.id = id
+        self._rows: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._rows_lock = threading.Lock()
+
+    @classmethod
+    def from_collection(cls, collection) -> "NumpyVectorIndex":
+        """Copy every chunk and embedding out of a Chroma collection."""
+        data = collection.get(include=["embeddings", "documents", "metadatas"])
+        embeddings = data["embeddings"]
+        if embeddings is None or len(embeddings) == 0:
+            embeddings = np.zeros((0, 0), dtype=np.float32)
+        return cls(data["ids"], data["documents"], data["metadatas"], np.asarray(embeddings), id=corpus_version(collection))
+
+    @classmethod
+    def load(cls, path, mmap: bool = True) -> "NumpyVectorIndex":
+        """Load an index saved with save(); the matrix is memory-mapped by default."""
+        path = Path(path)
+        with open(path / CHUNKS_FILE) as f:
+            chunks = json.load(f)
+        embeddings = np.load(path / EMBEDDINGS_FILE, mmap_mode="r" if mmap else None)
+        return cls(chunks["ids"], chunks["documents"], chunks["metadatas"], embeddings,
+                   id=chunks.get("id", ""), already_normalized=True)
+
+    def save(self, path):
+        """Write the normalized matrix as .npy and the chunk texts/metadata as JSON."""
+        path = Path(path)
+        path.mkdir(parents=True, exist_ok=True)
+        np.save(path / EMBEDDINGS_FILE, np.ascontiguousarray(self.embeddings, dtype=np.float32))
+        with open(path / CHUNKS_FILE, "w") as f:
+            json.dump({
+                "id": self.id,
+                "ids": self.ids,
+                "documents": self.documents,
+                "metadatas": self.metadatas,
+            }, f)
+
+    def count(self) -> int:
+        return len(self.ids)
+
+    def rows(self, where: Optional[Dict]) -> Optional[np.ndarray]:
+        """Row numbers matching a where clause (None for no filter), LRU-cached per clause."""
+        if not where:
+            return None
+        key = where_key(where)
+        with self._rows_lock:
+            rows = self._rows.get(key)
+            if rows is not None:
+                self._rows.move_to_end(key)
+                return rows
+        rows = np.array(
+            [i for i, meta in enumerate(self.metadatas) if matches(meta or {}, where)], dtype=np.int64
+        )
+        with self._rows_lock:
+            self._rows[key] = rows
+            while len(self._rows) > ROW_CACHE_SIZE:
+                self._rows.popitem(last=False)
+        return rows
+
+    def search(self, query_embeddings, n_results: int, where: Optional[Dict] = None):
+        """
+        Top-k rows for a batch of query vectors, optionally among rows matching `where`.
+
+        Returns:
+            (indices, scores) arrays of shape (n_queries, k), best first
+        """
+        queries = normalize_rows(np.atleast_2d(np.asarray(query_embeddings, dtype=np.float32)))
+        rows = self.rows(where)
+        k = min(n_results, self.count() if rows is None else len(rows))
+        if k == 0:
+            empty = np.zeros((len(queries), 0))
+            return empty.astype(np.int64), empty.astype(np.float32)
+
+        scores = queries @ (self.embeddings if rows is None else self.embeddings[rows]).T
+        if k < scores.shape[1]:
+            top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        else:
+            top = np.tile(np.arange(scores.shape[1]), (len(queries), 1))
+        top_scores = np.take_along_axis(scores, top, axis=1)
+        order = np.argsort(-top_scores, axis=1)
+        top = np.take_along_axis(top, order, axis=1)
+        return (top if rows is None else rows[top]), np.take_along_axis(top_scores, order, axis=1)
+
+    def query(self, query_embeddings, n_results: int = 10, where: Optional[Dict] = None, **kwargs) -> Dict:
+        """
+        Chroma-compatible query result.
+
+        `distances` are cosine distances (1 - similarity) as with a cosine
+        Chroma space; `scores` carries the cosine similarities directly.
+        """
+        indices, scores = self.search(query_embeddings, n_results, where)
+        return {
+            "ids": [[self.ids[i] for i in row] for row in indices],
+            "documents": [[self.documents[i] for i in row] for row in indices],
+            "metadatas": [[self.metadatas[i] for i in row] for row in indices],
+            "distances": [[float(1.0 - s) for s in row] for row in scores],
+            "scores": [[float(s) for s in row] for row in scores],
+        }
+
+
+def load_or_build(collection, path) -> Optional[NumpyVectorIndex]:
+    """
+    Load the saved index if it was built from this collection, otherwise
+    rebuild it from Chroma and save it.
+    """
+    path = Path(path)
+    if (path / CHUNKS_FILE).exists() and (path / EMBEDDINGS_FILE).exists():
+        index = NumpyVectorIndex.load(path)
+        if index.id == corpus_version(collection) and index.count() == collection.count():
+            return index
+    index = NumpyVectorIndex.from_collection(collection)
+    index.save(path)
+    return NumpyVectorIndex.load(path)
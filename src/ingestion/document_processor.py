@@ -1,45 +1,206 @@
 """
 Document ingestion and processing for compliance search system.
 Extracts text, chunks documents, and generates embeddings.
+
+Every record of an S3 event is processed. A document is streamed from S3
+and chunked as it downloads; its chunks are embedded concurrently
+(EMBEDDING_CONCURRENCY Bedrock calls in flight, each with its own pooled
+connection) and indexed with OpenSearch _bulk requests of up to
+BULK_BATCH_SIZE chunks (one per document for typical regulations). The
+response reports per-document and per-chunk failures instead of stopping
+at the first one.
+
+Endpoints can be pointed at local stand-ins (see src/local_stack/):
+AWS_ENDPOINT_URL_S3 for S3 (e.g. moto), BEDROCK_ENDPOINT_URL and
+OPENSEARCH_ENDPOINT for the fake Bedrock/OpenSearch server.
 """
 
+import os
 import json
-import boto3
-from typing import List, Dict
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from functools import wraps
+from typing import Dict, Iterable, Iterator, List
+from urllib.parse import unquote_plus
 import hashlib
 
-s3_client = boto3.client('s3')
-bedrock_client = boto3.client('bedrock-runtime', region_name='us-gov-west-1')
+from markdown_chunker import chunk_markdown
+
+AWS_REGION = os.environ.get('AWS_REGION', 'us-gov-west-1')
+EMBEDDING_MODEL_ID = 'amazon.titan-embed-text-v1'
+
+# Concurrent Bedrock calls per document; the connection pool is sized to match
+EMBEDDING_CONCURRENCY = int(os.environ.get('EMBEDDING_CONCURRENCY', '8'))
+
+# S3 objects are read this many bytes at a time; chunks are indexed in _bulk batches of BULK_BATCH_SIZE
+STREAM_CHUNK_BYTES = int(os.environ.get('STREAM_CHUNK_BYTES', str(64 * 1024)))
+BULK_BATCH_SIZE = int(os.environ.get('BULK_BATCH_SIZE', '100'))
+
+OPENSEARCH_ENDPOINT = os.environ.get('OPENSEARCH_ENDPOINT', '')
+OPENSEARCH_INDEX = os.environ.get('OPENSEARCH_INDEX', 'compliance-chunks')
+OPENSEARCH_SERVICE = os.environ.get('OPENSEARCH_SERVICE', 'es')  # 'aoss' for OpenSearch Serverless
+OPENSEARCH_SIGV4 = os.environ.get('OPENSEARCH_SIGV4', 'true').lower() == 'true'
+
+def _memoized(factory):
+    """Build on first call (thread-safe) and return the same object to every later call."""
+    lock = threading.Lock()
+    built = []
+    
+    @wraps(factory)
+    def get():
+        if not built:
+            with lock:
+                if not built:
+                    built.append(factory())
+        return built[0]
+    return get
+
+# AWS clients are built on first use rather than at import: boto3 and each
+# client's service model cost a few hundred ms of cold start. Once built they
+# (and their keep-alive connection pools) are reused by warm invocations.
+
+@_memoized
+def get_session():
+    import boto3
+    return boto3.Session()
+
+@_memoized
+def get_boto_config():
+    from botocore.config import Config
+    return Config(
+        region_name=AWS_REGION,
+        max_pool_connections=EMBEDDING_CONCURRENCY,
+        connect_timeout=5,
+        read_timeout=60,
+        tcp_keepalive=True,
+        retries={'max_attempts': 5, 'mode': 'adaptive'}
+    )
+
+@_memoized
+def get_s3_client():
+    return get_session().client('s3', config=get_boto_config())
+
+@_memoized
+def get_bedrock_client():
+    return get_session().client(
+        'bedrock-runtime', config=get_boto_config(),
+        endpoint_url=os.environ.get('BEDROCK_ENDPOINT_URL') or None
+    )
+
+@_memoized
+def get_opensearch_http():
+    import urllib3
+    return urllib3.PoolManager(
+        maxsize=2,
+        timeout=urllib3.Timeout(connect=5, read=60),
+        retries=urllib3.Retry(total=3, backoff_factor=0.5, status_forcelist=(429, 502, 503, 504),
+                              allowed_methods=None)
+    )
+
+def warm():
+    """Build clients ahead of the first request."""
+    get_s3_client()
+    get_bedrock_client()
+    get_opensearch_http()
+
+# Provisioned concurrency and SnapStart run init ahead of traffic, so pay for clients there
+if os.environ.get('AWS_LAMBDA_INITIALIZATION_TYPE') in ('provisioned-concurrency', 'snap-start'):
+    warm()
+
+# Chunk embeddings keyed by (model, sha256(text)); re-uploads of unchanged
+# documents to a warm container skip Bedrock entirely
+EMBEDDING_CACHE_SIZE = int(os.environ.get('EMBEDDING_CACHE_SIZE', '4096'))
+_embedding_cache: "OrderedDict[str, List[float]]" = OrderedDict()
+_embedding_cache_lock = threading.Lock()
 
 def lambda_handler(event, context):
     """
-    Triggered by S3 upload. Processes document and stores in OpenSearch.
+    Triggered by S3 upload. Processes every uploaded document and stores it in OpenSearch.
+    
+    Returns 200 when every document was fully indexed, otherwise 207 with the
+    failed documents and chunks listed in the body.
     """
-    # Get bucket and key from S3 event
-    bucket = event['Records'][0]['s3']['bucket']['name']
-    key = event['Records'][0]['s3']['object']['key']
+    results = []
+    for record in event.get('Records', []):
+        # Get bucket and key from S3 event (keys arrive URL-encoded)
+        bucket = record['s3']['bucket']['name']
+        key = unquote_plus(record['s3']['object']['key'])
+        try:
+            results.append(process_document(bucket, key))
+        except Exception as e:
+            results.append({'key': key, 'status': 'error', 'error': str(e)})
     
-    # Download document
-    response = s3_client.get_object(Bucket=bucket, Key=key)
-    content = response['Body'].read().decode('utf-8')
+    for result in results:
+        if result['status'] != 'ok':
+            print(json.dumps({'ingestion_failure': result}))
+    
+    failed = any(result['status'] != 'ok' for result in results)
+    return {
+        'statusCode': 207 if failed else 200,
+        'body': json.dumps({
+            'processed': sum(result['status'] == 'ok' for result in results),
+            'failed': sum(result['status'] != 'ok' for result in results),
+            'documents': results
+        })
+    }
+
+def process_document(bucket: str, key: str) -> Dict:
+    """
+    Stream, chunk, embed and bulk-index one document.
+    
+    The object is read STREAM_CHUNK_BYTES at a time and chunks are embedded
+    and indexed as soon as they are complete, so indexing starts before the
+    download finishes and memory stays bounded by the in-flight chunks
+    rather than the object size.
+    """
+    response = get_s3_client().get_object(Bucket=bucket, Key=key)
     
     # Extract metadata from filename/path
     metadata = extract_metadata(key)
     
-    # Chunk document
-    chunks = chunk_document(content, metadata)
+    # Chunk document while it downloads
+    chunks = iter_chunks(iter_object_lines(response['Body']), metadata)
     
-    # Generate embeddings and store
-    for chunk in chunks:
-        embedding = generate_embedding(chunk['content'])
-        chunk['embedding'] = embedding
-        store_in_opensearch(chunk)
+    # Embed concurrently, indexing every BULK_BATCH_SIZE chunks with one _bulk request
+    total, indexed, failed = 0, 0, []
+    batch = []
+    for chunk in embed_chunks(chunks):
+        batch.append(chunk)
+        total += 1
+        if len(batch) >= BULK_BATCH_SIZE:
+            result = bulk_index(batch)
+            indexed += result['indexed']
+            failed.extend(result['failed'])
+            batch = []
+    if batch:
+        result = bulk_index(batch)
+        indexed += result['indexed']
+        failed.extend(result['failed'])
     
     return {
-        'statusCode': 200,
-        'body': json.dumps(f'Processed {len(chunks)} chunks from {key}')
+        'key': key,
+        'status': 'partial' if failed else 'ok',
+        'chunks': total,
+        'indexed': indexed,
+        'failed_chunks': failed
     }
 
+def iter_object_lines(body, chunk_size: int = None) -> Iterator[str]:
+    """
+    Decoded lines of an S3 object body, read chunk_size bytes at a time.
+    
+    Yields exactly the lines of body.read().decode('utf-8').split('\\n'), so
+    streamed and whole-object chunking produce the same chunks.
+    """
+    pending = b''
+    for block in body.iter_chunks(chunk_size or STREAM_CHUNK_BYTES):
+        lines = (pending + block).split(b'\n')
+        pending = lines.pop()
+        for line in lines:
+            yield line.decode('utf-8')
+    yield pending.decode('utf-8')
+
 def extract_metadata(key: str) -> Dict:
     """Extract regulation type and metadata from file path."""
     parts = key.split('/')
@@ -59,24 +220,111 @@ def extract_metadata(key: str) -> Dict:
     
     return metadata
 
-def chunk_document(content: str, metadata: Dict, chunk_size: int = 800) -> List[Dict]:
-    """Split document into chunks with overlap."""
-    chunks = []
-    words = content.split()
-    overlap = 100
-    
-    for i in range(0, len(words), chunk_size - overlap):
-        chunk_words = words[i:i + chunk_size]
-        chunk_text = ' '.join(chunk_words)
-        
-        chunk_id = hashlib.md5(chunk_text.encode()).hexdigest()
-        
-        chunks.append({
+def iter_chunks(lines: Iterable[str], metadata: Dict) -> Iterator[Dict]:
+    """Split document lines into section-aligned chunks as they arrive (shared chunker, see markdown_chunker.py)."""
+    for chunk in chunk_markdown(lines, {}):
+        chunk_text = chunk['content']
+        # Source + text, so identical passages in two documents stay separate OpenSearch docs
+        chunk_id = hashlib.md5(f"{metadata['source_document']}\0{chunk_text}".encode()).hexdigest()
+    
+        yield {
             'chunk_id': chunk_id,
             'content': chunk_text,
             'regulation_type': metadata['regulation_type'],
             'source_document': metadata['source_document'],
-            'chunk_index': len(chunks)
-        })
+            'chunk_index': chunk['metadata']['chunk_index'],
+            **{key: chunk['metadata'][key] for key in ('heading_path', 'section') if key in chunk['metadata']}
+        }
+
+def chunk_document(content: str, metadata: Dict) -> List[Dict]:
+    """Split a whole document into section-aligned chunks."""
+    return list(iter_chunks(content.split('\n'), metadata))
+
+def generate_embedding(text: str) -> List[float]:
+    """Generate embedding using Bedrock Titan (memoized per warm container)."""
+    key = f"{EMBEDDING_MODEL_ID}:{hashlib.sha256(text.encode('utf-8')).hexdigest()}"
+    with _embedding_cache_lock:
+        cached = _embedding_cache.get(key)
+        if cached is not None:
+            _embedding_cache.move_to_end(key)
+            return cached
+    
+    response = get_bedrock_client().invoke_model(
+        modelId=EMBEDDING_MODEL_ID,
+        body=json.dumps({'inputText': text})
+    )
+    
+    result = json.loads(response['body'].read())
+    with _embedding_cache_lock:
+        _embedding_cache[key] = result['embedding']
+        if len(_embedding_cache) > EMBEDDING_CACHE_SIZE:
+            _embedding_cache.popitem(last=False)
+    return result['embedding']
+
+def embed_chunks(chunks: Iterable[Dict]) -> Iterator[Dict]:
+    """
+    Add embeddings to a stream of chunks, in order, with up to
+    EMBEDDING_CONCURRENCY Bedrock calls in flight (Titan takes one text per call).
+    
+    Only a bounded window of chunks is held, so a slow Bedrock applies
+    backpressure to the download instead of buffering the document.
+    """
+    window = EMBEDDING_CONCURRENCY * 2
+    with ThreadPoolExecutor(max_workers=EMBEDDING_CONCURRENCY) as pool:
+        in_flight = deque()
+        for chunk in chunks:
+            in_flight.append((chunk, pool.submit(generate_embedding, chunk['content'])))
+            if len(in_flight) >= window:
+                chunk, future = in_flight.popleft()
+                yield {**chunk, 'embedding': future.result()}
+        while in_flight:
+            chunk, future = in_flight.popleft()
+            yield {**chunk, 'embedding': future.result()}
+
+def opensearch_request(method: str, path: str, body: str = None,
+                       content_type: str = 'application/json') -> Dict:
+    """Send a (SigV4-signed) request to OpenSearch over the pooled connection."""
+    if not OPENSEARCH_ENDPOINT:
+        raise RuntimeError('OPENSEARCH_ENDPOINT is not configured')
+    url = OPENSEARCH_ENDPOINT.rstrip('/') + path
+    data = body.encode('utf-8') if body is not None else None
+    headers = {'Content-Type': content_type}
+    if OPENSEARCH_SIGV4:
+        from botocore.auth import SigV4Auth
+        from botocore.awsrequest import AWSRequest
+        headers['X-Amz-Content-SHA256'] = hashlib.sha256(data or b'').hexdigest()
+        request = AWSRequest(method=method, url=url, data=data, headers=headers)
+        SigV4Auth(get_session().get_credentials(), OPENSEARCH_SERVICE, AWS_REGION).add_auth(request)
+        headers = dict(request.headers)
+    response = get_opensearch_http().request(method, url, body=data, headers=headers)
+    if response.status >= 300:
+        raise RuntimeError(f'OpenSearch {method} {path} failed with {response.status}: {response.data[:500]!r}')
+    return json.loads(response.data)
+
+def bulk_index(chunks: List[Dict], index: str = OPENSEARCH_INDEX) -> Dict:
+    """
+    Index chunks with a single _bulk request, keyed by chunk_id so re-ingestion overwrites.
+    
+    Returns:
+        Count of indexed chunks and a list of {chunk_id, status, error} for failed ones
+    """
+    if not chunks:
+        return {'indexed': 0, 'failed': []}
+    lines = []
+    for chunk in chunks:
+        lines.append(json.dumps({'index': {'_index': index, '_id': chunk['chunk_id']}}))
+        lines.append(json.dumps(chunk))
+    response = opensearch_request('POST', '/_bulk', '\n'.join(lines) + '\n', 'application/x-ndjson')
     
-    return chunks
+    failed = []
+    if response.get('errors'):
+        for item in response.get('items', []):
+            result = next(iter(item.values()))
+            if result.get('error'):
+                error = result['error']
+                failed.append({
+                    'chunk_id': result.get('_id'),
+                    'status': result.get('status'),
+                    'error': error.get('reason', error.get('type')) if isinstance(error, dict) else str(error)
+                })
+    return {'indexed': len(chunks) - len(failed), 'failed': failed}
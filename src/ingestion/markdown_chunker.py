@@ -0,0 +1,190 @@
+"""
+Structure-aware chunking for regulation markdown.
+
+Every ingestion path uses this one chunker so the same document always
+yields the same chunks (and so the same content-derived ids). Chunks follow
+the document's structure: a new chunk starts at every markdown heading, so a
+rule or regulation section ("§ 121.1", "Rule 1.1") is retrieved whole rather
+than cut mid-way and mixed with its neighbour. A section over the token limit
+is split at paragraph breaks (then lines), and each continuation repeats the
+section heading. Heading-only or very short sections (a title, "Rule Set 1")
+are folded into the section that follows instead of becoming chunks of their
+own.
+
+Each chunk's metadata carries `heading_path` ("Title > Rule Set 1 > Rule 1.1")
+and, when a heading names one, `section` ("§ 121.1", "Rule 1.1").
+
+CHUNKER_VERSION identifies the chunking rules and limits; indexes record it
+and are rebuilt when it changes. Bump CHUNKER_ID when the rules change.
+
+Input is an iterable of lines and output a generator, so a file can be
+chunked while it is read. The module is stdlib-only; the Lambda ingestion
+package keeps an identical copy (src/ingestion/markdown_chunker.py).
+"""
+
+import hashlib
+import re
+from typing import Dict, Iterable, Iterator, List, Optional
+
+CHUNKER_ID = "markdown-sections-1"
+MAX_TOKENS = 200
+MIN_TOKENS = 25
+CHARS_PER_TOKEN = 4
+
+HEADING = re.compile(r"^(#{1,6})\s+(.+?)\s*#*$")
+THEMATIC_BREAK = re.compile(r"^\s*([-*_])(\s*\1){2,}\s*$")
+FENCE = re.compile(r"^\s*(```|~~~)")
+SECTION_NUMBER = re.compile(r"(§+)\s*(\d+(?:\.\d+)*[a-z]?)|\b(Rule|Section|Part)\s+(\d+(?:\.\d+)*)")
+
+
+def chunker_version(max_tokens: int = MAX_TOKENS, min_tokens: int = MIN_TOKENS) -> str:
+    """Short hash of the chunker id and its limits."""
+    config = f"{CHUNKER_ID}:{max_tokens}:{min_tokens}:{CHARS_PER_TOKEN}"
+    return hashlib.sha256(config.encode("utf-8")).hexdigest()[:16]
+
+
+CHUNKER_VERSION = chunker_version()
+
+
+def section_label(heading: str) -> Optional[str]:
+    """'§ 121.1' or 'Rule 1.1' style label named in a heading, if any."""
+    match = SECTION_NUMBER.search(heading)
+    if not match:
+        return None
+    return f"§ {match.group(2)}" if match.group(1) else f"{match.group(3)} {match.group(4)}"
+
+
+def section_metadata(headings: List[tuple]) -> Dict:
+    """heading_path, and the section label of the deepest numbered heading."""
+    metadata = {}
+    if headings:
+        metadata["heading_path"] = " > ".join(text for _, text in headings)
+    for _, text in reversed(headings):
+        label = section_label(text)
+        if label:
+            metadata["section"] = label
+            break
+    return metadata
+
+
+class _Packer:
+    """Accumulates the lines of the current section and emits chunk texts."""
+
+    def __init__(self, metadata: Dict, max_tokens: int, min_tokens: int):
+        self.metadata = metadata
+        self.max_chars = max_tokens * CHARS_PER_TOKEN
+        self.min_chars = min_tokens * CHARS_PER_TOKEN
+        self.headings: List[tuple] = []
+        self.section: Dict = {}
+        self.lines: List[str] = []
+        self.chars = 0
+        self.floor = 0        # leading lines (the repeated heading) that never form a chunk alone
+        self.break_at = 0     # index of the last paragraph break, 0 if none
+        self.prefix: List[str] = []
+        self.split_section = False
+        self.in_fence = False
+        self.index = 0
+
+    def chunk(self, lines: List[str]) -> Optional[Dict]:
+        text = "\n".join(lines).strip("\n")
+        if not text.strip():
+            return None
+        chunk = {"content": text, "metadata": {**self.metadata, **self.section, "chunk_index": self.index}}
+        self.index += 1
+        return chunk
+
+    def has_body(self) -> bool:
+        return any(self.lines[self.floor:])
+
+    def reset(self, lines: List[str], floor: int):
+        self.lines = lines
+        self.chars = sum(len(line) + 1 for line in lines)
+        self.floor = floor
+        self.break_at = 0
+
+    def split(self) -> Optional[Dict]:
+        """Emit the section so far, up to the last paragraph break when there is one."""
+        if self.break_at > self.floor:
+            piece, rest = self.lines[:self.break_at], self.lines[self.break_at + 1:]
+        else:
+            piece, rest = self.lines, []
+        self.split_section = True
+        self.reset(self.prefix + rest, len(self.prefix))
+        return self.chunk(piece)
+
+    def append(self, line: str, out: List[Dict]):
+        size = len(line) + 1
+        if self.chars + size > self.max_chars and self.has_body():
+            chunk = self.split()
+            if chunk:
+                out.append(chunk)
+        self.lines.append(line)
+        self.chars += size
+
+    def end_section(self, final: bool = False) -> List[Dict]:
+        while self.lines and not self.lines[-1]:
+            self.lines.pop()
+            self.chars -= 1
+        if not final and not self.split_section and self.chars < self.min_chars:
+            # Too small to stand alone: carry into the next section
+            if self.lines:
+                self.break_at = len(self.lines)
+                self.lines.append("")
+                self.chars += 1
+            self.floor = 0
+            return []
+        # After a split, a lone repeated heading is not worth a chunk
+        chunk = self.chunk(self.lines) if self.has_body() or not self.split_section else None
+        self.reset([], 0)
+        self.split_section = False
+        return [chunk] if chunk else []
+
+    def feed(self, line: str) -> List[Dict]:
+        out: List[Dict] = []
+        line = line.rstrip()
+        if FENCE.match(line):
+            self.in_fence = not self.in_fence
+        heading = None if self.in_fence else HEADING.match(line)
+        if heading:
+            out.extend(self.end_section())
+            level = len(heading.group(1))
+            self.headings = [h for h in self.headings if h[0] < level] + [(level, heading.group(2))]
+            self.section = section_metadata(self.headings)
+            self.prefix = [line]
+            self.append(line, out)
+            self.floor = len(self.lines)
+            return out
+        if not self.in_fence and THEMATIC_BREAK.match(line):
+            return out
+        if not line and not self.in_fence:
+            if self.lines and self.lines[-1]:
+                self.break_at = len(self.lines)
+                self.lines.append("")
+                self.chars += 1
+            return out
+        self.append(line, out)
+        return out
+
+
+def chunk_markdown(lines: Iterable[str], metadata: Dict, max_tokens: int = MAX_TOKENS,
+                   min_tokens: int = MIN_TOKENS) -> Iterator[Dict]:
+    """
+    Split markdown into section-aligned chunks.
+
+    Args:
+        lines: The document's lines (without newlines), e.g. content.split("\\n")
+        metadata: Copied into every chunk's metadata
+        max_tokens: Approximate upper bound per chunk (a single longer line is kept whole)
+        min_tokens: Sections shorter than this are merged into the next one
+
+    Yields:
+        Dicts with content and metadata (heading_path, section, chunk_index)
+    """
+    packer = _Packer(metadata, max_tokens, min_tokens)
+    first = True
+    for line in lines:
+        if first:
+            line = line.lstrip("\ufeff")
+            first = False
+        yield from packer.feed(line)
+    yield from packer.end_section(final=True)
@@ -0,0 +1,79 @@
+"""
+Cold-start benchmark for the src/ Lambda handlers.
+
+Each sample runs in a fresh interpreter, like a new Lambda container, and
+measures:
+- import: importing the handler module (what every cold start pays in init)
+- init:   warm(), i.e. building the AWS clients and connection pools the
+          first request would otherwise build
+- modules: sys.modules entries added by the import
+
+Reports the median over --runs samples.
+
+    python src/local_stack/cold_start_bench.py [--runs 5]
+"""
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[2]
+
+HANDLERS = {
+    'search/rag_query': ROOT / 'src' / 'search',
+    'ingestion/document_processor': ROOT / 'src' / 'ingestion',
+}
+
+PROBE = """
+import json, sys, time
+sys.path.insert(0, {path!r})
+before = len(sys.modules)
+started = time.perf_counter()
+import {module} as handler
+imported = time.perf_counter()
+modules = len(sys.modules) - before
+handler.warm()
+initialized = time.perf_counter()
+print(json.dumps({{
+    'import_ms': (imported - started) * 1000,
+    'init_ms': (initialized - imported) * 1000,
+    'modules': modules,
+}}))
+"""
+
+ENV = {
+    'AWS_ACCESS_KEY_ID': 'testing',
+    'AWS_SECRET_ACCESS_KEY': 'testing',
+    'AWS_REGION': 'us-gov-west-1',
+    'OPENSEARCH_ENDPOINT': 'http://127.0.0.1:9200',
+}
+
+
+def sample(name: str, path: Path) -> dict:
+    module = name.split('/')[-1]
+    output = subprocess.run(
+        [sys.executable, '-c', PROBE.format(path=str(path), module=module)],
+        capture_output=True, text=True, check=True, env={**ENV, 'PATH': ''}
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'handler':<30} {'import ms':>10} {'init ms':>10} {'modules':>8}")
+    for name, path in HANDLERS.items():
+        samples = [sample(name, path) for _ in range(args.runs)]
+        print(f"{name:<30} "
+              f"{statistics.median(s['import_ms'] for s in samples):>10.1f} "
+              f"{statistics.median(s['init_ms'] for s in samples):>10.1f} "
+              f"{statistics.median(s['modules'] for s in samples):>8.0f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,184 @@
+"""
+Local stand-in for the Bedrock runtime and OpenSearch HTTP APIs.
+
+Serves just enough of both for the Lambda handlers to run without AWS:
+- POST /model/{model_id}/invoke   deterministic Titan-style embedding, or a
+                                  canned Claude Messages reply for other models
+- POST /_bulk                     ndjson bulk indexing into memory, with
+                                  per-item errors like OpenSearch
+- POST /{index}/_search           knn query (exact cosine over all stored
+                                  vectors, term/terms filters, _source fields)
+- GET  /{index}/_count            number of stored documents
+- GET  /_stats                    request counters (for smoke runs)
+
+Point the handlers at it with BEDROCK_ENDPOINT_URL / OPENSEARCH_ENDPOINT
+(and OPENSEARCH_SIGV4=false). Run standalone with:
+    python src/local_stack/fake_services.py [port]
+"""
+
+import hashlib
+import json
+import sys
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from typing import Dict, List
+
+EMBEDDING_DIMENSIONS = 64
+
+
+def fake_embedding(text: str, dimensions: int = EMBEDDING_DIMENSIONS) -> List[float]:
+    """Deterministic unit vector derived from the text's hash."""
+    digest = b''
+    counter = 0
+    while len(digest) < dimensions:
+        digest += hashlib.sha256(f'{counter}:{text}'.encode('utf-8')).digest()
+        counter += 1
+    vector = [byte / 255.0 - 0.5 for byte in digest[:dimensions]]
+    norm = sum(v * v for v in vector) ** 0.5 or 1.0
+    return [v / norm for v in vector]
+
+
+class FakeServices:
+    """In-memory state shared by the request handler threads."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.indices: Dict[str, Dict[str, Dict]] = {}
+        self.invocations = 0
+        self.bulk_requests = 0
+
+    def bulk(self, payload: str) -> Dict:
+        lines = [line for line in payload.split('\n') if line.strip()]
+        items = []
+        with self.lock:
+            self.bulk_requests += 1
+            for action_line, source_line in zip(lines[0::2], lines[1::2]):
+                action, meta = next(iter(json.loads(action_line).items()))
+                doc = json.loads(source_line)
+                embedding = doc.get('embedding')
+                if not isinstance(embedding, list) or not all(isinstance(v, (int, float)) for v in embedding):
+                    items.append({action: {'_index': meta['_index'], '_id': meta.get('_id'), 'status': 400,
+                                           'error': {'type': 'mapper_parsing_exception',
+                                                     'reason': 'failed to parse field [embedding]'}}})
+                    continue
+                index = self.indices.setdefault(meta['_index'], {})
+                created = meta.get('_id') not in index
+                index[meta.get('_id')] = doc
+                items.append({action: {'_index': meta['_index'], '_id': meta.get('_id'),
+                                       'status': 201 if created else 200,
+                                       'result': 'created' if created else 'updated'}})
+        return {'took': 1, 'errors': any('error' in next(iter(i.values())) for i in items), 'items': items}
+
+    def search(self, index: str, query: Dict) -> Dict:
+        field, knn = next(iter(query['query']['knn'].items()))
+        vector = knn['vector']
+        clauses = (knn.get('filter') or {}).get('bool', {}).get('filter', [])
+        with self.lock:
+            docs = list(self.indices.get(index, {}).items())
+        scored = []
+        for doc_id, doc in docs:
+            if not all(_filter_matches(doc, clause) for clause in clauses):
+                continue
+            cosine = sum(a * b for a, b in zip(vector, doc[field]))
+            scored.append(((1.0 + cosine) / 2.0, doc_id, doc))
+        scored.sort(key=lambda item: -item[0])
+        hits = scored[:min(knn.get('k', 10), query.get('size', 10))]
+        fields = query.get('_source')
+        return {'took': 1, 'hits': {
+            'total': {'value': len(hits), 'relation': 'eq'},
+            'max_score': hits[0][0] if hits else None,
+            'hits': [{'_index': index, '_id': doc_id, '_score': score,
+                      '_source': {k: v for k, v in doc.items() if k in fields} if isinstance(fields, list) else doc}
+                     for score, doc_id, doc in hits]
+        }}
+
+    def count(self, index: str) -> int:
+        with self.lock:
+            return len(self.indices.get(index, {}))
+
+
+def _filter_matches(doc: Dict, clause: Dict) -> bool:
+    if 'term' in clause:
+        field, value = next(iter(clause['term'].items()))
+        return doc.get(field) == value
+    if 'terms' in clause:
+        field, values = next(iter(clause['terms'].items()))
+        return doc.get(field) in values
+    raise ValueError(f'Unsupported filter clause: {clause}')
+
+
+def fake_answer(request: Dict) -> Dict:
+    """Claude Messages API response quoting the first context source."""
+    prompt = request['messages'][-1]['content']
+    source = next((line for line in prompt.split('\n') if line.startswith('[Source 1]')), 'no sources')
+    text = f"Based on the provided context ({source}), see the cited regulations.\n\nConfidence: MEDIUM"
+    return {'id': 'msg_local', 'type': 'message', 'role': 'assistant',
+            'content': [{'type': 'text', 'text': text}], 'stop_reason': 'end_turn',
+            'usage': {'input_tokens': len(prompt) // 4, 'output_tokens': len(text) // 4}}
+
+
+def make_handler(state: FakeServices):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+        disable_nagle_algorithm = True  # headers and body are separate writes on keep-alive connections
+
+        def log_message(self, format, *args):
+            pass
+
+        def _body(self) -> str:
+            length = int(self.headers.get('Content-Length') or 0)
+            return self.rfile.read(length).decode('utf-8')
+
+        def _send(self, status: int, payload: Dict):
+            data = json.dumps(payload).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_POST(self):
+            path = self.path.split('?')[0]
+            body = self._body()
+            if path.startswith('/model/') and path.endswith('/invoke'):
+                with state.lock:
+                    state.invocations += 1
+                request = json.loads(body)
+                if 'inputText' in request:
+                    self._send(200, {'embedding': fake_embedding(request['inputText']),
+                                     'inputTextTokenCount': len(request['inputText']) // 4})
+                else:
+                    self._send(200, fake_answer(request))
+            elif path == '/_bulk':
+                self._send(200, state.bulk(body))
+            elif path.endswith('/_search'):
+                self._send(200, state.search(path.strip('/').split('/')[0], json.loads(body)))
+            else:
+                self._send(404, {'error': f'no route for POST {path}'})
+
+        def do_GET(self):
+            path = self.path.split('?')[0]
+            if path == '/_stats':
+                with state.lock:
+                    stats = {'invocations': state.invocations, 'bulk_requests': state.bulk_requests}
+                self._send(200, stats)
+            elif path.endswith('/_count'):
+                self._send(200, {'count': state.count(path.strip('/').split('/')[0])})
+            else:
+                self._send(404, {'error': f'no route for GET {path}'})
+
+    return Handler
+
+
+def start(port: int = 0):
+    """Start the fake server on a background thread; returns (server, state)."""
+    state = FakeServices()
+    server = ThreadingHTTPServer(('127.0.0.1', port), make_handler(state))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, state
+
+
+if __name__ == '__main__':
+    server, _ = start(int(sys.argv[1]) if len(sys.argv) > 1 else 9200)
+    print(f"Fake Bedrock/OpenSearch listening on http://127.0.0.1:{server.server_port}", flush=True)
+    threading.Event().wait()
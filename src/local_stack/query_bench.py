@@ -0,0 +1,120 @@
+"""
+Latency benchmark for the RAG query Lambda against the local stand-in.
+
+Indexes sample-regulations/ into fake_services.py (child process) with the
+ingestion code, then times the questions in sample-queries/ through:
+- vector_search on the pooled keep-alive connection
+- vector_search with the pool cleared before every request (a new TCP
+  connection each time, as without a persistent pool)
+- the full lambda_handler (embedding, k-NN, context, answer)
+
+It also compares the response size with and without _source filtering.
+
+    python src/local_stack/query_bench.py [--rounds 20] [--k 50] [--ef-search 100]
+"""
+
+import argparse
+import json
+import os
+import re
+import statistics
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(ROOT / 'src' / 'ingestion'))
+sys.path.insert(0, str(ROOT / 'src' / 'search'))
+
+from smoke_ingest import start_fake_services  # noqa: E402
+
+
+def questions():
+    text = (ROOT / 'sample-queries' / 'example-questions.md').read_text()
+    return re.findall(r'^"(.+)"$', text, re.MULTILINE)
+
+
+def timed(fn, rounds):
+    samples = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return samples
+
+
+def report(label, samples):
+    samples = sorted(samples)
+    p95 = samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+    print(f"{label:<34} p50 {statistics.median(samples):7.2f} ms   p95 {p95:7.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--rounds', type=int, default=20, help='passes over the sample questions')
+    parser.add_argument('--k', type=int, default=None, help='k-NN candidates (KNN_K)')
+    parser.add_argument('--ef-search', type=int, default=None, help='HNSW ef_search (KNN_EF_SEARCH)')
+    args = parser.parse_args()
+
+    fake, endpoint = start_fake_services()
+    os.environ.update({
+        'AWS_ACCESS_KEY_ID': 'testing',
+        'AWS_SECRET_ACCESS_KEY': 'testing',
+        'AWS_REGION': 'us-gov-west-1',
+        'BEDROCK_ENDPOINT_URL': endpoint,
+        'OPENSEARCH_ENDPOINT': endpoint,
+        'OPENSEARCH_SIGV4': os.environ.get('OPENSEARCH_SIGV4', 'false'),
+    })
+    try:
+        import document_processor
+        import rag_query
+
+        for path in sorted((ROOT / 'sample-regulations').glob('*.md')):
+            metadata = document_processor.extract_metadata(path.name)
+            lines = path.read_text().split('\n')
+            document_processor.bulk_index(list(document_processor.embed_chunks(
+                document_processor.iter_chunks(lines, metadata))))
+
+        embeddings = [rag_query.generate_embedding(question) for question in questions()]
+        search = lambda embedding: rag_query.vector_search(embedding, k=args.k, ef_search=args.ef_search)
+
+        def pooled():
+            for embedding in embeddings:
+                search(embedding)
+
+        def unpooled():
+            for embedding in embeddings:
+                rag_query.get_opensearch_http().clear()
+                search(embedding)
+
+        def handler():
+            for question in questions():
+                rag_query.lambda_handler({'body': json.dumps({'question': question})}, None)
+
+        pooled()  # warm-up
+        per_query = len(embeddings)
+        report('vector_search (pooled)', [t / per_query for t in timed(pooled, args.rounds)])
+        report('vector_search (new connection)', [t / per_query for t in timed(unpooled, args.rounds)])
+        report('lambda_handler', [t / per_query for t in timed(handler, args.rounds)])
+
+        query = {'size': rag_query.SEARCH_TOP_K,
+                 'query': {'knn': {'embedding': {'vector': embeddings[0], 'k': rag_query.SEARCH_TOP_K}}}}
+        full = rag_query.opensearch_request('POST', f'/{rag_query.OPENSEARCH_INDEX}/_search', json.dumps(query))
+        query['_source'] = rag_query.SOURCE_FIELDS
+        trimmed = rag_query.opensearch_request('POST', f'/{rag_query.OPENSEARCH_INDEX}/_search', json.dumps(query))
+        print(f"response size: {len(json.dumps(full)) / 1024:.1f} KiB with embeddings, "
+              f"{len(json.dumps(trimmed)) / 1024:.1f} KiB with _source filtering")
+
+        response = json.loads(rag_query.lambda_handler(
+            {'body': json.dumps({'question': questions()[0], 'filters': {'regulation_type': 'ITAR'}})}, None
+        )['body'])
+        print(f"filtered answer: {len(response['citations'])} citations, all ITAR: "
+              f"{all(c['regulation'] == 'ITAR' for c in response['citations'])}, "
+              f"confidence {response['confidence']}")
+    finally:
+        fake.terminate()
+        fake.wait()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,132 @@
+"""
+End-to-end run of the ingestion Lambda against local stand-ins.
+
+S3 is mocked in-process by moto; Bedrock and OpenSearch are served by
+fake_services.py in a child process (so its in-memory index does not count
+towards the handler's memory). Uploads sample-regulations/, invokes
+lambda_handler with one multi-record S3 event (plus a key that does not
+exist, to exercise partial-failure reporting) and prints the response and
+index counts.
+
+With --large-mb N it also ingests a synthetic N MB regulation and reports
+the handler's peak traced memory next to the object size.
+
+    pip install boto3 moto
+    python src/local_stack/smoke_ingest.py [--large-mb 8]
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+import tracemalloc
+import urllib.request
+from pathlib import Path
+from urllib.parse import quote_plus
+
+ROOT = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(ROOT / 'src' / 'ingestion'))
+
+BUCKET = 'compliance-documents'
+
+
+def s3_event(keys):
+    return {'Records': [
+        {'s3': {'bucket': {'name': BUCKET}, 'object': {'key': quote_plus(key)}}} for key in keys
+    ]}
+
+
+def start_fake_services():
+    """Run fake_services.py in a child process; returns (process, endpoint)."""
+    process = subprocess.Popen(
+        [sys.executable, str(Path(__file__).resolve().parent / 'fake_services.py'), '0'],
+        stdout=subprocess.PIPE, text=True
+    )
+    endpoint = process.stdout.readline().split()[-1]
+    return process, endpoint
+
+
+def get_json(url):
+    with urllib.request.urlopen(url) as response:
+        return json.loads(response.read())
+
+
+def synthetic_regulation(megabytes: float) -> bytes:
+    """Sample regulations repeated under renumbered headings until the size is reached."""
+    samples = [path.read_text() for path in sorted((ROOT / 'sample-regulations').glob('*.md'))]
+    parts, size, copy = [], 0, 0
+    while size < megabytes * 1024 * 1024:
+        text = samples[copy % len(samples)].replace('# ', f'# Part {copy} ')
+        parts.append(text)
+        size += len(text.encode('utf-8')) + 1
+        copy += 1
+    return '\n'.join(parts).encode('utf-8')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--large-mb', type=float, default=0,
+                        help='also ingest a synthetic document of this size and report peak memory')
+    args = parser.parse_args()
+
+    from moto import mock_aws
+
+    fake, endpoint = start_fake_services()
+    os.environ.update({
+        'AWS_ACCESS_KEY_ID': 'testing',
+        'AWS_SECRET_ACCESS_KEY': 'testing',
+        'AWS_REGION': 'us-gov-west-1',
+        'BEDROCK_ENDPOINT_URL': endpoint,
+        'OPENSEARCH_ENDPOINT': endpoint,
+        'OPENSEARCH_SIGV4': os.environ.get('OPENSEARCH_SIGV4', 'false'),
+    })
+
+    try:
+        with mock_aws():
+            import document_processor
+
+            s3 = document_processor.get_s3_client()
+            s3.create_bucket(Bucket=BUCKET, CreateBucketConfiguration={'LocationConstraint': 'us-gov-west-1'})
+            keys = []
+            for path in sorted((ROOT / 'sample-regulations').glob('*.md')):
+                key = f'regulations/{path.name}'
+                s3.put_object(Bucket=BUCKET, Key=key, Body=path.read_bytes())
+                keys.append(key)
+
+            started = time.perf_counter()
+            response = document_processor.lambda_handler(s3_event(keys + ['regulations/Missing Policy.md']), None)
+            elapsed = time.perf_counter() - started
+
+            body = json.loads(response['body'])
+            print(f"statusCode={response['statusCode']} processed={body['processed']} failed={body['failed']}")
+            for result in body['documents']:
+                detail = f"{result['indexed']}/{result['chunks']} chunks" if 'chunks' in result else result['error'][:80]
+                print(f"  {result['status']:<8} {result['key']}: {detail}")
+            stats = get_json(f'{endpoint}/_stats')
+            count = get_json(f'{endpoint}/{document_processor.OPENSEARCH_INDEX}/_count')['count']
+            print(f"Bedrock calls: {stats['invocations']}, _bulk requests: {stats['bulk_requests']}, "
+                  f"indexed docs: {count}, {elapsed:.2f}s")
+
+            if args.large_mb:
+                key = 'regulations/ITAR-synthetic.md'
+                data = synthetic_regulation(args.large_mb)
+                s3.put_object(Bucket=BUCKET, Key=key, Body=data)
+                del data
+                tracemalloc.start()
+                started = time.perf_counter()
+                result = document_processor.process_document(BUCKET, key)
+                elapsed = time.perf_counter() - started
+                peak = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+                size = s3.head_object(Bucket=BUCKET, Key=key)['ContentLength']
+                print(f"Large document: {size / 1e6:.1f} MB, {result['indexed']}/{result['chunks']} chunks "
+                      f"in {elapsed:.1f}s, peak traced memory {peak / 1e6:.1f} MB")
+    finally:
+        fake.terminate()
+        fake.wait()
+
+
+if __name__ == '__main__':
+    main()
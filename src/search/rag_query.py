@@ -1,14 +1,131 @@
 """
 RAG query handler for compliance questions.
 Performs vector search and generates answers using Bedrock.
+
+Retrieval is an OpenSearch k-NN query over the chunks written by
+ingestion/document_processor.py, sent SigV4-signed over a keep-alive
+connection pool that warm invocations reuse. OPENSEARCH_ENDPOINT and
+BEDROCK_ENDPOINT_URL can point at the local stand-in in src/local_stack/.
 """
 
+import os
+import re
 import json
-import boto3
-from typing import List, Dict
+import hashlib
+import threading
+from collections import OrderedDict
+from functools import wraps
+from string import Template
+from typing import List, Dict, Optional
+
+AWS_REGION = os.environ.get('AWS_REGION', 'us-gov-west-1')
+EMBEDDING_MODEL_ID = 'amazon.titan-embed-text-v1'
+ANSWER_MODEL_ID = os.environ.get('ANSWER_MODEL_ID', 'anthropic.claude-3-sonnet-20240229-v1:0')
+ANSWER_MAX_TOKENS = int(os.environ.get('ANSWER_MAX_TOKENS', '1024'))
+
+OPENSEARCH_ENDPOINT = os.environ.get('OPENSEARCH_ENDPOINT', '')
+OPENSEARCH_INDEX = os.environ.get('OPENSEARCH_INDEX', 'compliance-chunks')
+OPENSEARCH_SERVICE = os.environ.get('OPENSEARCH_SERVICE', 'es')  # 'aoss' for OpenSearch Serverless
+OPENSEARCH_SIGV4 = os.environ.get('OPENSEARCH_SIGV4', 'true').lower() == 'true'
+
+# Chunks returned per question, HNSW candidates per shard (k, at least SEARCH_TOP_K)
+# and ef_search (0 keeps the index setting); larger values trade latency for recall
+SEARCH_TOP_K = int(os.environ.get('SEARCH_TOP_K', '10'))
+KNN_K = int(os.environ.get('KNN_K', '0'))
+KNN_EF_SEARCH = int(os.environ.get('KNN_EF_SEARCH', '0'))
+
+# Stored chunk fields returned with each hit; the embedding is never shipped back
+SOURCE_FIELDS = ['content', 'regulation_type', 'source_document', 'section', 'heading_path', 'chunk_index']
+
+# Query embeddings keyed by (model, sha256(text)); survives across warm invocations
+EMBEDDING_CACHE_SIZE = int(os.environ.get('EMBEDDING_CACHE_SIZE', '1024'))
+_embedding_cache: "OrderedDict[str, List[float]]" = OrderedDict()
+
+# Prompt context budget (estimated at ~4 characters per token)
+CONTEXT_TOKEN_BUDGET = int(os.environ.get('CONTEXT_TOKEN_BUDGET', '3000'))
+
+# Request filter names -> chunk document fields (see ingestion/document_processor.py);
+# the fields must be mapped as keyword for term filters
+FILTER_FIELDS = {
+    'regulation_type': 'regulation_type',
+    'source': 'source_document',
+    'section': 'section',
+}
+
+def _memoized(factory):
+    """Build on first call (thread-safe) and return the same object to every later call."""
+    lock = threading.Lock()
+    built = []
+    
+    @wraps(factory)
+    def get():
+        if not built:
+            with lock:
+                if not built:
+                    built.append(factory())
+        return built[0]
+    return get
+
+# AWS clients are built on first use rather than at import: boto3 and each
+# client's service model cost a few hundred ms of cold start. Once built they
+# (and their keep-alive connection pools) are reused by warm invocations.
+
+@_memoized
+def get_session():
+    import boto3
+    return boto3.Session()
+
+@_memoized
+def get_bedrock_client():
+    """Bedrock runtime client with a keep-alive connection pool."""
+    from botocore.config import Config
+    return get_session().client(
+        'bedrock-runtime',
+        endpoint_url=os.environ.get('BEDROCK_ENDPOINT_URL') or None,
+        config=Config(
+            region_name=AWS_REGION,
+            connect_timeout=5,
+            read_timeout=60,
+            tcp_keepalive=True,
+            retries={'max_attempts': 3, 'mode': 'standard'}
+        )
+    )
+
+@_memoized
+def get_opensearch_http():
+    """Keep-alive connection pool for OpenSearch (one request in flight per invocation)."""
+    import urllib3
+    return urllib3.PoolManager(
+        maxsize=1,
+        timeout=urllib3.Timeout(connect=2, read=10),
+        retries=urllib3.Retry(total=2, backoff_factor=0.2, status_forcelist=(429, 502, 503, 504),
+                              allowed_methods=None)
+    )
+
+def warm():
+    """Build clients ahead of the first request."""
+    get_bedrock_client()
+    get_opensearch_http()
+
+# Provisioned concurrency and SnapStart run init ahead of traffic, so pay for clients there
+if os.environ.get('AWS_LAMBDA_INITIALIZATION_TYPE') in ('provisioned-concurrency', 'snap-start'):
+    warm()
+
+ANSWER_SYSTEM_PROMPT = """You are an export control compliance assistant for the U.S. Department of State.
+Answer based ONLY on the provided regulations and cite the specific sections you rely on.
+End with a line "Confidence: HIGH", "Confidence: MEDIUM" or "Confidence: LOW"."""
+
+# Parsed once per container
+ANSWER_PROMPT = Template("""Context:
+$context
 
-bedrock_client = boto3.client('bedrock-runtime', region_name='us-gov-west-1')
-opensearch_client = boto3.client('opensearchserverless')
+Question: $question
+
+Instructions: Answer based only on the provided context. Cite specific regulations.""")
+# Markdown heading line, as recognised by ingestion/markdown_chunker.py
+HEADING = re.compile(r'^(#{1,6})\s+(.+?)\s*#*$')
+
+CONFIDENCE = re.compile(r'confidence\W*(high|medium|low)', re.IGNORECASE)
 
 def lambda_handler(event, context):
     """
@@ -20,8 +137,8 @@ def lambda_handler(event, context):
     # Generate embedding for question
     question_embedding = generate_embedding(question)
     
-    # Search OpenSearch for relevant chunks
-    relevant_chunks = vector_search(question_embedding, top_k=10)
+    # Search OpenSearch for relevant chunks, within the requested partition
+    relevant_chunks = vector_search(question_embedding, top_k=SEARCH_TOP_K, filters=body.get('filters'))
     
     # Build context from chunks
     context = build_context(relevant_chunks)
@@ -46,42 +163,225 @@ def lambda_handler(event, context):
     }
 
 def generate_embedding(text: str) -> List[float]:
-    """Generate embedding using Bedrock Titan."""
-    response = bedrock_client.invoke_model(
-        modelId='amazon.titan-embed-text-v1',
+    """Generate embedding using Bedrock Titan (memoized per warm container)."""
+    key = f"{EMBEDDING_MODEL_ID}:{hashlib.sha256(text.encode('utf-8')).hexdigest()}"
+    cached = _embedding_cache.get(key)
+    if cached is not None:
+        _embedding_cache.move_to_end(key)
+        return cached
+    
+    response = get_bedrock_client().invoke_model(
+        modelId=EMBEDDING_MODEL_ID,
         body=json.dumps({'inputText': text})
     )
     
     result = json.loads(response['body'].read())
+    _embedding_cache[key] = result['embedding']
+    if len(_embedding_cache) > EMBEDDING_CACHE_SIZE:
+        _embedding_cache.popitem(last=False)
     return result['embedding']
 
-def vector_search(embedding: List[float], top_k: int = 10) -> List[Dict]:
-    """Search OpenSearch using k-NN."""
-    # Simplified - actual implementation would use opensearch-py
+def build_filter(filters: Optional[Dict]) -> Optional[Dict]:
+    """
+    OpenSearch bool filter for {regulation_type, source, section} request
+    filters (each a value or a list of values), or None.
+    """
+    clauses = []
+    for name, field in FILTER_FIELDS.items():
+        value = (filters or {}).get(name)
+        if value is None or value == '' or value == []:
+            continue
+        if isinstance(value, list):
+            clauses.append({'terms': {field: value}})
+        else:
+            clauses.append({'term': {field: value}})
+    return {'bool': {'filter': clauses}} if clauses else None
+
+def opensearch_request(method: str, path: str, body: str = None) -> Dict:
+    """Send a (SigV4-signed) request to OpenSearch over the pooled connection."""
+    if not OPENSEARCH_ENDPOINT:
+        raise RuntimeError('OPENSEARCH_ENDPOINT is not configured')
+    url = OPENSEARCH_ENDPOINT.rstrip('/') + path
+    data = body.encode('utf-8') if body is not None else None
+    headers = {'Content-Type': 'application/json'}
+    if OPENSEARCH_SIGV4:
+        from botocore.auth import SigV4Auth
+        from botocore.awsrequest import AWSRequest
+        headers['X-Amz-Content-SHA256'] = hashlib.sha256(data or b'').hexdigest()
+        request = AWSRequest(method=method, url=url, data=data, headers=headers)
+        SigV4Auth(get_session().get_credentials(), OPENSEARCH_SERVICE, AWS_REGION).add_auth(request)
+        headers = dict(request.headers)
+    response = get_opensearch_http().request(method, url, body=data, headers=headers)
+    if response.status >= 300:
+        raise RuntimeError(f'OpenSearch {method} {path} failed with {response.status}: {response.data[:500]!r}')
+    return json.loads(response.data)
+
+def vector_search(embedding: List[float], top_k: int = SEARCH_TOP_K, filters: Optional[Dict] = None,
+                  k: int = None, ef_search: int = None) -> List[Dict]:
+    """
+    Search OpenSearch using k-NN.
+
+    Filters go inside the knn clause, so the engine restricts candidates
+    while searching and still returns top_k matching chunks (a post-filter
+    would drop hits from an already-truncated top_k).
+
+    Args:
+        k: HNSW candidates per shard (default KNN_K, at least top_k)
+        ef_search: HNSW search queue size (default KNN_EF_SEARCH; 0 keeps the index setting)
+
+    Returns:
+        Chunks best first, with content, regulation_type, regulation_section,
+        source, chunk_index and score
+    """
+    knn = {
+        'vector': embedding,
+        'k': max(top_k, k or KNN_K)
+    }
+    knn_filter = build_filter(filters)
+    if knn_filter:
+        knn['filter'] = knn_filter
+    ef_search = KNN_EF_SEARCH if ef_search is None else ef_search
+    if ef_search:
+        knn['method_parameters'] = {'ef_search': ef_search}
     query = {
         'size': top_k,
+        '_source': SOURCE_FIELDS,
         'query': {
             'knn': {
-                'embedding': {
-                    'vector': embedding,
-                    'k': top_k
-                }
+                'embedding': knn
             }
         }
     }
     
-    # Return mock results for example
-    return []
+    response = opensearch_request('POST', f'/{OPENSEARCH_INDEX}/_search', json.dumps(query))
+    chunks = []
+    for hit in response['hits']['hits']:
+        source = hit['_source']
+        chunks.append({
+            'content': source.get('content', ''),
+            'regulation_type': source.get('regulation_type', 'UNKNOWN'),
+            'regulation_section': source.get('section') or source.get('heading_path') or 'N/A',
+            'source': source.get('source_document', ''),
+            'chunk_index': source.get('chunk_index'),
+            'score': hit.get('_score')
+        })
+    return chunks
+
+def generate_answer(question: str, context: str) -> Dict:
+    """
+    Answer the question from the retrieved context with Claude on Bedrock.
 
-def build_context(chunks: List[Dict]) -> str:
-    """Build context string from retrieved chunks."""
-    context_parts = []
+    Returns:
+        text, and the confidence (high/medium/low) the model stated
+    """
+    response = get_bedrock_client().invoke_model(
+        modelId=ANSWER_MODEL_ID,
+        body=json.dumps({
+            'anthropic_version': 'bedrock-2023-05-31',
+            'max_tokens': ANSWER_MAX_TOKENS,
+            'system': ANSWER_SYSTEM_PROMPT,
+            'messages': [{
+                'role': 'user',
+                'content': ANSWER_PROMPT.substitute(context=context, question=question)
+            }]
+        })
+    )
     
-    for i, chunk in enumerate(chunks, 1):
-        context_parts.append(
-            f"[Source {i}] {chunk['regulation_type']} - "
-            f"{chunk.get('regulation_section', 'N/A')}\n"
-            f"{chunk['content']}\n"
-        )
+    result = json.loads(response['body'].read())
+    text = ''.join(block.get('text', '') for block in result.get('content', []) if block.get('type') == 'text')
+    confidence = CONFIDENCE.search(text)
+    return {
+        'text': text,
+        'confidence': confidence.group(1).lower() if confidence else 'medium'
+    }
+
+def format_citations(chunks: List[Dict]) -> List[Dict]:
+    """One citation per retrieved section, best first."""
+    citations = []
+    seen = set()
+    for chunk in chunks:
+        key = (chunk['source'], chunk['regulation_section'])
+        if key in seen:
+            continue
+        seen.add(key)
+        citations.append({
+            'regulation': chunk['regulation_type'],
+            'section': chunk['regulation_section'],
+            'source': chunk['source'],
+            'relevance': round(chunk['score'], 4) if chunk.get('score') is not None else None
+        })
+    return citations
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token)."""
+    return len(text) // 4
+
+def _repeated_heading(previous: List[str], following: List[str]) -> int:
+    """1 if `following` starts with the heading of the section `previous` ends in, else 0."""
+    if not following or not HEADING.match(following[0].rstrip()):
+        return 0
+    current = next((line for line in reversed(previous) if HEADING.match(line.rstrip())), None)
+    return 1 if current is not None and current.rstrip() == following[0].rstrip() else 0
+
+def _merge_adjacent(chunks: List[Dict]) -> List[Dict]:
+    """
+    Merge chunks from the same document with consecutive chunk_index values,
+    dropping the section heading the chunker repeats at the start of a
+    continuation chunk. Blocks keep the order of their best-ranked chunk.
+    """
+    ordered = sorted(
+        enumerate(chunks),
+        key=lambda item: (item[1].get('source', ''), item[1].get('chunk_index', -1), item[0])
+    )
+    blocks = []
+    for rank, chunk in ordered:
+        lines = chunk['content'].split('\n')
+        last = blocks[-1] if blocks else None
+        index = chunk.get('chunk_index')
+        if (last is not None and index is not None and last['chunk_index'] is not None
+                and last['source'] == chunk.get('source', '') and index == last['chunk_index'] + 1):
+            last['lines'].extend(lines[_repeated_heading(last['lines'], lines):])
+            last['chunk_index'] = index
+            last['rank'] = min(last['rank'], rank)
+        else:
+            blocks.append({**chunk, 'source': chunk.get('source', ''), 'lines': lines, 'rank': rank})
+    blocks.sort(key=lambda block: block['rank'])
+    return blocks
+
+def _render_context(blocks: List[Dict]) -> str:
+    return '\n'.join(
+        f"[Source {i}] {block['regulation_type']} - "
+        f"{block.get('regulation_section', 'N/A')}\n"
+        + '\n'.join(block['lines']) + '\n'
+        for i, block in enumerate(blocks, 1)
+    )
+
+def build_context(chunks: List[Dict], token_budget: int = CONTEXT_TOKEN_BUDGET) -> str:
+    """
+    Build context string from retrieved chunks (best first).
+
+    Chunks are taken in score order while they fit the token budget, then
+    adjacent chunks of the same document are merged once, without the
+    section heading a continuation chunk repeats. Merging only removes text,
+    so the merged context stays within the budget.
+    """
+    selected = []
+    used = 0
+    for chunk in chunks:
+        tokens = estimate_tokens(_render_context([{**chunk, 'lines': [chunk['content']]}]))
+        if selected and used + tokens > token_budget:
+            continue
+        selected.append(chunk)
+        used += tokens
+    blocks = _merge_adjacent(selected)
     
-    return '\n'.join(context_parts)
+    context = _render_context(blocks)
+    raw_tokens = estimate_tokens(_render_context(
+        [{**chunk, 'lines': [chunk['content']]} for chunk in selected]
+    ))
+    print(json.dumps({
+        'context_tokens': estimate_tokens(context),
+        'context_tokens_saved': max(0, raw_tokens - estimate_tokens(context)),
+        'chunks_dropped': len(chunks) - len(selected)
+    }))
+    return context